@@ -1,8 +1,35 @@
 import google.generativeai as genai
+# Per-key clients come from the SDK's client manager, which is not public API;
+# requirements.txt pins google-generativeai to the exact version this was written against
+from google.generativeai import client as genai_client
 import ast
+import asyncio
+import hashlib
+import os
+import queue
 import re
+import threading
 import time
+import weakref
+from collections import OrderedDict
 from utils import format_timestamp
+from context_builder import build_context, estimate_tokens
+from metrics import (
+    observe_prompt_tokens, observe_stage, record_error, record_fallback, record_generation, record_hedge, record_hedge_win,
+)
+import tracing
+
+# Model used for quick-questions generation (also part of the quick-questions cache key)
+QUICK_QUESTIONS_MODEL = 'gemini-1.5-flash'
+# Start the fallback model in parallel when the primary hasn't produced its first token
+# within this budget; whichever model answers first is used (0 disables hedging)
+GEMINI_HEDGE_AFTER_MS = int(os.getenv('GEMINI_HEDGE_AFTER_MS', '2500'))
+GEMINI_MODEL_POOL_MAX_SIZE = int(os.getenv('GEMINI_MODEL_POOL_MAX_SIZE', '128'))
+
+# (API key hash, model name) -> (GenerativeModel, its client manager, {event loop: async GenerativeModel}),
+# least recently used first
+_model_pool = OrderedDict()
+_model_pool_lock = threading.Lock()
 
 def _extract_text_from_gemini_response(response):
     """
@@ -39,40 +66,39 @@ def _extract_text_from_gemini_response(response):
     return "\n".join(text_parts).strip(), finish_reason, prompt_feedback
 
 
-def get_ai_response(query: str, chunks, api_key: str, model="gemini-flash"):
+# Map frontend model names to actual Gemini model names
+# Note: gemini-2.5-pro can be gated; include a fallback path to public models
+MODEL_MAPPING = {
+    'gemini-flash': 'gemini-1.5-flash',
+    'gemini-pro': 'gemini-2.5-pro',
+}
+
+EMPTY_RESPONSE_MESSAGE = (
+    "I'm sorry, I couldn't generate a response right now. "
+    "Please try again, switch to 'gemini-flash', or rephrase your question."
+)
+
+GENERATION_INTERRUPTED_MESSAGE = "The answer was interrupted part-way through. Please try again."
+
+class GenerationInterrupted(Exception):
     """
-    Get AI response based on the query and relevant transcript chunks using Gemini.
+    A model's stream broke after producing text and no other model is left to retry on.
     """
-    genai.configure(api_key=api_key)
-    
-    # Map frontend model names to actual Gemini model names
-    # Note: gemini-2.5-pro can be gated; include a fallback path to public models
-    model_mapping = {
-        'gemini-flash': 'gemini-1.5-flash',
-        'gemini-pro': 'gemini-2.5-pro',
-    }
-
-    # Preserve the requested model name for behavior/style decisions
-    requested_model_name = model
 
+def _resolve_gemini_model_name(requested_model_name):
     # Use the specified model or default to a stable public model
-    gemini_model_name = model_mapping.get(requested_model_name, 'gemini-1.5-pro')
-    print(f"Using Gemini model: {gemini_model_name}", flush=True)
+    return MODEL_MAPPING.get(requested_model_name, 'gemini-1.5-pro')
+
+def _fallback_model_name(gemini_model_name):
+    return 'gemini-1.5-pro' if gemini_model_name != 'gemini-1.5-pro' else 'gemini-1.5-flash'
+
+def _build_answer_prompt(query: str, chunks, requested_model_name):
+    """
+    Build the answer prompt from the query and relevant transcript chunks.
+    """
+    # Overlapping chunks merged, one "[MM:SS-MM:SS] text" line per ~400 chars, within the token budget
+    context = build_context(chunks)
 
-    generative_model = genai.GenerativeModel(gemini_model_name)
-    
-    # Format chunks to include translated text and timestamps
-    formatted_chunks = []
-    for chunk in chunks:
-        timestamp = chunk.metadata.get('start_time', 0)
-        duration = chunk.metadata.get('duration', 0)
-        translated_text = chunk.page_content
-        
-        formatted_chunks.append(f"""
-        [{format_timestamp(timestamp)}]
-        Content: {translated_text}
-        """)
-    
     # Style instructions based on selected model name (avoid shadowing the model object)
     if requested_model_name == 'gemini-flash':
         style_instructions = (
@@ -86,84 +112,428 @@ def get_ai_response(query: str, chunks, api_key: str, model="gemini-flash"):
             "then include up to 5 clear bullet points with key takeaways. Keep it succinct overall."
         )
 
-    system_prompt = f"""
-    You are an expert content analyzer who helps users understand video content.
+    prompt = f"""You are an expert content analyzer who helps users understand video content.
+
+{style_instructions}
 
-    {style_instructions}
+Timestamps policy (must follow exactly):
+- ALWAYS include timestamps, in square brackets only, using [MM:SS] or [HH:MM:SS] for longer videos.
+- Put the timestamp at the END of each bullet point.
+- Provide EXACTLY ONE timestamp per line. Never include more than one timestamp in any line.
+- Do NOT include timestamps in headings.
+- Context lines are prefixed with their [start-end] time range; cite a time inside the range.
 
-    Timestamps policy (must follow exactly):
-    - ALWAYS include timestamps, in square brackets only, using [MM:SS] or [HH:MM:SS] for longer videos.
-    - Put the timestamp at the END of each bullet point.
-    - Provide EXACTLY ONE timestamp per line. Never include more than one timestamp in any line.
-    - Do NOT include timestamps in headings.
+Example format:
+### Overview
+* This is a point about the video [12:34]
+* Another important point from a different part [15:20]
 
-    Example format:
-    ### Overview
-    * This is a point about the video [12:34]
-    * Another important point from a different part [15:20]
+Available Context:
+{context.text}
 
-    Available Context:
-    {formatted_chunks}
+User Question: {query}
+"""
+    prompt_tokens = estimate_tokens(prompt)
+    observe_prompt_tokens(prompt_tokens)
+    tracing.set_attribute('prompt_tokens', prompt_tokens)
+    print(f"Prompt context: {context.chunks} chunks -> {context.blocks} lines, ~{context.estimated_tokens} context tokens "
+          f"(~{prompt_tokens} prompt tokens, {context.dropped_chars} of {context.source_chars} chunk chars dropped as overlap or over budget)", flush=True)
+    return prompt
 
-    User Question: {query}
+def _api_key_hash(api_key: str) -> str:
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+def _gemini_model(api_key: str, model_name: str, asynchronous: bool = False):
+    """
+    Pooled GenerativeModel bound to the caller's API key. Each key gets its own clients, so
+    concurrent requests never share the process-wide genai.configure() state. Async clients
+    bind to the event loop they are created on, so async callers get a model per running loop.
     """
+    key = (_api_key_hash(api_key), model_name)
+    with _model_pool_lock:
+        entry = _model_pool.get(key)
+        if entry is not None:
+            _model_pool.move_to_end(key)
+    if entry is None:
+        manager = genai_client._ClientManager()
+        manager.configure(api_key=api_key)
+        generative_model = genai.GenerativeModel(model_name)
+        generative_model._client = manager.get_default_client("generative")
+        with _model_pool_lock:
+            entry = _model_pool.setdefault(key, (generative_model, manager, weakref.WeakKeyDictionary()))
+            _model_pool.move_to_end(key)
+            while len(_model_pool) > GEMINI_MODEL_POOL_MAX_SIZE:
+                _model_pool.popitem(last=False)
+    generative_model, manager, async_models = entry
+    if not asynchronous:
+        return generative_model
+    loop = asyncio.get_running_loop()
+    with _model_pool_lock:
+        async_model = async_models.get(loop)
+        if async_model is None:
+            async_model = genai.GenerativeModel(model_name)
+            async_model._client = generative_model._client
+            async_model._async_client = manager.make_client("generative_async")
+            async_models[loop] = async_model
+    return async_model
 
-    gen_start = time.perf_counter()
-    response = None
+def build_chunk_timestamps(chunks):
+    """
+    Timestamps array returned to the frontend, one entry per retrieved chunk.
+    """
+    found_timestamps = []
+    
+    for chunk in chunks:
+        timestamp = format_timestamp(chunk.metadata.get('start_time', 0))
+        text_preview = chunk.page_content[:100] + "..." if len(chunk.page_content) > 100 else chunk.page_content
+        found_timestamps.append({
+            "time": timestamp,
+            "text": text_preview
+        })
+    return found_timestamps
+
+class _HedgeRace:
+    """
+    Bookkeeping for one hedged generation: which models are still streaming, which one
+    produced the first token, and whether the winner's stream broke part-way through.
+    Producers report (kind, model_name, value) items with kind delta, end or error.
+    """
+
+    def __init__(self, primary_model_name: str):
+        self.primary_model_name = primary_model_name
+        self.fallback_model_name = _fallback_model_name(primary_model_name)
+        self.running = {primary_model_name}
+        self.winner = None
+        self.hedged = False
+        self.failed = False
+        record_generation(primary_model_name)
+
+    @property
+    def model(self) -> str:
+        return self.winner or self.primary_model_name
+
+    def hedge_timeout(self, started: float):
+        """
+        Seconds left before hedging, or None when there is nothing left to hedge.
+        """
+        if GEMINI_HEDGE_AFTER_MS <= 0 or self.hedged or self.winner is not None:
+            return None
+        return max(started + GEMINI_HEDGE_AFTER_MS / 1000 - time.perf_counter(), 0)
+
+    def start_hedge(self) -> str:
+        self.hedged = True
+        self.running.add(self.fallback_model_name)
+        record_hedge(self.primary_model_name)
+        tracing.set_attribute('hedged', True)
+        print(f"⚠️ No first token from '{self.primary_model_name}' within {GEMINI_HEDGE_AFTER_MS} ms. "
+              f"Hedging with {self.fallback_model_name}.", flush=True)
+        return self.fallback_model_name
+
+    def accept(self, kind: str, model_name: str, value):
+        """
+        Apply one producer item; returns the text to pass on, if any.
+        """
+        if self.winner is not None and model_name != self.winner:
+            return None
+        if kind == 'delta':
+            if self.winner is None:
+                self.winner = model_name
+                if self.hedged:
+                    record_hedge_win(model_name)
+                    tracing.set_attribute('hedge_winner', model_name)
+                    print(f"Hedged generation won by {model_name}", flush=True)
+            return value
+        self.running.discard(model_name)
+        if kind == 'error':
+            print(f"Model '{model_name}' generation error: {str(value)}", flush=True)
+            record_error('gemini_generation', model=model_name)
+            if self.winner is not None:
+                self.failed = True
+        return None
+
+    def needs_fallback(self, produced: bool) -> bool:
+        """
+        Whether to retry on the fallback model afterwards: the primary produced nothing (and the
+        fallback didn't already race it) or the primary's stream broke part-way through.
+        """
+        if self.winner is None:
+            return not self.hedged
+        return self.winner == self.primary_model_name and (self.failed or not produced)
+
+    @property
+    def fallback_broke(self) -> bool:
+        """
+        The hedged fallback won the race and its stream then broke; nothing is left to retry on.
+        """
+        return self.failed and self.winner not in (None, self.primary_model_name)
+
+    def drop_losers(self):
+        """
+        Models to cancel now that another one produced the first token.
+        """
+        if self.winner is None:
+            return []
+        losers = [model_name for model_name in self.running if model_name != self.winner]
+        self.running.difference_update(losers)
+        return losers
+
+
+def _produce_stream(api_key: str, model_name: str, prompt: str, items, stop):
+    try:
+        for text in _stream_model_text(_gemini_model(api_key, model_name), prompt):
+            if stop.is_set():
+                return
+            items.put(('delta', model_name, text))
+    except Exception as e:
+        items.put(('error', model_name, e))
+    else:
+        items.put(('end', model_name, None))
+
+def _first_responder(api_key: str, prompt: str, race: _HedgeRace):
+    """
+    Stream text from the primary model, hedging with the fallback model if the first token
+    is late; yields the winner's text. A cancelled loser stops at its next chunk (a blocking
+    request already in flight can't be interrupted, its result is discarded).
+    """
+    items = queue.Queue()
+    stops = {}
+
+    def start(model_name):
+        stops[model_name] = threading.Event()
+        producer = tracing.propagate(_produce_stream)
+        threading.Thread(target=producer, args=(api_key, model_name, prompt, items, stops[model_name]), daemon=True).start()
+
+    started = time.perf_counter()
+    start(race.primary_model_name)
     try:
-        response = generative_model.generate_content(system_prompt)
-    except Exception as gen_err:
-        # Log and proceed to fallback
-        print(f"Primary model '{gemini_model_name}' generation error: {str(gen_err)}", flush=True)
+        while race.running:
+            try:
+                item = items.get(timeout=race.hedge_timeout(started))
+            except queue.Empty:
+                start(race.start_hedge())
+                continue
+            text = race.accept(*item)
+            for model_name in race.drop_losers():
+                stops[model_name].set()
+            if text:
+                yield text
+    finally:
+        for stop in stops.values():
+            stop.set()
+
+def get_ai_response(query: str, chunks, api_key: str, model="gemini-flash"):
+    """
+    Get AI response based on the query and relevant transcript chunks using Gemini.
+    """
+    # Preserve the requested model name for behavior/style decisions
+    requested_model_name = model
+    gemini_model_name = _resolve_gemini_model_name(requested_model_name)
+    print(f"Using Gemini model: {gemini_model_name}", flush=True)
+
+    system_prompt = _build_answer_prompt(query, chunks, requested_model_name)
+
+    # Streamed internally so a slow first token can be hedged; the answer is returned whole
+    gen_start = time.perf_counter()
+    race = _HedgeRace(gemini_model_name)
+    processed_response = ''.join(_first_responder(api_key, system_prompt, race)).strip()
     gen_ms = int((time.perf_counter() - gen_start) * 1000)
-    print(f"⏱️ Gemini answer generation took {gen_ms} ms with model {gemini_model_name}", flush=True)
+    observe_stage('gemini_generation', gen_ms / 1000, model=race.model)
+    print(f"⏱️ Gemini answer generation took {gen_ms} ms with model {race.model}", flush=True)
 
-    # Safely extract text. If empty or response missing, try a single fallback to a public model
-    processed_response, finish_reason, prompt_feedback = ("", None, None)
-    if response is not None:
-        processed_response, finish_reason, prompt_feedback = _extract_text_from_gemini_response(response)
+    if race.fallback_broke:
+        raise GenerationInterrupted(GENERATION_INTERRUPTED_MESSAGE)
+    if race.failed:
+        # Don't return half an answer
+        processed_response = ""
 
-    if not processed_response:
-        print(f"⚠️ No text returned (finish_reason={finish_reason}). Retrying with fallback model.", flush=True)
-        fallback_model_name = 'gemini-1.5-pro' if gemini_model_name != 'gemini-1.5-pro' else 'gemini-1.5-flash'
+    # If empty or broken, try a single fallback to a public model
+    if race.needs_fallback(bool(processed_response)):
+        print(f"⚠️ No text returned from '{gemini_model_name}'. Retrying with fallback model.", flush=True)
+        fallback_model_name = race.fallback_model_name
+        record_fallback(gemini_model_name)
         try:
-            fallback_model = genai.GenerativeModel(fallback_model_name)
+            fallback_model = _gemini_model(api_key, fallback_model_name)
             fb_start = time.perf_counter()
             fb_response = fallback_model.generate_content(system_prompt)
             fb_ms = int((time.perf_counter() - fb_start) * 1000)
+            observe_stage('gemini_fallback', fb_ms / 1000, model=fallback_model_name)
             print(f"⏱️ Fallback generation took {fb_ms} ms with model {fallback_model_name}", flush=True)
-            processed_response, finish_reason, prompt_feedback = _extract_text_from_gemini_response(fb_response)
+            processed_response, _, _ = _extract_text_from_gemini_response(fb_response)
         except Exception as fb_e:
             print(f"Fallback generation error: {str(fb_e)}", flush=True)
+            record_error('gemini_fallback', model=fallback_model_name)
 
     if not processed_response:
         # Do not raise; return a friendly message so the API layer can still succeed
-        processed_response = (
-            "I'm sorry, I couldn't generate a response right now. "
-            "Please try again, switch to 'gemini-flash', or rephrase your question."
-        )
-    
-    # Extract all timestamps from the response for the timestamps array
-    timestamp_pattern = r'\[(\d{2}:\d{2})\]'
-    found_timestamps = []
-    
-    for chunk in chunks:
-        timestamp = format_timestamp(chunk.metadata.get('start_time', 0))
-        text_preview = chunk.page_content[:100] + "..." if len(chunk.page_content) > 100 else chunk.page_content
-        found_timestamps.append({
-            "time": timestamp,
-            "text": text_preview
-        })
+        processed_response = EMPTY_RESPONSE_MESSAGE
     
     # Return structured response with actual timestamps from chunks
     return {
         "content": processed_response,
-        "timestamps": found_timestamps,
+        "timestamps": build_chunk_timestamps(chunks),
         "timings": {
             "gemini_generation_ms": gen_ms
         }
     }
 
+def _stream_model_text(generative_model, prompt):
+    """
+    Yield non-empty text deltas from a streaming Gemini call.
+    """
+    for response_chunk in generative_model.generate_content(prompt, stream=True):
+        text, _, _ = _extract_text_from_gemini_response(response_chunk)
+        if text:
+            yield text
+
+def stream_ai_response(query: str, chunks, api_key: str, model="gemini-flash"):
+    """
+    Streaming variant of get_ai_response. Yields (event, data) tuples:
+    - ("delta", {"text": ...}) for every piece of generated text
+    - ("fallback", {"model": ..., "reset": bool}) when switching to the fallback model;
+      reset=True means text already sent must be discarded by the client
+    - ("done", {"model": ..., "timings": {...}}) once generation finished
+    - ("error", {"success": False, "error": ...}) instead of done when a stream broke after
+      sending text and no model is left to retry on
+    """
+    requested_model_name = model
+    gemini_model_name = _resolve_gemini_model_name(requested_model_name)
+    print(f"Using Gemini model (streaming): {gemini_model_name}", flush=True)
+    system_prompt = _build_answer_prompt(query, chunks, requested_model_name)
+
+    timings = {}
+    gen_start = time.perf_counter()
+    emitted = False
+    race = _HedgeRace(gemini_model_name)
+    for text in _first_responder(api_key, system_prompt, race):
+        if not emitted:
+            timings['first_token_ms'] = int((time.perf_counter() - gen_start) * 1000)
+            observe_stage('gemini_first_token', timings['first_token_ms'] / 1000, model=race.model)
+            if race.model != gemini_model_name:
+                # The hedge answered first; nothing was sent yet
+                yield "fallback", {"model": race.model, "reset": False}
+            emitted = True
+        yield "delta", {"text": text}
+    used_model_name = race.model
+    gen_ms = int((time.perf_counter() - gen_start) * 1000)
+    observe_stage('gemini_generation', gen_ms / 1000, model=used_model_name)
+    timings['gemini_generation_ms'] = gen_ms
+    print(f"⏱️ Gemini streamed answer generation took {gen_ms} ms with model {used_model_name}", flush=True)
+
+    # The hedge won and then broke: there is no other model to retry on
+    interrupted = race.fallback_broke
+    # Fall back when nothing was produced, or when the primary's stream broke part-way through
+    if race.needs_fallback(emitted):
+        fallback_model_name = race.fallback_model_name
+        print(f"⚠️ Streaming from '{gemini_model_name}' incomplete (emitted={emitted}). Retrying with fallback model {fallback_model_name}.", flush=True)
+        record_fallback(gemini_model_name)
+        yield "fallback", {"model": fallback_model_name, "reset": emitted}
+        emitted = False
+        fb_start = time.perf_counter()
+        try:
+            for text in _stream_model_text(_gemini_model(api_key, fallback_model_name), system_prompt):
+                emitted = True
+                used_model_name = fallback_model_name
+                yield "delta", {"text": text}
+        except Exception as fb_e:
+            print(f"Fallback streaming error: {str(fb_e)}", flush=True)
+            record_error('gemini_fallback', model=fallback_model_name)
+            interrupted = emitted
+        fb_ms = int((time.perf_counter() - fb_start) * 1000)
+        observe_stage('gemini_fallback', fb_ms / 1000, model=fallback_model_name)
+        timings['fallback_generation_ms'] = fb_ms
+        print(f"⏱️ Fallback streamed generation took {fb_ms} ms with model {fallback_model_name}", flush=True)
+
+    if interrupted:
+        # Text already sent can't be completed; don't end the answer with a normal done
+        yield "error", {"success": False, "error": GENERATION_INTERRUPTED_MESSAGE}
+        return
+    if not emitted:
+        yield "delta", {"text": EMPTY_RESPONSE_MESSAGE}
+
+    yield "done", {"model": used_model_name, "timings": timings}
+
+def _build_quick_questions_prompt(relevant_chunks):
+    """
+    Prompt for quick-questions generation from the first retrieved chunks.
+    """
+    # Format trimmed chunks for context (limit to first 2 chunks, truncate text)
+    formatted_chunks = []
+    MAX_CHUNKS = 2
+    MAX_CHARS = 800
+    for chunk in relevant_chunks[:MAX_CHUNKS]:
+        timestamp = chunk.metadata.get('start_time', 0)
+        translated_text = chunk.page_content[:MAX_CHARS]
+        formatted_chunks.append(f"[{format_timestamp(timestamp)}] {translated_text}")
+    
+    # Create prompt for generating quick questions focused on best/key/"aha" moments
+    return (
+        "From the context, generate exactly 3 short, engaging questions that point to the video's best highlights: "
+        "key moments, aha moments, biggest takeaways/surprises, or critical advice.\n"
+        "Guidelines:\n"
+        "- Be specific about the topic.\n"
+        "- Do NOT include any timestamps.\n"
+        "- Keep each question under 120 characters.\n"
+        "Return ONLY a valid JSON list of strings (no extra text).\n"
+        f"Context:\n{chr(10).join(formatted_chunks)}\n"
+    )
+
+def _parse_quick_questions(questions_response):
+    """
+    Turn a quick-questions Gemini response into at most 3 cleaned question strings.
+    """
+    try:
+        # Parse the response as a list
+        # Safely extract text
+        questions_text, _, _ = _extract_text_from_gemini_response(questions_response)
+        questions_text = (questions_text or "").strip()
+        
+        # Remove any markdown formatting if present
+        if questions_text.startswith('```') and questions_text.endswith('```'):
+            lines = questions_text.split('\n')
+            questions_text = '\n'.join(lines[1:-1])
+        
+        # Safely evaluate the list
+        questions_list = ast.literal_eval(questions_text)
+        
+        # Validate the result
+        if isinstance(questions_list, list):
+            # Ensure we have at most 3 questions
+            if len(questions_list) > 3:
+                questions_list = questions_list[:3]
+
+            # Normalize questions: remove any bracketed timestamps and trim whitespace
+            cleaned_questions = []
+            for q in questions_list:
+                text = str(q)
+                # Remove [MM:SS] or [HH:MM:SS] anywhere in the string
+                text = re.sub(r"\[(?:\d{1,2}:)?\d{2}:\d{2}\]", "", text)
+                text = re.sub(r"\s+", " ", text).strip()
+                if text:
+                    cleaned_questions.append(text)
+            return cleaned_questions
+            
+    except (ValueError, SyntaxError) as e:
+        # Fallback: try to extract questions manually if parsing fails
+        response_text, _, _ = _extract_text_from_gemini_response(questions_response)
+        response_text = response_text or ""
+        
+        # Try to find questions (sentences ending with ?)
+        questions = re.findall(r'"([^"]*\?)"', response_text)
+        
+        if not questions:
+            # Alternative pattern for questions without quotes
+            questions = re.findall(r'([^.!?]*\?)', response_text)
+            questions = [q.strip() for q in questions if len(q.strip()) > 10]
+        
+        # Limit to 3 questions and strip any bracketed timestamps
+        cleaned_fallback = []
+        for q in questions[:3]:
+            text = re.sub(r"\[(?:\d{1,2}:)?\d{2}:\d{2}\]", "", q)
+            text = re.sub(r"\s+", " ", text).strip()
+            if text:
+                cleaned_fallback.append(text)
+        return cleaned_fallback
+
 def generate_quick_questions(relevant_chunks, api_key: str):
     """
     Generate quick questions based on video content using Gemini.
@@ -172,90 +542,192 @@ def generate_quick_questions(relevant_chunks, api_key: str):
         if not relevant_chunks:
             return []
             
-        # Configure Gemini for question generation (faster model)
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        # Format trimmed chunks for context (limit to first 2 chunks, truncate text)
-        formatted_chunks = []
-        MAX_CHUNKS = 2
-        MAX_CHARS = 800
-        for chunk in relevant_chunks[:MAX_CHUNKS]:
-            timestamp = chunk.metadata.get('start_time', 0)
-            translated_text = chunk.page_content[:MAX_CHARS]
-            formatted_chunks.append(f"[{format_timestamp(timestamp)}] {translated_text}")
-        
-        # Create prompt for generating quick questions focused on best/key/"aha" moments
-        questions_prompt = (
-            "From the context, generate exactly 3 short, engaging questions that point to the video's best highlights: "
-            "key moments, aha moments, biggest takeaways/surprises, or critical advice.\n"
-            "Guidelines:\n"
-            "- Be specific about the topic.\n"
-            "- Do NOT include any timestamps.\n"
-            "- Keep each question under 120 characters.\n"
-            "Return ONLY a valid JSON list of strings (no extra text).\n"
-            f"Context:\n{chr(10).join(formatted_chunks)}\n"
-        )
+        # Faster model for question generation
+        model = _gemini_model(api_key, QUICK_QUESTIONS_MODEL)
+        questions_prompt = _build_quick_questions_prompt(relevant_chunks)
         
         # Generate questions using Gemini
         gen_start = time.perf_counter()
         questions_response = model.generate_content(questions_prompt)
         gen_ms = int((time.perf_counter() - gen_start) * 1000)
+        observe_stage('gemini_quick_questions', gen_ms / 1000, model=QUICK_QUESTIONS_MODEL)
         print(f"⏱️ Gemini quick-questions generation took {gen_ms} ms", flush=True)
-        
-        try:
-            # Parse the response as a list
-            # Safely extract text
-            questions_text, _, _ = _extract_text_from_gemini_response(questions_response)
-            questions_text = (questions_text or "").strip()
-            
-            # Remove any markdown formatting if present
-            if questions_text.startswith('```') and questions_text.endswith('```'):
-                lines = questions_text.split('\n')
-                questions_text = '\n'.join(lines[1:-1])
-            
-            # Safely evaluate the list
-            questions_list = ast.literal_eval(questions_text)
-            
-            # Validate the result
-            if isinstance(questions_list, list):
-                # Ensure we have at most 3 questions
-                if len(questions_list) > 3:
-                    questions_list = questions_list[:3]
-
-                # Normalize questions: remove any bracketed timestamps and trim whitespace
-                cleaned_questions = []
-                for q in questions_list:
-                    text = str(q)
-                    # Remove [MM:SS] or [HH:MM:SS] anywhere in the string
-                    text = re.sub(r"\[(?:\d{1,2}:)?\d{2}:\d{2}\]", "", text)
-                    text = re.sub(r"\s+", " ", text).strip()
-                    if text:
-                        cleaned_questions.append(text)
-                return cleaned_questions
-                
-        except (ValueError, SyntaxError) as e:
-            # Fallback: try to extract questions manually if parsing fails
-            response_text, _, _ = _extract_text_from_gemini_response(questions_response)
-            response_text = response_text or ""
-            
-            # Try to find questions (sentences ending with ?)
-            questions = re.findall(r'"([^"]*\?)"', response_text)
-            
-            if not questions:
-                # Alternative pattern for questions without quotes
-                questions = re.findall(r'([^.!?]*\?)', response_text)
-                questions = [q.strip() for q in questions if len(q.strip()) > 10]
-            
-            # Limit to 3 questions and strip any bracketed timestamps
-            cleaned_fallback = []
-            for q in questions[:3]:
-                text = re.sub(r"\[(?:\d{1,2}:)?\d{2}:\d{2}\]", "", q)
-                text = re.sub(r"\s+", " ", text).strip()
-                if text:
-                    cleaned_fallback.append(text)
-            return cleaned_fallback
+        return _parse_quick_questions(questions_response)
             
     except Exception as e:
         print(f"Error generating quick questions: {str(e)}")
-        return [] 
\ No newline at end of file
+        record_error('gemini_quick_questions', model=QUICK_QUESTIONS_MODEL)
+        return []
+
+
+# Async variants for the ASGI app (async_api.py); same prompts, events and fallbacks as above
+
+async def _astream_model_text(generative_model, prompt):
+    response = await generative_model.generate_content_async(prompt, stream=True)
+    async for response_chunk in response:
+        text, _, _ = _extract_text_from_gemini_response(response_chunk)
+        if text:
+            yield text
+
+async def _aproduce_stream(api_key: str, model_name: str, prompt: str, items):
+    try:
+        async for text in _astream_model_text(_gemini_model(api_key, model_name, asynchronous=True), prompt):
+            items.put_nowait(('delta', model_name, text))
+    except Exception as e:
+        items.put_nowait(('error', model_name, e))
+    else:
+        items.put_nowait(('end', model_name, None))
+
+async def _afirst_responder(api_key: str, prompt: str, race: _HedgeRace):
+    """
+    Async variant of _first_responder; losers are cancelled outright.
+    """
+    items = asyncio.Queue()
+    tasks = {}
+
+    def start(model_name):
+        tasks[model_name] = asyncio.create_task(_aproduce_stream(api_key, model_name, prompt, items))
+
+    started = time.perf_counter()
+    start(race.primary_model_name)
+    try:
+        while race.running:
+            try:
+                item = await asyncio.wait_for(items.get(), race.hedge_timeout(started))
+            except asyncio.TimeoutError:
+                start(race.start_hedge())
+                continue
+            text = race.accept(*item)
+            for model_name in race.drop_losers():
+                tasks[model_name].cancel()
+            if text:
+                yield text
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+async def aget_ai_response(query: str, chunks, api_key: str, model="gemini-flash"):
+    """
+    Async variant of get_ai_response (generate_content_async).
+    """
+    requested_model_name = model
+    gemini_model_name = _resolve_gemini_model_name(requested_model_name)
+    print(f"Using Gemini model (async): {gemini_model_name}", flush=True)
+    # Segment lookups hit disk; keep them off the event loop
+    system_prompt = await asyncio.to_thread(_build_answer_prompt, query, chunks, requested_model_name)
+
+    gen_start = time.perf_counter()
+    race = _HedgeRace(gemini_model_name)
+    processed_response = ''.join([text async for text in _afirst_responder(api_key, system_prompt, race)]).strip()
+    gen_ms = int((time.perf_counter() - gen_start) * 1000)
+    observe_stage('gemini_generation', gen_ms / 1000, model=race.model)
+    print(f"⏱️ Gemini answer generation took {gen_ms} ms with model {race.model}", flush=True)
+
+    if race.fallback_broke:
+        raise GenerationInterrupted(GENERATION_INTERRUPTED_MESSAGE)
+    if race.failed:
+        processed_response = ""
+
+    if race.needs_fallback(bool(processed_response)):
+        print(f"⚠️ No text returned from '{gemini_model_name}'. Retrying with fallback model.", flush=True)
+        fallback_model_name = race.fallback_model_name
+        record_fallback(gemini_model_name)
+        try:
+            fb_start = time.perf_counter()
+            fb_response = await _gemini_model(api_key, fallback_model_name, asynchronous=True).generate_content_async(system_prompt)
+            fb_ms = int((time.perf_counter() - fb_start) * 1000)
+            observe_stage('gemini_fallback', fb_ms / 1000, model=fallback_model_name)
+            print(f"⏱️ Fallback generation took {fb_ms} ms with model {fallback_model_name}", flush=True)
+            processed_response, _, _ = _extract_text_from_gemini_response(fb_response)
+        except Exception as fb_e:
+            print(f"Fallback generation error: {str(fb_e)}", flush=True)
+            record_error('gemini_fallback', model=fallback_model_name)
+
+    if not processed_response:
+        processed_response = EMPTY_RESPONSE_MESSAGE
+
+    return {
+        "content": processed_response,
+        "timestamps": build_chunk_timestamps(chunks),
+        "timings": {
+            "gemini_generation_ms": gen_ms
+        }
+    }
+
+async def astream_ai_response(query: str, chunks, api_key: str, model="gemini-flash"):
+    """
+    Async variant of stream_ai_response; yields the same (event, data) tuples.
+    """
+    requested_model_name = model
+    gemini_model_name = _resolve_gemini_model_name(requested_model_name)
+    print(f"Using Gemini model (async streaming): {gemini_model_name}", flush=True)
+    # Segment lookups hit disk; keep them off the event loop
+    system_prompt = await asyncio.to_thread(_build_answer_prompt, query, chunks, requested_model_name)
+
+    timings = {}
+    gen_start = time.perf_counter()
+    emitted = False
+    race = _HedgeRace(gemini_model_name)
+    async for text in _afirst_responder(api_key, system_prompt, race):
+        if not emitted:
+            timings['first_token_ms'] = int((time.perf_counter() - gen_start) * 1000)
+            observe_stage('gemini_first_token', timings['first_token_ms'] / 1000, model=race.model)
+            if race.model != gemini_model_name:
+                yield "fallback", {"model": race.model, "reset": False}
+            emitted = True
+        yield "delta", {"text": text}
+    used_model_name = race.model
+    gen_ms = int((time.perf_counter() - gen_start) * 1000)
+    observe_stage('gemini_generation', gen_ms / 1000, model=used_model_name)
+    timings['gemini_generation_ms'] = gen_ms
+    print(f"⏱️ Gemini streamed answer generation took {gen_ms} ms with model {used_model_name}", flush=True)
+
+    interrupted = race.fallback_broke
+    if race.needs_fallback(emitted):
+        fallback_model_name = race.fallback_model_name
+        print(f"⚠️ Streaming from '{gemini_model_name}' incomplete (emitted={emitted}). Retrying with fallback model {fallback_model_name}.", flush=True)
+        record_fallback(gemini_model_name)
+        yield "fallback", {"model": fallback_model_name, "reset": emitted}
+        emitted = False
+        fb_start = time.perf_counter()
+        try:
+            async for text in _astream_model_text(_gemini_model(api_key, fallback_model_name, asynchronous=True), system_prompt):
+                emitted = True
+                used_model_name = fallback_model_name
+                yield "delta", {"text": text}
+        except Exception as fb_e:
+            print(f"Fallback streaming error: {str(fb_e)}", flush=True)
+            record_error('gemini_fallback', model=fallback_model_name)
+            interrupted = emitted
+        fb_ms = int((time.perf_counter() - fb_start) * 1000)
+        observe_stage('gemini_fallback', fb_ms / 1000, model=fallback_model_name)
+        timings['fallback_generation_ms'] = fb_ms
+        print(f"⏱️ Fallback streamed generation took {fb_ms} ms with model {fallback_model_name}", flush=True)
+
+    if interrupted:
+        # Text already sent can't be completed; don't end the answer with a normal done
+        yield "error", {"success": False, "error": GENERATION_INTERRUPTED_MESSAGE}
+        return
+    if not emitted:
+        yield "delta", {"text": EMPTY_RESPONSE_MESSAGE}
+
+    yield "done", {"model": used_model_name, "timings": timings}
+
+async def agenerate_quick_questions(relevant_chunks, api_key: str):
+    """
+    Async variant of generate_quick_questions.
+    """
+    try:
+        if not relevant_chunks:
+            return []
+        model = _gemini_model(api_key, QUICK_QUESTIONS_MODEL, asynchronous=True)
+        gen_start = time.perf_counter()
+        questions_response = await model.generate_content_async(_build_quick_questions_prompt(relevant_chunks))
+        gen_ms = int((time.perf_counter() - gen_start) * 1000)
+        observe_stage('gemini_quick_questions', gen_ms / 1000, model=QUICK_QUESTIONS_MODEL)
+        print(f"⏱️ Gemini quick-questions generation took {gen_ms} ms", flush=True)
+        return _parse_quick_questions(questions_response)
+    except Exception as e:
+        print(f"Error generating quick questions: {str(e)}")
+        record_error('gemini_quick_questions', model=QUICK_QUESTIONS_MODEL)
+        return []
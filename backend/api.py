@@ -1,16 +1,18 @@
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from dotenv import load_dotenv
+import importlib
 import os
 import time
 
 
-# Import utility modules
-from utils import setup_console_encoding
-from youtube_utils import create_youtube_transcript_api, get_transcript_safely
-from vector_store_utils import get_relevant_transcript_chunks, store_documents_in_vector_db, get_collection_point_count
-from ai_utils import get_ai_response, generate_quick_questions
+# Import utility modules (heavy ones - langchain, qdrant, genai, translators -
+# are imported on first use inside the handlers, or up front by preload_modules())
+from utils import setup_console_encoding, sse_event
+from ingest_utils import IngestInProgress, get_ingest_coordinator, ingest_transcript
+import request_log
+import tracing
+from metrics import observe_request, observe_stage, record_error, record_skip_ingest, render_metrics, set_request_labels, stage_timer
 
 # Load environment variables
 load_dotenv()
@@ -18,61 +20,106 @@ load_dotenv()
 # Set console encoding to UTF-8
 setup_console_encoding()
 
-# Initialize YouTube Transcript API
-ytt_api = create_youtube_transcript_api()
+# Modules imported in the gunicorn master when the app is preloaded, so workers share them copy-on-write
+PRELOAD_MODULES = (
+    'cache_utils',
+    'youtube_utils',
+    'vector_store_utils',
+    'ingest_pipeline',
+    'ai_utils',
+)
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)
+bp = Blueprint('api', __name__)
 
-# Initialize text splitter with optimized settings for sliding window
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=2500,  # Increased for better context
-    chunk_overlap=625,  # 25% overlap for continuity
-    length_function=len,
-)
+def preload_modules():
+    """
+    Import the heavy modules now instead of on first request.
+    """
+    start = time.perf_counter()
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+    elapsed_ms = int((time.perf_counter() - start) * 1000)
+    print(f"⏱️ Preloaded {len(PRELOAD_MODULES)} modules in {elapsed_ms} ms", flush=True)
+
+def start_background_tasks():
+    """
+    Per-process background work (Qdrant readiness probe). Safe to call repeatedly;
+    must run in each worker, not in a preloading master.
+    """
+    from vector_store_utils import start_qdrant_probe
+    start_qdrant_probe()
+
+def _start_request_metrics():
+    g.request_start = time.perf_counter()
+    endpoint = request.url_rule.rule if request.url_rule else 'other'
+    set_request_labels(endpoint=endpoint, model='')
+    request_log.begin_request(endpoint)
+    if endpoint not in tracing.UNTRACED_ENDPOINTS:
+        g.trace = tracing.start_trace(f"{request.method} {endpoint}", video_id=request.args.get('video_id'))
+
+def _finish_request_metrics(response):
+    # Streaming responses are recorded when headers are sent; their stages carry the full timings
+    if 'request_start' in g:
+        elapsed = time.perf_counter() - g.request_start
+        observe_request(request.url_rule.rule if request.url_rule else 'other', response.status_code, elapsed)
+        request_log.end_request(response.status_code, elapsed)
+    if g.get('trace') is not None:
+        g.trace.root.set_attribute('status', response.status_code)
+    return response
 
-@app.route('/api/debug', methods=['GET'])
+def _finish_request_trace(exc):
+    # Teardown runs after a streamed body is fully sent, so stream traces cover the whole answer
+    tracing.finish_trace(g.get('trace'), error=type(exc).__name__ if exc else None)
+
+def create_app(preload: bool = False):
+    """
+    Build the Flask app. With preload=True the heavy modules are imported up front
+    (used by gunicorn --preload so forked workers share them).
+    """
+    if preload:
+        preload_modules()
+    app = Flask(__name__)
+    CORS(app)
+    app.register_blueprint(bp)
+    # Lazily starts the probe in whichever process serves requests (no-op once running)
+    app.before_request(start_background_tasks)
+    app.before_request(_start_request_metrics)
+    app.after_request(_finish_request_metrics)
+    app.teardown_request(_finish_request_trace)
+    return app
+
+@bp.route('/api/debug/traces', methods=['GET'])
+def debug_traces():
+    """
+    Recent or slowest request span trees (?view=recent|slowest&limit=N&trace_id=...&format=otel).
+    Requires TRACE_DEBUG_TOKEN in the X-Debug-Token header.
+    """
+    if not tracing.TRACE_DEBUG_TOKEN:
+        return jsonify({"success": False, "error": "Trace debugging is disabled (TRACE_DEBUG_TOKEN not set)"}), 404
+    if not tracing.debug_token_valid(request.headers.get('X-Debug-Token')):
+        return jsonify({"success": False, "error": "Invalid or missing X-Debug-Token header"}), 401
+    try:
+        limit = int(request.args.get('limit', '20'))
+    except ValueError:
+        return jsonify({"success": False, "error": "limit must be an integer"}), 400
+    payload, status = tracing.traces_payload(
+        view=request.args.get('view', 'slowest'),
+        limit=limit,
+        trace_id=request.args.get('trace_id'),
+        fmt=request.args.get('format', 'tree'),
+    )
+    return jsonify(payload), status
+
+@bp.route('/api/debug', methods=['GET'])
 def debug_connection():
     """
     Debug endpoint to test Qdrant connectivity from Railway
     """
     try:
-        import os
-        import requests
-        from vector_store_utils import QDRANT_URL, test_qdrant_connection
-        
-        debug_info = {
-            "environment_vars": {
-                "QDRANT_URL": os.getenv('QDRANT_URL'),
-                "RAILWAY_QDRANT_URL": os.getenv('RAILWAY_QDRANT_URL'),
-            },
-            "computed_url": QDRANT_URL,
-            "connection_test": None,
-            "http_test": None,
-            "error": None
-        }
-        
-        # Test basic HTTP connection
-        try:
-            response = requests.get(f"{QDRANT_URL}/", timeout=10)
-            debug_info["http_test"] = {
-                "status_code": response.status_code,
-                "success": response.status_code == 200,
-                "response_preview": str(response.text)[:200] if response.text else None
-            }
-        except Exception as e:
-            debug_info["http_test"] = {
-                "error": str(e),
-                "error_type": type(e).__name__
-            }
-        
-        # Test Qdrant connection
-        debug_info["connection_test"] = test_qdrant_connection()
-        
+        from vector_store_utils import connection_debug_info
         return jsonify({
             "success": True,
-            "debug_info": debug_info
+            "debug_info": connection_debug_info()
         })
         
     except Exception as e:
@@ -82,14 +129,36 @@ def debug_connection():
             "error_type": type(e).__name__
         }), 500
 
-@app.route('/api/transcript', methods=['GET'])
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus metrics: stage latency histograms and cache/fallback/skip-ingest/error counters.
+    """
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+@bp.route('/api/ready', methods=['GET'])
+def readiness():
+    """
+    Readiness check: 200 once the background probe has reached Qdrant, 503 otherwise.
+    """
+    from vector_store_utils import qdrant_status
+    status = qdrant_status()
+    return jsonify({
+        "ready": status["ready"],
+        "qdrant": status
+    }), 200 if status["ready"] else 503
+
+@bp.route('/api/transcript', methods=['GET'])
 def get_transcript():
     """
     Extract transcript from YouTube video and process it for RAG system
     """
+    from vector_store_utils import get_collection_point_count, collection_for_video
     video_id = request.args.get('video_id')
     languages = request.args.get('languages')
     api_key = request.headers.get('X-API-Key')
+    request_log.note(video_id=video_id, languages=languages)
     
     if not video_id:
         return jsonify({
@@ -104,115 +173,132 @@ def get_transcript():
         }), 400
         
     # Early exit if collection already populated
-    collection_name = video_id
+    collection_name = collection_for_video(video_id)
     overall_start = time.perf_counter()
     try:
-        count_start = time.perf_counter()
-        existing_points = get_collection_point_count(collection_name)
-        count_ms = int((time.perf_counter() - count_start) * 1000)
-        print(f"⏱️ Existing collection count check took {count_ms} ms (count={existing_points})", flush=True)
+        with stage_timer('count_check', 'Existing collection count check') as timer:
+            existing_points = get_collection_point_count(collection_name, video_id)
+            timer.detail = f"(count={existing_points})"
+        count_ms = timer.ms
     except Exception as e:
         print(f"Count check failed: {str(e)}", flush=True)
         existing_points = 0
 
     if existing_points > 0:
-        # Skip transcript fetch/storage; generate quick-questions directly
-        try:
-            broad_query = "main topics discussed content overview summary"
-            quick_ss_start = time.perf_counter()
-            relevant_chunks = get_relevant_transcript_chunks(broad_query, api_key, collection_name, k=2)
-            quick_similarity_ms = int((time.perf_counter() - quick_ss_start) * 1000)
-            print(f"⏱️ Quick similarity search for questions took {quick_similarity_ms} ms (skip-ingest path)", flush=True)
+        response = _skip_ingest_response(video_id, api_key, collection_name, count_ms, overall_start)
+        if response is not None:
+            return response
 
-            qq_start = time.perf_counter()
-            quick_questions = generate_quick_questions(relevant_chunks, api_key)
-            qq_ms = int((time.perf_counter() - qq_start) * 1000)
-            print(f"⏱️ Quick questions generation took {qq_ms} ms (skip-ingest path)", flush=True)
+    # Fetch, store and generate quick-questions once per video, even under concurrent requests
+    coordinator = get_ingest_coordinator()
+    try:
+        result = coordinator.run(
+            video_id,
+            lambda: ingest_transcript(video_id, languages, api_key, collection_name),
+            already_done=lambda: get_collection_point_count(collection_name, video_id) > 0,
+        )
+    except IngestInProgress as e:
+        response = jsonify({
+            "success": False,
+            "error": str(e)
+        })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
+    except Exception as e:
+        # Lock-file I/O, the peer check or an ingest error re-raised to waiters
+        print(f"Ingest of '{video_id}' failed: {str(e)}", flush=True)
+        record_error('ingest')
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
 
-            total_ms = int((time.perf_counter() - overall_start) * 1000)
-            print(f"⏱️ /api/transcript total time {total_ms} ms (skip-ingest path)", flush=True)
+    if result.get('ingested_by_peer'):
+        response = _skip_ingest_response(video_id, api_key, collection_name, None, overall_start)
+        if response is not None:
+            return response
+        result = {'success': True, 'quick-questions': []}
 
-            return jsonify({
-                "success": True,
-                "detected_lang": None,
-                "quick-questions": quick_questions,
-                "timings": {
-                    "existing_collection_count_ms": count_ms,
-                    "quick_similarity_search_ms": quick_similarity_ms,
-                    "quick_question_generation_ms": qq_ms,
-                    "total_endpoint_ms": total_ms,
-                    "skipped_ingest": True
-                }
-            })
-        except Exception as e:
-            # Fall back to normal path if anything fails
-            print(f"Skip-ingest path failed: {str(e)}; proceeding to fetch transcript", flush=True)
-
-    # Get transcript from YouTube (normal path)
-    result = get_transcript_safely(video_id, languages, ytt_api)
-    
-    if not result.get('success'):
-        return jsonify(result)
-    
-    # Store documents in vector database using video_id as collection name
-    docs = result.get('docs', [])
-    if docs:
-        storage_start = time.perf_counter()
-        storage_success = store_documents_in_vector_db(docs, api_key, collection_name)
-        storage_ms = int((time.perf_counter() - storage_start) * 1000)
-        print(f"⏱️ Vector DB storage took {storage_ms} ms", flush=True)
-        if storage_success:
-            result['chunks_processed'] = len(docs)
-        else:
-            result['warning'] = "Failed to store in vector database"
-        # Attach timings
-        result.setdefault('timings', {})['vector_store_storage_ms'] = storage_ms
-    
-    # Remove non-serializable docs from result before returning
-    if 'docs' in result:
-        del result['docs']
-    
-    # Generate quick questions if transcript was successfully processed
-    if result.get('success') and result.get('data'):
-        try:
-            # Get relevant chunks from vector database for question generation
-            broad_query = "main topics discussed content overview summary"
-            quick_ss_start = time.perf_counter()
-            relevant_chunks = get_relevant_transcript_chunks(broad_query, api_key, collection_name, k=2)
-            quick_similarity_ms = int((time.perf_counter() - quick_ss_start) * 1000)
-            print(f"⏱️ Quick similarity search for questions took {quick_similarity_ms} ms", flush=True)
-            
-            # Generate questions using AI
-            qq_start = time.perf_counter()
-            quick_questions = generate_quick_questions(relevant_chunks, api_key)
-            qq_ms = int((time.perf_counter() - qq_start) * 1000)
-            print(f"⏱️ Quick questions generation took {qq_ms} ms", flush=True)
-            result['quick-questions'] = quick_questions
-            # Attach timings
-            timings = result.setdefault('timings', {})
-            timings['quick_similarity_search_ms'] = quick_similarity_ms
-            timings['quick_question_generation_ms'] = qq_ms
-            
-        except Exception as e:
-            print(f"Error generating quick questions: {str(e)}")
-            # Continue without questions if generation fails
-            result['quick-questions'] = []
-    
-    # Remove data from result before returning
-    if 'data' in result:
-        del result['data']
-    
     # Finalize timings
     total_ms = int((time.perf_counter() - overall_start) * 1000)
     result.setdefault('timings', {})['total_endpoint_ms'] = total_ms
     print(f"⏱️ /api/transcript total time {total_ms} ms", flush=True)
     return jsonify(result)
 
-@app.route('/api/query', methods=['POST'])
-def query_transcript():
+def _skip_ingest_response(video_id, api_key, collection_name, count_ms, overall_start):
+    """
+    Build the /api/transcript response for an already-ingested video.
+    Returns None if quick-questions could not be produced, so the caller can fall back to ingest.
+    """
+    from ai_utils import generate_quick_questions, QUICK_QUESTIONS_MODEL
+    from cache_utils import get_cached_quick_questions, store_quick_questions
+    from vector_store_utils import get_relevant_transcript_chunks
+    # Serve quick-questions straight from the cache when available
+    with stage_timer('quick_questions_cache') as timer:
+        cached_questions = get_cached_quick_questions(video_id, QUICK_QUESTIONS_MODEL)
+    cache_ms = timer.ms
+    if cached_questions is not None:
+        record_skip_ingest()
+        request_log.note(skipped_ingest=True)
+        total_ms = int((time.perf_counter() - overall_start) * 1000)
+        print(f"⏱️ Quick-questions cache hit took {cache_ms} ms; /api/transcript total time {total_ms} ms (skip-ingest path)", flush=True)
+        return jsonify({
+            "success": True,
+            "detected_lang": None,
+            "quick-questions": cached_questions,
+            "timings": {
+                "existing_collection_count_ms": count_ms,
+                "quick_questions_cache_ms": cache_ms,
+                "total_endpoint_ms": total_ms,
+                "skipped_ingest": True,
+                "quick_questions_cached": True
+            }
+        })
+
+    # Skip transcript fetch/storage; generate quick-questions directly
+    try:
+        broad_query = "main topics discussed content overview summary"
+        with stage_timer('similarity_search', 'Quick similarity search for questions') as timer:
+            relevant_chunks = get_relevant_transcript_chunks(broad_query, api_key, collection_name, k=2, video_id=video_id)
+            timer.detail = "(skip-ingest path)"
+        quick_similarity_ms = timer.ms
+
+        with stage_timer('quick_questions', 'Quick questions generation', model=QUICK_QUESTIONS_MODEL) as timer:
+            quick_questions = generate_quick_questions(relevant_chunks, api_key)
+            timer.detail = "(skip-ingest path)"
+        qq_ms = timer.ms
+        store_quick_questions(video_id, QUICK_QUESTIONS_MODEL, quick_questions)
+        record_skip_ingest()
+        request_log.note(skipped_ingest=True)
+
+        total_ms = int((time.perf_counter() - overall_start) * 1000)
+        print(f"⏱️ /api/transcript total time {total_ms} ms (skip-ingest path)", flush=True)
+
+        return jsonify({
+            "success": True,
+            "detected_lang": None,
+            "quick-questions": quick_questions,
+            "timings": {
+                "existing_collection_count_ms": count_ms,
+                "quick_similarity_search_ms": quick_similarity_ms,
+                "quick_question_generation_ms": qq_ms,
+                "total_endpoint_ms": total_ms,
+                "skipped_ingest": True
+            }
+        })
+    except Exception as e:
+        # Fall back to normal path if anything fails
+        print(f"Skip-ingest path failed: {str(e)}; proceeding to fetch transcript", flush=True)
+        record_error('skip_ingest')
+        return None
+
+@bp.route('/api/query', methods=['POST'])
+def query_transcript(stream=False):
     """
     Query the processed transcript using RAG system
     """
+    from ai_utils import get_ai_response
+    from vector_store_utils import get_relevant_transcript_chunks, collection_for_video
     try:
         data = request.get_json()
         api_key = request.headers.get('X-API-Key')
@@ -240,21 +326,26 @@ def query_transcript():
         # Get model from request body (default to gemini-flash if not provided)
         model = data.get('model', 'gemini-flash')
         print(f"Using model: {model}", flush=True)
+        set_request_labels(model=model)
+        tracing.set_attribute('video_id', video_id)
 
         user_query = data['query']
-        collection_name = video_id
+        request_log.note_query(video_id, user_query, model)
+        collection_name = collection_for_video(video_id)
+
+        if stream or request.args.get('stream') == '1':
+            return _stream_query_response(user_query, api_key, video_id, collection_name, model)
         
         # Get relevant chunks from vector database
-        ss_start = time.perf_counter()
-        relevant_chunks = get_relevant_transcript_chunks(user_query, api_key, collection_name)
-        ss_ms = int((time.perf_counter() - ss_start) * 1000)
-        print(f"⏱️ Query similarity search took {ss_ms} ms", flush=True)
+        with stage_timer('similarity_search', 'Query similarity search') as timer:
+            relevant_chunks = get_relevant_transcript_chunks(user_query, api_key, collection_name, video_id=video_id)
+        ss_ms = timer.ms
         
         # Generate AI response with the specified model
-        ai_start = time.perf_counter()
-        response_data = get_ai_response(user_query, relevant_chunks, api_key, model=model)
-        ai_ms = int((time.perf_counter() - ai_start) * 1000)
-        print(f"⏱️ AI response generation took {ai_ms} ms with model {model}", flush=True)
+        with stage_timer('ai_generation', 'AI response generation') as timer:
+            response_data = get_ai_response(user_query, relevant_chunks, api_key, model=model)
+            timer.detail = f"with model {model}"
+        ai_ms = timer.ms
         
         return jsonify({
             "success": True,
@@ -267,11 +358,81 @@ def query_transcript():
         })
 
     except Exception as e:
+        record_error('query')
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
+@bp.route('/api/query/stream', methods=['POST'])
+def query_transcript_stream():
+    """
+    Server-Sent Events variant of /api/query (same as POST /api/query?stream=1)
+    """
+    return query_transcript(stream=True)
+
+def _stream_query_response(user_query, api_key, video_id, collection_name, model):
+    """
+    Stream a query answer as SSE: a `retrieval` frame with timestamps first, then
+    `delta` frames with generated text (plus `fallback` if the model is switched),
+    and a final `done` frame with timings (or an `error` frame).
+    """
+    from ai_utils import build_chunk_timestamps, stream_ai_response
+    from vector_store_utils import get_relevant_transcript_chunks
+
+    def generate():
+        overall_start = time.perf_counter()
+        try:
+            with stage_timer('similarity_search', 'Query similarity search') as timer:
+                relevant_chunks = get_relevant_transcript_chunks(user_query, api_key, collection_name, video_id=video_id)
+                timer.detail = "(streaming)"
+            ss_ms = timer.ms
+            yield sse_event("retrieval", {
+                "timestamps": build_chunk_timestamps(relevant_chunks),
+                "similarity_search_ms": ss_ms
+            })
+
+            ai_start = time.perf_counter()
+            for event, payload in stream_ai_response(user_query, relevant_chunks, api_key, model=model):
+                if event == "done":
+                    ai_seconds = time.perf_counter() - ai_start
+                    ai_ms = int(ai_seconds * 1000)
+                    total_ms = int((time.perf_counter() - overall_start) * 1000)
+                    observe_stage('ai_generation', ai_seconds)
+                    observe_stage('stream_total', time.perf_counter() - overall_start)
+                    print(f"⏱️ AI streamed response took {ai_ms} ms with model {payload.get('model')}", flush=True)
+                    timings = {
+                        "similarity_search_ms": ss_ms,
+                        "ai_generation_ms": ai_ms,
+                        "total_endpoint_ms": total_ms
+                    }
+                    timings.update(payload.get("timings", {}))
+                    yield sse_event("done", {"success": True, "model": payload.get("model"), "timings": timings})
+                else:
+                    yield sse_event(event, payload)
+        except Exception as e:
+            print(f"Streaming query failed: {str(e)}", flush=True)
+            record_error('query_stream')
+            yield sse_event("error", {"success": False, "error": str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def __getattr__(name):
+    # `api.app` (e.g. `gunicorn api:app`) is built on first access, so importing api for the
+    # factory (gunicorn.conf.py, manage.py, tests) never builds a second app
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == "__main__":
+    app = create_app()
     app.run(host="0.0.0.0", port=5001, debug=True) 
     
\ No newline at end of file
@@ -0,0 +1,413 @@
+"""
+Async (ASGI) serving mode with the same endpoints and responses as api.py.
+
+    uvicorn async_api:app --host 0.0.0.0 --port 8080
+
+Qdrant is queried with AsyncQdrantClient and Gemini with generate_content_async, so one
+process keeps hundreds of mostly-waiting requests in flight. Transcript ingest (YouTube
+fetch, translation pool, embedding writer) stays on worker threads.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qs
+
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import request_log
+import tracing
+from utils import setup_console_encoding, sse_event
+from ai_utils import aget_ai_response, astream_ai_response, agenerate_quick_questions, build_chunk_timestamps, QUICK_QUESTIONS_MODEL
+from cache_utils import get_cached_quick_questions, store_quick_questions
+from ingest_utils import IngestInProgress, get_ingest_coordinator, ingest_transcript
+from metrics import observe_request, observe_stage, record_error, record_skip_ingest, render_metrics, set_request_labels
+from vector_store_utils import (
+    aclose_async_qdrant_client,
+    aget_collection_point_count,
+    aget_relevant_transcript_chunks,
+    collection_for_video,
+    connection_debug_info,
+    get_collection_point_count,
+    get_pooled_embeddings,
+    qdrant_status,
+    start_qdrant_probe,
+)
+
+# Load environment variables
+load_dotenv()
+
+# Set console encoding to UTF-8
+setup_console_encoding()
+
+# Threads for blocking work (ingest, SQLite cache); ingest holds one for its whole duration
+ASYNC_THREADPOOL_SIZE = int(os.getenv('ASYNC_THREADPOOL_SIZE', '64'))
+
+BROAD_QUERY = "main topics discussed content overview summary"
+
+
+async def _timed(awaitable, stage: str = None, model: str = None):
+    # Await and measure; with a stage name the duration also goes to the stage histogram
+    start = time.perf_counter()
+    result = await awaitable
+    seconds = time.perf_counter() - start
+    if stage:
+        observe_stage(stage, seconds, model=model)
+    return result, int(seconds * 1000)
+
+async def _warm_up_embedder(api_key):
+    # Opens the embedding client and caches the quick-questions query vector
+    try:
+        await get_pooled_embeddings(api_key).aembed_query(BROAD_QUERY)
+    except Exception as e:
+        print(f"Embedder warm-up failed: {str(e)}", flush=True)
+
+def _error(message, status_code):
+    return JSONResponse({"success": False, "error": message}, status_code=status_code)
+
+
+class RequestMetricsMiddleware:
+    """
+    Sets the endpoint metrics label for each request, records its latency and keeps
+    its trace (for streaming responses, until the last frame is sent).
+    """
+
+    def __init__(self, app, paths):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        endpoint = scope['path'] if scope['path'] in self.paths else 'other'
+        set_request_labels(endpoint=endpoint, model='')
+        request_log.begin_request(endpoint)
+        trace = None
+        if endpoint not in tracing.UNTRACED_ENDPOINTS:
+            video_id = parse_qs(scope['query_string'].decode()).get('video_id', [None])[0]
+            trace = tracing.start_trace(f"{scope['method']} {endpoint}", video_id=video_id)
+        start = time.perf_counter()
+        status = {'code': 500}
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            observe_request(endpoint, status['code'], elapsed)
+            request_log.end_request(status['code'], elapsed)
+            tracing.finish_trace(trace, status=status['code'])
+
+
+async def metrics(request):
+    """
+    Prometheus metrics: stage latency histograms and cache/fallback/skip-ingest/error counters.
+    """
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+
+async def debug_traces(request):
+    """
+    Recent or slowest request span trees; same parameters and X-Debug-Token auth as api.py.
+    """
+    if not tracing.TRACE_DEBUG_TOKEN:
+        return _error("Trace debugging is disabled (TRACE_DEBUG_TOKEN not set)", 404)
+    if not tracing.debug_token_valid(request.headers.get('X-Debug-Token')):
+        return _error("Invalid or missing X-Debug-Token header", 401)
+    try:
+        limit = int(request.query_params.get('limit', '20'))
+    except ValueError:
+        return _error("limit must be an integer", 400)
+    payload, status = tracing.traces_payload(
+        view=request.query_params.get('view', 'slowest'),
+        limit=limit,
+        trace_id=request.query_params.get('trace_id'),
+        fmt=request.query_params.get('format', 'tree'),
+    )
+    return JSONResponse(payload, status_code=status)
+
+async def debug_connection(request):
+    """
+    Qdrant connectivity and cache stats, as in api.py.
+    """
+    try:
+        return JSONResponse({"success": True, "debug_info": await asyncio.to_thread(connection_debug_info)})
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e), "error_type": type(e).__name__}, status_code=500)
+
+async def readiness(request):
+    """
+    Readiness check: 200 once the background probe has reached Qdrant, 503 otherwise.
+    """
+    status = qdrant_status()
+    return JSONResponse({"ready": status["ready"], "qdrant": status}, status_code=200 if status["ready"] else 503)
+
+async def get_transcript(request):
+    """
+    Extract transcript from YouTube video and process it for RAG system
+    """
+    video_id = request.query_params.get('video_id')
+    languages = request.query_params.get('languages')
+    api_key = request.headers.get('X-API-Key')
+    request_log.note(video_id=video_id, languages=languages)
+
+    if not video_id:
+        return _error("Missing video_id parameter", 400)
+    if not api_key:
+        return _error("Missing API key in X-API-Key header", 400)
+
+    collection_name = collection_for_video(video_id)
+    overall_start = time.perf_counter()
+
+    # Count check and quick-questions cache lookup are independent
+    (existing_points, count_ms), (cached_questions, cache_ms) = await asyncio.gather(
+        _timed(aget_collection_point_count(collection_name, video_id), 'count_check'),
+        _timed(asyncio.to_thread(get_cached_quick_questions, video_id, QUICK_QUESTIONS_MODEL), 'quick_questions_cache'),
+    )
+    print(f"⏱️ Existing collection count check took {count_ms} ms (count={existing_points})", flush=True)
+
+    if existing_points > 0:
+        response = await _skip_ingest_response(video_id, api_key, collection_name, count_ms, overall_start, cached_questions, cache_ms)
+        if response is not None:
+            return response
+
+    # Fetch, store and generate quick-questions once per video, even under concurrent requests
+    coordinator = get_ingest_coordinator()
+    # Warm the embedder while the transcript is fetched, so the quick-questions search after ingest finds it ready
+    warm_up = asyncio.create_task(_warm_up_embedder(api_key))
+    try:
+        result = await coordinator.arun(
+            video_id,
+            lambda: ingest_transcript(video_id, languages, api_key, collection_name),
+            already_done=lambda: get_collection_point_count(collection_name, video_id) > 0,
+        )
+    except IngestInProgress as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=503, headers={'Retry-After': str(e.retry_after)})
+    except Exception as e:
+        print(f"Ingest of '{video_id}' failed: {str(e)}", flush=True)
+        record_error('ingest')
+        return _error(str(e), 500)
+    finally:
+        await warm_up
+
+    if result.get('ingested_by_peer'):
+        response = await _skip_ingest_response(video_id, api_key, collection_name, None, overall_start, None, None)
+        if response is not None:
+            return response
+        result = {'success': True, 'quick-questions': []}
+
+    total_ms = int((time.perf_counter() - overall_start) * 1000)
+    result.setdefault('timings', {})['total_endpoint_ms'] = total_ms
+    print(f"⏱️ /api/transcript total time {total_ms} ms (async)", flush=True)
+    return JSONResponse(result)
+
+async def _skip_ingest_response(video_id, api_key, collection_name, count_ms, overall_start, cached_questions, cache_ms):
+    """
+    Async variant of api._skip_ingest_response; None means fall back to ingest.
+    """
+    if cached_questions is not None:
+        record_skip_ingest()
+        request_log.note(skipped_ingest=True)
+        total_ms = int((time.perf_counter() - overall_start) * 1000)
+        print(f"⏱️ Quick-questions cache hit; /api/transcript total time {total_ms} ms (skip-ingest path, async)", flush=True)
+        return JSONResponse({
+            "success": True,
+            "detected_lang": None,
+            "quick-questions": cached_questions,
+            "timings": {
+                "existing_collection_count_ms": count_ms,
+                "quick_questions_cache_ms": cache_ms,
+                "total_endpoint_ms": total_ms,
+                "skipped_ingest": True,
+                "quick_questions_cached": True
+            }
+        })
+
+    try:
+        relevant_chunks, quick_similarity_ms = await _timed(
+            aget_relevant_transcript_chunks(BROAD_QUERY, api_key, collection_name, k=2, video_id=video_id),
+            'similarity_search',
+        )
+        quick_questions, qq_ms = await _timed(
+            agenerate_quick_questions(relevant_chunks, api_key), 'quick_questions', model=QUICK_QUESTIONS_MODEL
+        )
+        await asyncio.to_thread(store_quick_questions, video_id, QUICK_QUESTIONS_MODEL, quick_questions)
+        record_skip_ingest()
+        request_log.note(skipped_ingest=True)
+
+        total_ms = int((time.perf_counter() - overall_start) * 1000)
+        print(f"⏱️ /api/transcript total time {total_ms} ms (skip-ingest path, async)", flush=True)
+        return JSONResponse({
+            "success": True,
+            "detected_lang": None,
+            "quick-questions": quick_questions,
+            "timings": {
+                "existing_collection_count_ms": count_ms,
+                "quick_similarity_search_ms": quick_similarity_ms,
+                "quick_question_generation_ms": qq_ms,
+                "total_endpoint_ms": total_ms,
+                "skipped_ingest": True
+            }
+        })
+    except Exception as e:
+        print(f"Skip-ingest path failed: {str(e)}; proceeding to fetch transcript", flush=True)
+        record_error('skip_ingest')
+        return None
+
+async def query_transcript(request, stream=False):
+    """
+    Query the processed transcript using RAG system
+    """
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        api_key = request.headers.get('X-API-Key')
+
+        if not data or 'query' not in data:
+            return _error("Missing query in request body", 400)
+        if not api_key:
+            return _error("Missing API key in X-API-Key header", 400)
+
+        video_id = data.get('video_id')
+        if not video_id:
+            return _error("Missing video_id in request body", 400)
+
+        model = data.get('model', 'gemini-flash')
+        print(f"Using model: {model}", flush=True)
+        set_request_labels(model=model)
+        tracing.set_attribute('video_id', video_id)
+
+        user_query = data['query']
+        request_log.note_query(video_id, user_query, model)
+        collection_name = collection_for_video(video_id)
+
+        if stream or request.query_params.get('stream') == '1':
+            return _stream_query_response(user_query, api_key, video_id, collection_name, model)
+
+        relevant_chunks, ss_ms = await _timed(
+            aget_relevant_transcript_chunks(user_query, api_key, collection_name, video_id=video_id),
+            'similarity_search',
+        )
+        print(f"⏱️ Query similarity search took {ss_ms} ms (async)", flush=True)
+
+        response_data, ai_ms = await _timed(
+            aget_ai_response(user_query, relevant_chunks, api_key, model=model), 'ai_generation'
+        )
+        print(f"⏱️ AI response generation took {ai_ms} ms with model {model} (async)", flush=True)
+
+        return JSONResponse({
+            "success": True,
+            "response": response_data["content"],
+            "timestamps": response_data["timestamps"],
+            "timings": {
+                "similarity_search_ms": ss_ms,
+                "ai_generation_ms": ai_ms
+            }
+        })
+
+    except Exception as e:
+        record_error('query')
+        return _error(str(e), 500)
+
+async def query_transcript_stream(request):
+    """
+    Server-Sent Events variant of /api/query (same as POST /api/query?stream=1)
+    """
+    return await query_transcript(request, stream=True)
+
+def _stream_query_response(user_query, api_key, video_id, collection_name, model):
+    """
+    Same SSE frames as api._stream_query_response: retrieval, delta/fallback, done (or error).
+    """
+    async def generate():
+        overall_start = time.perf_counter()
+        try:
+            relevant_chunks, ss_ms = await _timed(
+                aget_relevant_transcript_chunks(user_query, api_key, collection_name, video_id=video_id),
+                'similarity_search',
+            )
+            print(f"⏱️ Query similarity search took {ss_ms} ms (async streaming)", flush=True)
+            yield sse_event("retrieval", {
+                "timestamps": build_chunk_timestamps(relevant_chunks),
+                "similarity_search_ms": ss_ms
+            })
+
+            ai_start = time.perf_counter()
+            async for event, payload in astream_ai_response(user_query, relevant_chunks, api_key, model=model):
+                if event == "done":
+                    ai_ms = int((time.perf_counter() - ai_start) * 1000)
+                    observe_stage('ai_generation', ai_ms / 1000)
+                    observe_stage('stream_total', time.perf_counter() - overall_start)
+                    timings = {
+                        "similarity_search_ms": ss_ms,
+                        "ai_generation_ms": ai_ms,
+                        "total_endpoint_ms": int((time.perf_counter() - overall_start) * 1000)
+                    }
+                    timings.update(payload.get("timings", {}))
+                    print(f"⏱️ AI streamed response took {ai_ms} ms with model {payload.get('model')} (async)", flush=True)
+                    yield sse_event("done", {"success": True, "model": payload.get("model"), "timings": timings})
+                else:
+                    yield sse_event(event, payload)
+        except Exception as e:
+            print(f"Streaming query failed: {str(e)}", flush=True)
+            record_error('query_stream')
+            yield sse_event("error", {"success": False, "error": str(e)})
+
+    return StreamingResponse(
+        generate(),
+        media_type='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+@asynccontextmanager
+async def lifespan(app):
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=ASYNC_THREADPOOL_SIZE))
+    start_qdrant_probe()
+    yield
+    await aclose_async_qdrant_client()
+
+def create_app():
+    """
+    Build the ASGI app.
+    """
+    routes = [
+        Route('/metrics', metrics, methods=['GET']),
+        Route('/api/ready', readiness, methods=['GET']),
+        Route('/api/debug/traces', debug_traces, methods=['GET']),
+        Route('/api/debug', debug_connection, methods=['GET']),
+        Route('/api/transcript', get_transcript, methods=['GET']),
+        Route('/api/query', query_transcript, methods=['POST']),
+        Route('/api/query/stream', query_transcript_stream, methods=['POST']),
+    ]
+    return Starlette(
+        routes=routes,
+        middleware=[
+            Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+            Middleware(RequestMetricsMiddleware, paths=[route.path for route in routes]),
+        ],
+        lifespan=lifespan,
+    )
+
+app = create_app()
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=5001)
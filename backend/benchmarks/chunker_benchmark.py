@@ -0,0 +1,134 @@
+"""
+Micro-benchmark for the transcript chunker in youtube_utils.
+
+Runs synthetic transcripts of 1k/10k/100k caption entries through
+iter_transcript_chunks (and, with --legacy, the previous quadratic chunker)
+and reports entries/sec and peak memory.
+
+Usage:
+    python benchmarks/chunker_benchmark.py
+    python benchmarks/chunker_benchmark.py --sizes 1000 10000 --repeat 5 --legacy
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from youtube_utils import iter_transcript_chunks, TARGET_CHUNK_SIZE
+
+WORDS = (
+    "the a video about learning python data model vector search transcript chunk "
+    "overlap embedding gemini qdrant lecture example today we will see how this works"
+).split()
+
+
+def make_transcript(num_entries: int, seed: int = 42):
+    """
+    Build caption entries shaped like get_transcript_safely's output (3-12 words each).
+    """
+    rng = random.Random(seed)
+    entries = []
+    start = 0.0
+    for _ in range(num_entries):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+        duration = round(rng.uniform(1.0, 5.0), 2)
+        entries.append({
+            'text': text,
+            'original_text': text,
+            'start_time': start,
+            'duration': duration,
+            'detected_language': 'en'
+        })
+        start += duration
+    return entries
+
+
+def legacy_chunker(transcript_data, video_id, detected_lang):
+    """
+    The previous chunker (minus translation): re-joins the chunk after every entry.
+    """
+    combined_entries = []
+    for entry in transcript_data:
+        combined_entries.append({
+            'text': entry['text'],
+            'start_time': entry['start_time'],
+            'duration': entry['duration'],
+            'original_text': entry['original_text']
+        })
+
+    chunks = []
+    current_chunk = []
+    current_metadata = {'start_time': 0, 'duration': 0, 'segments': [], 'video_id': video_id, 'detected_language': detected_lang}
+    for entry in combined_entries:
+        current_chunk.append(entry['text'])
+        if not current_metadata['segments']:
+            current_metadata['start_time'] = entry['start_time']
+        current_metadata['duration'] += entry['duration']
+        current_metadata['segments'].append({
+            'text': entry['text'],
+            'original_text': entry['original_text'],
+            'start_time': entry['start_time'],
+            'duration': entry['duration']
+        })
+        combined_text = ' '.join(current_chunk)
+        if len(combined_text) >= TARGET_CHUNK_SIZE:
+            chunks.append((combined_text, current_metadata.copy()))
+            overlap_segments = current_metadata['segments'][-2:]
+            current_chunk = [seg['text'] for seg in overlap_segments]
+            current_metadata = {
+                'start_time': overlap_segments[0]['start_time'],
+                'duration': sum(seg['duration'] for seg in overlap_segments),
+                'segments': overlap_segments,
+                'video_id': video_id,
+                'detected_language': detected_lang
+            }
+    if current_chunk:
+        chunks.append((' '.join(current_chunk), current_metadata.copy()))
+    return chunks
+
+
+def run_case(name, chunker, transcript, repeat):
+    best_seconds = None
+    num_chunks = 0
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        num_chunks = len(list(chunker(transcript, 'bench', 'en')))
+        elapsed = time.perf_counter() - start
+        best_seconds = elapsed if best_seconds is None else min(best_seconds, elapsed)
+
+    tracemalloc.start()
+    list(chunker(transcript, 'bench', 'en'))
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    entries_per_sec = len(transcript) / best_seconds if best_seconds else float('inf')
+    print(f"{name:<8} entries={len(transcript):>7} chunks={num_chunks:>5} "
+          f"best={best_seconds * 1000:9.1f} ms  {entries_per_sec:12,.0f} entries/s  "
+          f"peak={peak_bytes / (1024 * 1024):8.2f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--legacy', action='store_true', help='also run the previous chunker and check outputs match')
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        transcript = make_transcript(size)
+        run_case('single', iter_transcript_chunks, transcript, args.repeat)
+        if args.legacy:
+            run_case('legacy', legacy_chunker, transcript, args.repeat)
+            new_output = [(text, meta['start_time'], meta['duration'], meta['segment_end'] - meta['segment_start']) for text, meta in iter_transcript_chunks(transcript, 'bench', 'en')]
+            old_output = [(text, meta['start_time'], meta['duration'], len(meta['segments'])) for text, meta in legacy_chunker(transcript, 'bench', 'en')]
+            print(f"         outputs match: {new_output == old_output}")
+
+
+if __name__ == '__main__':
+    main()
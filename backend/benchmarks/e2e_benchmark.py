@@ -0,0 +1,481 @@
+"""
+Offline end-to-end benchmark for the Flask backend.
+
+Serves api.create_app() on a local port with stand-ins for every external
+dependency, then drives /api/transcript and /api/query over HTTP at a given
+concurrency and reports latency percentiles and throughput per phase:
+
+- YouTube: a fake YouTubeTranscriptApi serving synthetic transcripts
+  (--entries captions per video, --language en|hi, --youtube-latency-ms per fetch)
+- Gemini embeddings: deterministic hash-seeded 768-d vectors (--embed-latency-ms per call)
+- Gemini generation: canned answers / quick questions (--generate-latency-ms per call)
+- Qdrant: QdrantClient(":memory:")
+
+Caches, segment files, lexical indexes, cached transcripts and ingest locks go to a temporary directory, and
+translation is disabled (deep-translator needs the network).
+
+Phases: ingest (first open of each video), reopen (skip-ingest path),
+query (/api/query) and, with --stream, query_stream (/api/query/stream).
+
+Usage:
+    python benchmarks/e2e_benchmark.py
+    python benchmarks/e2e_benchmark.py --videos 50 --queries 500 --concurrency 16 --stream
+    python benchmarks/e2e_benchmark.py --output run.json --compare baseline.json
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+EMBEDDING_SIZE = 768
+API_KEY = 'benchmark-key'
+
+WORDS = {
+    'en': (
+        "the a video about learning python data model vector search transcript chunk "
+        "overlap embedding gemini qdrant lecture example today we will see how this works"
+    ).split(),
+    'hi': (
+        "यह एक वीडियो है जिसमें हम सीखेंगे कि डेटा मॉडल कैसे काम करता है आज हम "
+        "उदाहरण देखेंगे और समझेंगे खोज प्रणाली के बारे में"
+    ).split(),
+}
+
+QUESTIONS = (
+    "What is this video about?",
+    "How does vector search work here?",
+    "Summarize the main example.",
+    "What does the speaker say about embeddings?",
+    "Which tools are used in the lecture?",
+)
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+# --- Stand-ins ------------------------------------------------------------
+
+class FakeSnippet:
+    def __init__(self, text, start, duration):
+        self.text = text
+        self.start = start
+        self.duration = duration
+
+
+class FakeTranscript:
+    def __init__(self, video_id, language_code, num_entries, latency_ms, is_generated=False):
+        self.video_id = video_id
+        self.language_code = language_code
+        self.is_generated = is_generated
+        self.num_entries = num_entries
+        self.latency_ms = latency_ms
+
+    def fetch(self):
+        time.sleep(self.latency_ms / 1000)
+        rng = random.Random(self.video_id)
+        words = WORDS.get(self.language_code, WORDS['en'])
+        snippets = []
+        start = 0.0
+        for _ in range(self.num_entries):
+            duration = round(rng.uniform(1.0, 5.0), 2)
+            snippets.append(FakeSnippet(" ".join(rng.choice(words) for _ in range(rng.randint(3, 12))), start, duration))
+            start += duration
+        return snippets
+
+
+class FakeYouTubeTranscriptApi:
+    """
+    Serves one synthetic caption track per video; list() and fetch() each take latency_ms.
+    """
+
+    def __init__(self, num_entries, language_code='en', latency_ms=0):
+        self.num_entries = num_entries
+        self.language_code = language_code
+        self.latency_ms = latency_ms
+
+    def list(self, video_id):
+        time.sleep(self.latency_ms / 1000)
+        return [FakeTranscript(video_id, self.language_code, self.num_entries, self.latency_ms)]
+
+
+def fake_vector(text: str):
+    """
+    Deterministic unit vector for a text (same text, same vector across runs).
+    """
+    import numpy as np
+    seed = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+    vector = np.random.default_rng(seed).standard_normal(EMBEDDING_SIZE)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def make_fake_embeddings(latency_ms):
+    from langchain_core.embeddings import Embeddings
+
+    class FakeEmbeddings(Embeddings):
+        def embed_documents(self, texts):
+            time.sleep(latency_ms / 1000)
+            return [fake_vector(text) for text in texts]
+
+        def embed_query(self, text):
+            time.sleep(latency_ms / 1000)
+            return fake_vector(text)
+
+        async def aembed_query(self, text):
+            import asyncio
+            await asyncio.sleep(latency_ms / 1000)
+            return fake_vector(text)
+
+    return FakeEmbeddings()
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.candidates = []
+        self.prompt_feedback = None
+
+
+def make_fake_generative_model(latency_ms, quick_questions_model):
+    class FakeGenerativeModel:
+        """
+        Answers after latency_ms; streaming spreads the same latency over a few deltas.
+        """
+        # Per-key clients attached by ai_utils._gemini_model (unused by the fake)
+        _client = None
+        _async_client = None
+
+        def __init__(self, model_name, *args, **kwargs):
+            self.model_name = model_name
+
+        def _text(self, prompt):
+            if self.model_name == quick_questions_model:
+                return json.dumps([f"Question {i + 1} about this video?" for i in range(3)])
+            digest = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:8]
+            return f"Synthetic answer {digest} based on the retrieved transcript chunks."
+
+        def generate_content(self, prompt, stream=False, **kwargs):
+            text = self._text(prompt)
+            if not stream:
+                time.sleep(latency_ms / 1000)
+                return FakeResponse(text)
+
+            def deltas():
+                words = text.split(' ')
+                step = max(1, len(words) // 4)
+                pieces = [' '.join(words[i:i + step]) + ' ' for i in range(0, len(words), step)]
+                for piece in pieces:
+                    time.sleep(latency_ms / 1000 / len(pieces))
+                    yield FakeResponse(piece)
+            return deltas()
+
+        async def generate_content_async(self, prompt, **kwargs):
+            import asyncio
+            await asyncio.sleep(latency_ms / 1000)
+            return FakeResponse(self._text(prompt))
+
+    return FakeGenerativeModel
+
+
+def configure_environment(work_dir, translate=False, request_log_path=None):
+    """
+    Point on-disk state at work_dir. Must run before the backend modules are imported.
+    """
+    if request_log_path:
+        os.environ['REQUEST_LOG_PATH'] = os.path.abspath(request_log_path)
+    os.environ['QUICK_QUESTIONS_CACHE_PATH'] = os.path.join(work_dir, 'quick_questions.sqlite3')
+    os.environ['SEGMENT_STORE_DIR'] = os.path.join(work_dir, 'segments')
+    os.environ['LEXICAL_INDEX_DIR'] = os.path.join(work_dir, 'lexical')
+    os.environ['TRANSCRIPT_CACHE_DIR'] = os.path.join(work_dir, 'transcripts')
+    os.environ['INGEST_LOCK_DIR'] = os.path.join(work_dir, 'ingest-locks')
+    if not translate:
+        os.environ['DISABLE_TRANSLATION'] = 'true'
+
+
+def install_fakes(args):
+    """
+    Swap the external dependencies for the stand-ins and return the Flask app.
+    """
+    from qdrant_client import QdrantClient
+    import vector_store_utils
+    import ai_utils
+    import api
+    import ingest_utils
+
+    vector_store_utils._qdrant_client = QdrantClient(":memory:")
+    embeddings = make_fake_embeddings(args.embed_latency_ms)
+    vector_store_utils.get_embeddings = lambda api_key: vector_store_utils.CachedQueryEmbeddings(embeddings, vector_store_utils.EMBEDDING_MODEL)
+    vector_store_utils.get_pooled_embeddings = vector_store_utils.get_embeddings
+    ai_utils.genai.GenerativeModel = make_fake_generative_model(args.generate_latency_ms, ai_utils.QUICK_QUESTIONS_MODEL)
+    ingest_utils.ytt_api = FakeYouTubeTranscriptApi(args.entries, args.language, args.youtube_latency_ms)
+    return api.create_app()
+
+
+def serve(app):
+    """
+    Run the app on a free local port in a background thread; returns (base_url, server).
+    """
+    import logging
+    from werkzeug.serving import make_server
+
+    # One access-log line per request would drown the backend's own timing output
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='benchmark-server', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+# --- Load generation and statistics ---------------------------------------
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize_latencies(latencies_ms):
+    values = sorted(latencies_ms)
+    if not values:
+        return {"count": 0}
+    summary = {"count": len(values), "mean_ms": round(sum(values) / len(values), 2)}
+    for pct in PERCENTILES:
+        summary[f"p{pct}_ms"] = round(percentile(values, pct), 2)
+    summary["max_ms"] = round(values[-1], 2)
+    return summary
+
+
+def summarize_timings(timings_list, percentiles=(50, 95)):
+    """
+    Percentiles of every numeric field in the endpoints' `timings` objects.
+    """
+    fields = {}
+    for timings in timings_list:
+        for key, value in (timings or {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                fields.setdefault(key, []).append(value)
+    summary = {}
+    for key, values in sorted(fields.items()):
+        values.sort()
+        summary[key] = {"count": len(values), **{f"p{pct}": percentile(values, pct) for pct in percentiles}}
+    return summary
+
+
+def _read_stream(response):
+    """
+    Consume an SSE response; returns (first delta ms, final timings, error).
+    """
+    first_delta_ms = None
+    timings, error = None, None
+    event = None
+    start = time.perf_counter()
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith('event: '):
+            event = line[len('event: '):]
+        elif line.startswith('data: '):
+            if event == 'delta' and first_delta_ms is None:
+                first_delta_ms = (time.perf_counter() - start) * 1000
+            elif event == 'done':
+                timings = json.loads(line[len('data: '):]).get('timings')
+            elif event == 'error':
+                error = json.loads(line[len('data: '):]).get('error', 'stream error')
+    return first_delta_ms, timings, error
+
+
+def send_request(session, base_url, request_spec, api_key=API_KEY):
+    """
+    Send one request described by {'endpoint', 'video_id', ['languages', 'query', 'model']}.
+    Returns {'latency_ms', 'status', 'ok', 'timings', ['first_delta_ms'], ['error']}.
+    """
+    endpoint = request_spec['endpoint']
+    headers = {'X-API-Key': api_key}
+    start = time.perf_counter()
+    result = {}
+    try:
+        if endpoint == '/api/transcript':
+            params = {'video_id': request_spec['video_id']}
+            if request_spec.get('languages'):
+                params['languages'] = request_spec['languages']
+            response = session.get(base_url + endpoint, params=params, headers=headers, timeout=600)
+            body = response.json()
+            result.update(ok=response.ok and body.get('success', False), timings=body.get('timings'), error=body.get('error'))
+        else:
+            payload = {'video_id': request_spec['video_id'], 'query': request_spec['query'], 'model': request_spec.get('model', 'gemini-flash')}
+            stream = endpoint == '/api/query/stream'
+            response = session.post(base_url + endpoint, json=payload, headers=headers, timeout=600, stream=stream)
+            if stream:
+                first_delta_ms, timings, error = _read_stream(response)
+                result.update(ok=response.ok and error is None, timings=timings, error=error, first_delta_ms=first_delta_ms)
+            else:
+                body = response.json()
+                result.update(ok=response.ok and body.get('success', False), timings=body.get('timings'), error=body.get('error'))
+        result['status'] = response.status_code
+    except Exception as e:
+        result.update(ok=False, status=None, timings=None, error=f"{type(e).__name__}: {e}")
+    result['latency_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def run_phase(name, base_url, requests_specs, concurrency):
+    """
+    Send all requests with `concurrency` client threads; returns the phase summary.
+    """
+    import requests
+
+    local = threading.local()
+
+    def worker(spec):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return send_request(local.session, base_url, spec)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(worker, requests_specs))
+    wall_seconds = time.perf_counter() - start
+
+    errors = [r for r in results if not r['ok']]
+    summary = {
+        "requests": len(results),
+        "errors": len(errors),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(len(results) / wall_seconds, 2) if wall_seconds > 0 else None,
+        "latency": summarize_latencies([r['latency_ms'] for r in results if r['ok']]),
+        "server_timings": summarize_timings([r['timings'] for r in results if r['ok']]),
+    }
+    first_deltas = [r['first_delta_ms'] for r in results if r.get('first_delta_ms') is not None]
+    if first_deltas:
+        summary["first_delta"] = summarize_latencies(first_deltas)
+    if errors:
+        summary["sample_errors"] = sorted({str(r.get('error') or r.get('status')) for r in errors})[:5]
+    return summary
+
+
+def build_phases(args):
+    rng = random.Random(args.seed)
+    video_ids = [f"bench{i:04d}" for i in range(args.videos)]
+    phases = [
+        ('ingest', [{'endpoint': '/api/transcript', 'video_id': v} for v in video_ids]),
+        ('reopen', [{'endpoint': '/api/transcript', 'video_id': v} for v in video_ids for _ in range(args.reopens)]),
+        ('query', [{'endpoint': '/api/query', 'video_id': rng.choice(video_ids), 'query': rng.choice(QUESTIONS)} for _ in range(args.queries)]),
+    ]
+    if args.stream:
+        phases.append(('query_stream', [{'endpoint': '/api/query/stream', 'video_id': rng.choice(video_ids), 'query': rng.choice(QUESTIONS)} for _ in range(args.queries)]))
+    return [(name, specs) for name, specs in phases if specs]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def print_summary(results):
+    print(f"\n{'phase':<14}{'reqs':>7}{'err':>5}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for name, phase in results.items():
+        latency = phase['latency']
+        print(f"{name:<14}{phase['requests']:>7}{phase['errors']:>5}{phase['throughput_rps'] or 0:>9.1f}"
+              f"{latency.get('p50_ms', 0):>10.1f}{latency.get('p95_ms', 0):>10.1f}"
+              f"{latency.get('p99_ms', 0):>10.1f}{latency.get('max_ms', 0):>10.1f}")
+
+
+def print_comparison(results, baseline):
+    """
+    Per-phase p50/p95/throughput change against an earlier run's JSON.
+    """
+    print(f"\nCompared with {baseline.get('started_at')} (commit {baseline.get('environment', {}).get('git_commit')}):")
+    for name, phase in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        parts = []
+        for key in ('p50_ms', 'p95_ms'):
+            old, new = previous['latency'].get(key), phase['latency'].get(key)
+            if old and new is not None:
+                parts.append(f"{key[:-3]} {old:.1f} → {new:.1f} ms ({(new - old) / old * 100:+.1f}%)")
+        old_rps, new_rps = previous.get('throughput_rps'), phase.get('throughput_rps')
+        if old_rps and new_rps is not None:
+            parts.append(f"rps {old_rps:.1f} → {new_rps:.1f} ({(new_rps - old_rps) / old_rps * 100:+.1f}%)")
+        print(f"  {name:<14}" + ", ".join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--videos', type=int, default=20, help='distinct videos to ingest')
+    parser.add_argument('--reopens', type=int, default=2, help='repeat opens per video')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--stream', action='store_true', help='also benchmark /api/query/stream')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--entries', type=int, default=2000, help='caption entries per synthetic transcript')
+    parser.add_argument('--language', choices=sorted(WORDS), default='en')
+    parser.add_argument('--translate', action='store_true', help='keep translation enabled for --language hi (needs network)')
+    parser.add_argument('--youtube-latency-ms', type=float, default=150)
+    parser.add_argument('--embed-latency-ms', type=float, default=40)
+    parser.add_argument('--generate-latency-ms', type=float, default=400)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='results JSON (default: benchmarks/results/e2e-<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    parser.add_argument('--quiet', action='store_true', help="silence the backend's own logging")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='e2e-benchmark-')
+    configure_environment(work_dir, translate=args.translate)
+    app = install_fakes(args)
+    base_url, server = serve(app)
+    started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+    results = {}
+    real_stdout = sys.stdout
+    if args.quiet:
+        sys.stdout = open(os.devnull, 'w')
+    try:
+        for name, specs in build_phases(args):
+            print(f"▶ {name}: {len(specs)} requests at concurrency {args.concurrency}", file=real_stdout, flush=True)
+            results[name] = run_phase(name, base_url, specs, args.concurrency)
+    finally:
+        server.shutdown()
+        if args.quiet:
+            sys.stdout.close()
+            sys.stdout = real_stdout
+
+    report = {
+        "benchmark": "e2e",
+        "started_at": started_at,
+        "config": {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'quiet')},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "git_commit": _git_commit(),
+        },
+        "results": results,
+    }
+
+    print_summary(results)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+
+    output = args.output or os.path.join(BACKEND_DIR, 'benchmarks', 'results', f"e2e-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+"""
+Open-loop load generator: replays a recorded or synthetic request mix at a target
+QPS and reports p50/p95/p99 per endpoint, per request kind and per stage (from the
+`timings` objects the endpoints return).
+
+Request kinds:
+- ingest: /api/transcript for a video the backend has not seen
+- reopen: /api/transcript for a popular, already ingested video (skip-ingest path)
+- query / query_stream: follow-up questions about popular videos
+
+Recorded mixes come from the backend's own request log: run it with
+REQUEST_LOG_PATH=requests.jsonl (see request_log.py) and pass the file to --log.
+Query text is only logged with REQUEST_LOG_QUERIES=true; otherwise a query of
+the recorded length is synthesized.
+
+Requests are sent on schedule whether or not earlier ones have finished
+(up to --max-in-flight), so a saturated backend shows up as growing latency
+and schedule lag rather than as a lower send rate.
+
+Usage:
+    # Synthetic mix against a running backend (real video IDs for ingests/reopens)
+    python benchmarks/load_replay.py --url http://localhost:8080 --api-key $KEY \\
+        --video-ids ids.txt --qps 20 --duration 120
+
+    # Replay a recorded log at 3x its original pace
+    python benchmarks/load_replay.py --url http://localhost:8080 --api-key $KEY \\
+        --log requests.jsonl --preserve-timing --speed 3
+
+    # Dry run against the in-process fakes of e2e_benchmark.py, recording a replayable log
+    python benchmarks/load_replay.py --offline --qps 10 --duration 30 --request-log mix.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from e2e_benchmark import (
+    API_KEY,
+    BACKEND_DIR,
+    QUESTIONS,
+    _git_commit,
+    configure_environment,
+    install_fakes,
+    percentile,
+    send_request,
+    serve,
+    summarize_timings,
+)
+
+REPLAY_PERCENTILES = (50, 95, 99)
+KIND_ENDPOINTS = {
+    'ingest': '/api/transcript',
+    'reopen': '/api/transcript',
+    'query': '/api/query',
+    'query_stream': '/api/query/stream',
+}
+DEFAULT_MIX = 'ingest=0.1,reopen=0.3,query=0.6'
+
+
+def parse_mix(text):
+    """
+    'ingest=0.1,reopen=0.3,query=0.6' -> normalized {kind: weight}.
+    """
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in KIND_ENDPOINTS:
+            raise ValueError(f"Unknown request kind '{kind}' (expected one of {', '.join(KIND_ENDPOINTS)})")
+        mix[kind] = float(weight)
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("Mix weights must add up to more than 0")
+    return {kind: weight / total for kind, weight in mix.items()}
+
+
+def synthesize_query(chars, rng):
+    """
+    A question of roughly `chars` characters built from the canned questions.
+    """
+    text = rng.choice(QUESTIONS)
+    while len(text) < chars:
+        text += ' ' + rng.choice(QUESTIONS)
+    return text[:max(chars, 1)]
+
+
+def synthetic_schedule(args, rng):
+    """
+    (offset seconds, request spec) pairs for a synthetic mix at args.qps.
+    Popular videos are picked with a Zipf-like skew; ingests take fresh video IDs.
+    """
+    mix = parse_mix(args.mix)
+    kinds, weights = zip(*mix.items())
+    if args.video_ids:
+        with open(args.video_ids) as f:
+            pool = [line.strip() for line in f if line.strip()]
+        popular, fresh = pool[:args.popular_videos], iter(pool[args.popular_videos:])
+    else:
+        popular = [f"replay-popular-{i:03d}" for i in range(args.popular_videos)]
+        fresh = (f"replay-new-{args.seed}-{i:05d}" for i in range(10 ** 6))
+    popularity = [1 / (rank + 1) ** args.zipf for rank in range(len(popular))]
+
+    total = args.requests if args.requests is not None else int(args.qps * args.duration)
+    schedule = []
+    offset = 0.0
+    for _ in range(total):
+        kind = rng.choices(kinds, weights)[0]
+        if kind == 'ingest':
+            video_id = next(fresh, None)
+            if video_id is None:
+                kind, video_id = 'reopen', rng.choices(popular, popularity)[0]
+        else:
+            video_id = rng.choices(popular, popularity)[0]
+        spec = {'kind': kind, 'endpoint': KIND_ENDPOINTS[kind], 'video_id': video_id}
+        if kind.startswith('query'):
+            spec['query'] = rng.choice(QUESTIONS)
+        schedule.append((offset, spec))
+        offset += rng.expovariate(args.qps) if args.poisson else 1 / args.qps
+    return schedule, popular
+
+
+def recorded_schedule(args, rng):
+    """
+    (offset seconds, request spec) pairs from a REQUEST_LOG_PATH file, either at the
+    recorded pace (--preserve-timing, scaled by --speed) or evenly spaced at args.qps.
+    """
+    records = []
+    with open(args.log, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    # Lines are written when requests finish; replay in arrival order
+    records = sorted(
+        (r for r in records if r.get('endpoint') in KIND_ENDPOINTS.values() and r.get('video_id')),
+        key=lambda r: r.get('ts', 0),
+    )
+    if not records:
+        raise ValueError(f"No replayable requests in {args.log}")
+
+    limit = args.requests or (None if args.preserve_timing else int(args.qps * args.duration))
+    first_ts = records[0].get('ts', 0)
+    schedule = []
+    offset = 0.0
+    for i in range(limit or len(records)):
+        record = records[i % len(records)]
+        cycle = i // len(records)
+        if record['endpoint'] == '/api/transcript':
+            kind = 'reopen' if record.get('skipped_ingest') else 'ingest'
+        else:
+            kind = 'query_stream' if record['endpoint'].endswith('/stream') else 'query'
+        spec = {'kind': kind, 'endpoint': record['endpoint'], 'video_id': record['video_id']}
+        if record.get('languages'):
+            spec['languages'] = record['languages']
+        if kind.startswith('query'):
+            spec['query'] = record.get('query') or synthesize_query(record.get('query_chars', 40), rng)
+            spec['model'] = record.get('model', 'gemini-flash')
+        if args.preserve_timing:
+            span = records[-1].get('ts', 0) - first_ts + 1
+            offset = (record.get('ts', first_ts) - first_ts + cycle * span) / args.speed
+        schedule.append((offset, spec))
+        if not args.preserve_timing:
+            offset += rng.expovariate(args.qps) if args.poisson else 1 / args.qps
+    return sorted(schedule, key=lambda item: item[0]), []
+
+
+def run_schedule(base_url, schedule, api_key, max_in_flight):
+    """
+    Send every request at its offset from the start; returns the result records.
+    """
+    import requests
+
+    local = threading.local()
+    results = []
+    results_lock = threading.Lock()
+
+    def worker(spec, scheduled_at):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        lag_ms = (time.perf_counter() - scheduled_at) * 1000
+        result = send_request(local.session, base_url, spec, api_key=api_key)
+        result.update(kind=spec['kind'], endpoint=spec['endpoint'], lag_ms=lag_ms)
+        if spec['kind'] in ('ingest', 'reopen') and result.get('timings'):
+            # What the backend actually did, which may differ from what the mix intended
+            result['kind'] = 'reopen' if result['timings'].get('skipped_ingest') else 'ingest'
+        with results_lock:
+            results.append(result)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for offset, spec in schedule:
+            scheduled_at = start + offset
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(worker, spec, scheduled_at)
+    return results, time.perf_counter() - start
+
+
+def summarize_group(results, wall_seconds):
+    ok = [r for r in results if r['ok']]
+    latencies = sorted(r['latency_ms'] for r in ok)
+    lags = sorted(r['lag_ms'] for r in results)
+    summary = {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "achieved_qps": round(len(results) / wall_seconds, 2) if wall_seconds > 0 else None,
+        "latency_ms": {f"p{pct}": round(percentile(latencies, pct), 1) for pct in REPLAY_PERCENTILES} if latencies else {},
+        "schedule_lag_ms": {f"p{pct}": round(percentile(lags, pct), 1) for pct in REPLAY_PERCENTILES} if lags else {},
+        "stages": summarize_timings([r['timings'] for r in ok], percentiles=REPLAY_PERCENTILES),
+    }
+    first_deltas = sorted(r['first_delta_ms'] for r in ok if r.get('first_delta_ms') is not None)
+    if first_deltas:
+        summary["first_delta_ms"] = {f"p{pct}": round(percentile(first_deltas, pct), 1) for pct in REPLAY_PERCENTILES}
+    errors = [r for r in results if not r['ok']]
+    if errors:
+        summary["sample_errors"] = sorted({str(r.get('error') or r.get('status')) for r in errors})[:5]
+    return summary
+
+
+def build_report(results, wall_seconds):
+    by_endpoint, by_kind = {}, {}
+    for result in results:
+        by_endpoint.setdefault(result['endpoint'], []).append(result)
+        by_kind.setdefault(result['kind'], []).append(result)
+    return {
+        "overall": summarize_group(results, wall_seconds),
+        "endpoints": {name: summarize_group(group, wall_seconds) for name, group in sorted(by_endpoint.items())},
+        "kinds": {name: summarize_group(group, wall_seconds) for name, group in sorted(by_kind.items())},
+    }
+
+
+def print_report(report, target_qps):
+    def row(name, group):
+        latency = group['latency_ms']
+        print(f"{name:<22}{group['requests']:>7}{group['errors']:>6}{group['achieved_qps'] or 0:>8.1f}"
+              f"{latency.get('p50', 0):>10.1f}{latency.get('p95', 0):>10.1f}{latency.get('p99', 0):>10.1f}"
+              f"{group['schedule_lag_ms'].get('p95', 0):>10.1f}")
+
+    print(f"\n{'group':<22}{'reqs':>7}{'err':>6}{'qps':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'lag p95':>10}")
+    row('overall', report['overall'])
+    for name, group in report['endpoints'].items():
+        row(name, group)
+    for name, group in report['kinds'].items():
+        row(f"kind:{name}", group)
+
+    print(f"\n{'stage (ms)':<44}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for endpoint, group in report['endpoints'].items():
+        for stage, stats in group['stages'].items():
+            if not stage.endswith('_ms'):
+                continue
+            print(f"{endpoint.rsplit('/', 1)[-1] + ':' + stage:<44}{stats['count']:>6}{stats['p50']:>9}{stats['p95']:>9}{stats['p99']:>9}")
+
+    if target_qps and report['overall']['achieved_qps'] and report['overall']['achieved_qps'] < 0.9 * target_qps:
+        print(f"\n⚠️ Achieved {report['overall']['achieved_qps']} QPS of {target_qps} targeted; "
+              f"raise --max-in-flight or the backend is saturated (see schedule lag)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_argument_group('target')
+    target.add_argument('--url', help='base URL of a running backend')
+    target.add_argument('--api-key', default=os.getenv('LOAD_REPLAY_API_KEY', API_KEY), help='X-API-Key to send (default: $LOAD_REPLAY_API_KEY)')
+    target.add_argument('--offline', action='store_true', help='serve the backend in-process with the e2e_benchmark fakes')
+    target.add_argument('--request-log', help='with --offline: record the run as a replayable REQUEST_LOG_PATH file')
+
+    load = parser.add_argument_group('load')
+    load.add_argument('--qps', type=float, default=10.0, help='target requests per second')
+    load.add_argument('--duration', type=float, default=60.0, help='seconds of load (ignored with --requests)')
+    load.add_argument('--requests', type=int, help='send exactly this many requests')
+    load.add_argument('--poisson', action='store_true', help='exponential inter-arrival times instead of evenly spaced')
+    load.add_argument('--max-in-flight', type=int, default=64)
+    load.add_argument('--seed', type=int, default=42)
+
+    mix = parser.add_argument_group('request mix')
+    mix.add_argument('--log', help='replay this request log instead of a synthetic mix')
+    mix.add_argument('--preserve-timing', action='store_true', help='with --log: keep the recorded inter-arrival times')
+    mix.add_argument('--speed', type=float, default=1.0, help='with --preserve-timing: replay speed-up factor')
+    mix.add_argument('--mix', default=DEFAULT_MIX, help=f'synthetic kind weights (default {DEFAULT_MIX}; kinds: {", ".join(KIND_ENDPOINTS)})')
+    mix.add_argument('--popular-videos', type=int, default=20)
+    mix.add_argument('--zipf', type=float, default=1.1, help='popularity skew of repeat opens and queries')
+    mix.add_argument('--video-ids', help='file with one real video ID per line: the first --popular-videos are the popular set, the rest are used for first-time ingests')
+    mix.add_argument('--no-warmup', action='store_true', help="don't ingest the popular videos before the measured run")
+
+    offline = parser.add_argument_group('offline fakes (see e2e_benchmark.py)')
+    offline.add_argument('--entries', type=int, default=2000)
+    offline.add_argument('--language', default='en')
+    offline.add_argument('--youtube-latency-ms', type=float, default=150)
+    offline.add_argument('--embed-latency-ms', type=float, default=40)
+    offline.add_argument('--generate-latency-ms', type=float, default=400)
+
+    parser.add_argument('--output', help='report JSON (default: benchmarks/results/replay-<timestamp>.json)')
+    args = parser.parse_args()
+
+    if bool(args.url) == bool(args.offline):
+        parser.error('pass exactly one of --url or --offline')
+
+    rng = random.Random(args.seed)
+    if args.log:
+        schedule, popular = recorded_schedule(args, rng)
+    else:
+        schedule, popular = synthetic_schedule(args, rng)
+    if not schedule:
+        parser.exit(1, "No requests to replay (--requests 0, or --log is empty after filtering)\n")
+
+    server = None
+    if args.offline:
+        configure_environment(tempfile.mkdtemp(prefix='load-replay-'), request_log_path=args.request_log)
+        base_url, server = serve(install_fakes(args))
+    else:
+        base_url = args.url.rstrip('/')
+
+    try:
+        if popular and not args.no_warmup:
+            print(f"▶ warm-up: opening {len(popular)} popular videos", flush=True)
+            warm = [(0.0, {'kind': 'ingest', 'endpoint': '/api/transcript', 'video_id': v}) for v in popular]
+            run_schedule(base_url, warm, args.api_key, min(args.max_in_flight, 8))
+
+        print(f"▶ replaying {len(schedule)} requests over ~{schedule[-1][0]:.0f}s "
+              f"({'recorded log' if args.log else 'synthetic mix'})", flush=True)
+        results, wall_seconds = run_schedule(base_url, schedule, args.api_key, args.max_in_flight)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    report = build_report(results, wall_seconds)
+    target_qps = None if args.log and args.preserve_timing else args.qps
+    print_report(report, target_qps)
+
+    output = args.output or os.path.join(BACKEND_DIR, 'benchmarks', 'results', f"replay-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            "benchmark": "load_replay",
+            "started_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "config": {key: value for key, value in vars(args).items() if key not in ('api_key', 'output')},
+            "git_commit": _git_commit(),
+            "wall_seconds": round(wall_seconds, 3),
+            "report": report,
+        }, f, indent=2)
+    print(f"\nReport written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,384 @@
+import os
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import record_cache
+
+# Quick-questions cache settings
+QUICK_QUESTIONS_CACHE_PATH = os.getenv('QUICK_QUESTIONS_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'quick_questions.sqlite3'))
+QUICK_QUESTIONS_CACHE_TTL_SECONDS = int(os.getenv('QUICK_QUESTIONS_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+QUICK_QUESTIONS_CACHE_MAX_ENTRIES = int(os.getenv('QUICK_QUESTIONS_CACHE_MAX_ENTRIES', '10000'))
+DISABLE_QUICK_QUESTIONS_CACHE = os.getenv('DISABLE_QUICK_QUESTIONS_CACHE', '').lower() == 'true'
+
+# Query-embedding cache settings
+QUERY_EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('QUERY_EMBEDDING_CACHE_MAX_ENTRIES', '2048'))
+
+# Per-video vector cache settings (VECTOR_CACHE_MAX_MB=0 disables it)
+VECTOR_CACHE_MAX_MB = int(os.getenv('VECTOR_CACHE_MAX_MB', '256'))
+VECTOR_CACHE_MAX_POINTS_PER_VIDEO = int(os.getenv('VECTOR_CACHE_MAX_POINTS_PER_VIDEO', '5000'))
+VECTOR_CACHE_TTL_SECONDS = int(os.getenv('VECTOR_CACHE_TTL_SECONDS', '900'))
+
+
+class QuickQuestionsCache:
+    """
+    Sidecar store for generated quick-questions, keyed by (video_id, model).
+    Backed by SQLite so every gunicorn worker on the host shares the same entries.
+    Entries expire after `ttl_seconds`; once the store grows past `max_entries`
+    the least recently used rows are evicted.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS quick_questions ("
+                        " video_id TEXT NOT NULL,"
+                        " model TEXT NOT NULL,"
+                        " questions TEXT NOT NULL,"
+                        " created_at REAL NOT NULL,"
+                        " last_access REAL NOT NULL,"
+                        " PRIMARY KEY (video_id, model))"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_quick_questions_last_access ON quick_questions (last_access)")
+                    conn.commit()
+                    self._initialized = True
+        return conn
+
+    def get(self, video_id: str, model: str):
+        """
+        Return the cached list of questions, or None on a miss or expired entry.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT questions, created_at FROM quick_questions WHERE video_id = ? AND model = ?",
+                (video_id, model),
+            ).fetchone()
+            if row is None:
+                return None
+            questions, created_at = row
+            if now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM quick_questions WHERE video_id = ? AND model = ?", (video_id, model))
+                conn.commit()
+                return None
+            conn.execute(
+                "UPDATE quick_questions SET last_access = ? WHERE video_id = ? AND model = ?",
+                (now, video_id, model),
+            )
+            conn.commit()
+            return json.loads(questions)
+        finally:
+            conn.close()
+
+    def set(self, video_id: str, model: str, questions) -> None:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO quick_questions (video_id, model, questions, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (video_id, model, json.dumps(questions), now, now),
+            )
+            self._evict(conn, now)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def invalidate(self, video_id: str) -> None:
+        """
+        Drop every cached entry for a video (all models), e.g. after re-ingest.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM quick_questions WHERE video_id = ?", (video_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _evict(self, conn, now: float) -> None:
+        conn.execute("DELETE FROM quick_questions WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM quick_questions").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM quick_questions WHERE rowid IN ("
+                " SELECT rowid FROM quick_questions ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+            print(f"Evicted {overflow} quick-questions cache entries (max={self.max_entries})", flush=True)
+
+
+_quick_questions_cache = None
+_quick_questions_cache_lock = threading.Lock()
+
+def get_quick_questions_cache():
+    """
+    Lazily create the process-wide quick-questions cache. Returns None when disabled.
+    """
+    global _quick_questions_cache
+    if DISABLE_QUICK_QUESTIONS_CACHE:
+        return None
+    if _quick_questions_cache is None:
+        with _quick_questions_cache_lock:
+            if _quick_questions_cache is None:
+                os.makedirs(os.path.dirname(QUICK_QUESTIONS_CACHE_PATH), exist_ok=True)
+                _quick_questions_cache = QuickQuestionsCache(
+                    QUICK_QUESTIONS_CACHE_PATH,
+                    QUICK_QUESTIONS_CACHE_TTL_SECONDS,
+                    QUICK_QUESTIONS_CACHE_MAX_ENTRIES,
+                )
+    return _quick_questions_cache
+
+def get_cached_quick_questions(video_id: str, model: str):
+    """
+    Cache lookup that never raises; returns None on miss or any cache error.
+    """
+    try:
+        cache = get_quick_questions_cache()
+        if cache is None:
+            return None
+        questions = cache.get(video_id, model)
+        record_cache('quick_questions', questions is not None)
+        return questions
+    except Exception as e:
+        print(f"Quick-questions cache lookup failed: {str(e)}", flush=True)
+        return None
+
+def store_quick_questions(video_id: str, model: str, questions) -> None:
+    """
+    Store generated questions; empty results are not cached so the next request retries.
+    """
+    if not questions:
+        return
+    try:
+        cache = get_quick_questions_cache()
+        if cache is not None:
+            cache.set(video_id, model, questions)
+    except Exception as e:
+        print(f"Quick-questions cache store failed: {str(e)}", flush=True)
+
+def invalidate_quick_questions(video_id: str) -> None:
+    try:
+        cache = get_quick_questions_cache()
+        if cache is not None:
+            cache.invalidate(video_id)
+    except Exception as e:
+        print(f"Quick-questions cache invalidation failed: {str(e)}", flush=True)
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded in-process LRU of query text -> embedding vector.
+    Keys are (embedding model, normalized query) so vectors are never mixed across models.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return re.sub(r"\s+", " ", text or "").strip().lower()
+
+    def get(self, model: str, text: str):
+        key = (model, self.normalize(text))
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        record_cache('query_embedding', vector is not None)
+        return vector
+
+    def set(self, model: str, text: str, vector) -> None:
+        key = (model, self.normalize(text))
+        with self._lock:
+            self._entries[key] = list(vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+query_embedding_cache = QueryEmbeddingCache(QUERY_EMBEDDING_CACHE_MAX_ENTRIES)
+
+
+class VideoVectorCache:
+    """
+    Bounded in-process LRU of per-video indexes: a row-normalized float32 matrix plus
+    the matching (point id, page_content, metadata) payloads, keyed by (collection, video_id).
+    Searched with an exact cosine similarity; Qdrant stays the source of truth, so
+    entries expire after `ttl_seconds` and are dropped when a video is re-ingested.
+    Videos that cannot be cached (too many points, or none) are remembered for the same
+    TTL so their queries go straight to Qdrant instead of re-scrolling the video each time.
+    """
+
+    # Bound on remembered uncacheable videos (oldest forgotten first)
+    max_uncacheable = 4096
+
+    def __init__(self, max_bytes: int, max_points_per_video: int, ttl_seconds: int):
+        self.max_bytes = max_bytes
+        self.max_points_per_video = max_points_per_video
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._entries = OrderedDict()
+        # (collection, video_id) -> time it was found uncacheable, oldest first
+        self._uncacheable = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, collection_name: str, video_id: str):
+        """
+        Return the cached entry dict ('matrix', 'payloads'), or None on a miss or expired entry.
+        """
+        key = (collection_name, video_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry['loaded_at'] > self.ttl_seconds:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        record_cache('video_vectors', entry is not None)
+        return entry
+
+    def put(self, collection_name: str, video_id: str, vectors, payloads):
+        """
+        Cache a video's vectors and payloads (same order) and return the new entry.
+        Returns None when there is nothing to cache, or when the video is too large to cache
+        (it is then marked uncacheable and keeps being searched in Qdrant).
+        """
+        if not self.enabled or not payloads:
+            return None
+        if len(payloads) > self.max_points_per_video:
+            self.mark_uncacheable(collection_name, video_id)
+            return None
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        key = (collection_name, video_id)
+        entry = {'matrix': matrix, 'payloads': list(payloads), 'loaded_at': time.time()}
+        with self._lock:
+            self._drop(key)
+            self._uncacheable.pop(key, None)
+            self._entries[key] = entry
+            self._bytes += matrix.nbytes
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+        return entry
+
+    def mark_uncacheable(self, collection_name: str, video_id: str) -> None:
+        """
+        Remember for `ttl_seconds` that the video can't be cached, so load attempts are skipped.
+        """
+        key = (collection_name, video_id)
+        with self._lock:
+            self._uncacheable[key] = time.time()
+            self._uncacheable.move_to_end(key)
+            while len(self._uncacheable) > self.max_uncacheable:
+                self._uncacheable.popitem(last=False)
+
+    def is_uncacheable(self, collection_name: str, video_id: str) -> bool:
+        key = (collection_name, video_id)
+        with self._lock:
+            marked_at = self._uncacheable.get(key)
+            if marked_at is None:
+                return False
+            if time.time() - marked_at > self.ttl_seconds:
+                del self._uncacheable[key]
+                return False
+            return True
+
+    def search(self, entry: dict, query_vector, k: int):
+        """
+        Exact cosine top-k over one cached video. Returns [(score, payload), ...] best first.
+        """
+        matrix = entry['matrix']
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        scores = matrix @ query
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(float(scores[i]), entry['payloads'][i]) for i in top]
+
+    def invalidate(self, collection_name: str, video_id: str = None) -> None:
+        """
+        Drop one video, or every video of a collection when video_id is None.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == collection_name and (video_id is None or key[1] == video_id)]:
+                self._drop(key)
+            for key in [key for key in self._uncacheable if key[0] == collection_name and (video_id is None or key[1] == video_id)]:
+                del self._uncacheable[key]
+
+    def _drop(self, key) -> None:
+        # Caller holds _lock
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry['matrix'].nbytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "videos": len(self._entries),
+                "uncacheable_videos": len(self._uncacheable),
+                "points": sum(len(entry['payloads']) for entry in self._entries.values()),
+                "megabytes": round(self._bytes / (1024 * 1024), 2),
+                "max_megabytes": round(self.max_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+video_vector_cache = VideoVectorCache(
+    VECTOR_CACHE_MAX_MB * 1024 * 1024,
+    VECTOR_CACHE_MAX_POINTS_PER_VIDEO,
+    VECTOR_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,112 @@
+import os
+from collections import namedtuple
+
+from segment_store import load_segments
+from utils import format_timestamp
+
+# Prompt context settings (tokens are estimated at CONTEXT_CHARS_PER_TOKEN characters each).
+# The default budget holds k=4 full chunks (~2500 chars each, plus line prefixes), so by default only
+# repeated overlap is removed; lower it to trade context for prompt size
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '3000'))
+CONTEXT_CHARS_PER_TOKEN = float(os.getenv('CONTEXT_CHARS_PER_TOKEN', '4'))
+# Each emitted line covers about this many characters, so timestamps stay close to the text they cite
+CONTEXT_LINE_CHARS = int(os.getenv('CONTEXT_LINE_CHARS', '400'))
+BuiltContext = namedtuple('BuiltContext', ['text', 'estimated_tokens', 'chunks', 'blocks', 'source_chars', 'dropped_chars'])
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / CONTEXT_CHARS_PER_TOKEN + 0.5)
+
+
+def _segment_lines(indices, segments):
+    """
+    Runs of consecutive segment indices as (start_time, end_time, text) lines of roughly
+    CONTEXT_LINE_CHARS characters; a line never spans a gap between runs.
+    """
+    lines = []
+    texts, line_start, line_end, length, previous = [], None, None, 0, None
+    for index in indices:
+        segment = segments[index]
+        if texts and (index != previous + 1 or length >= CONTEXT_LINE_CHARS):
+            lines.append((line_start, line_end, ' '.join(texts)))
+            texts, length = [], 0
+        if not texts:
+            line_start = segment['start_time']
+        texts.append(segment['text'])
+        line_end = segment['start_time'] + segment['duration']
+        length += len(segment['text']) + 1
+        previous = index
+    if texts:
+        lines.append((line_start, line_end, ' '.join(texts)))
+    return lines
+
+
+def _chunk_segments(chunk):
+    """
+    {segment index: segment} behind a chunk, or None when the chunk text can't be rebuilt
+    from stored segments (older payloads, translated chunks).
+    """
+    metadata = chunk.metadata
+    if 'segment_start' not in metadata or not metadata.get('video_id'):
+        return None
+    segments = load_segments(metadata['video_id'], metadata['segment_start'], metadata['segment_end'])
+    if not segments or ' '.join(segment['text'] for segment in segments) != chunk.page_content:
+        return None
+    return dict(enumerate(segments, start=metadata['segment_start']))
+
+
+def build_context(chunks, token_budget: int = CONTEXT_TOKEN_BUDGET) -> BuiltContext:
+    """
+    Compact prompt context from retrieved chunks. Chunks are admitted best-ranked first
+    until the token budget is spent; segments already taken from an overlapping chunk are
+    skipped, so overlap text appears once. The admitted segments are merged into runs by
+    time and emitted as "[MM:SS-MM:SS] text" lines in time order.
+    """
+    source_chars = sum(len(chunk.page_content) for chunk in chunks)
+    budget_chars = int(token_budget * CONTEXT_CHARS_PER_TOKEN)
+    # Timestamp prefix of about 16 characters per line
+    line_overhead = 1 + 16 / CONTEXT_LINE_CHARS
+
+    covered = {}   # video_id -> {segment index: segment}
+    standalone = []  # (start_time, end_time, text) for chunks without usable segments
+    used_chars = 0
+    for chunk in chunks:
+        if used_chars >= budget_chars:
+            break
+        segments = _chunk_segments(chunk)
+        if segments is None:
+            start_time = chunk.metadata.get('start_time', 0) or 0
+            text = chunk.page_content
+            remaining = int((budget_chars - used_chars) / line_overhead)
+            if len(text) > remaining:
+                text = text[:remaining].rsplit(' ', 1)[0]
+            if text:
+                standalone.append((start_time, start_time + (chunk.metadata.get('duration', 0) or 0), text))
+                used_chars += len(text) * line_overhead
+            continue
+        taken = covered.setdefault(chunk.metadata['video_id'], {})
+        for index, segment in segments.items():
+            if index in taken:
+                continue
+            cost = (len(segment['text']) + 1) * line_overhead
+            if used_chars + cost > budget_chars:
+                used_chars = budget_chars
+                break
+            taken[index] = segment
+            used_chars += cost
+
+    lines = [(None, line) for line in standalone]
+    for video_id, taken in covered.items():
+        lines.extend((video_id, line) for line in _segment_lines(sorted(taken), taken))
+    lines.sort(key=lambda item: (item[0] or '', item[1][0]))
+
+    text = '\n'.join(f"[{format_timestamp(start)}-{format_timestamp(end)}] {line_text}" for _, (start, end, line_text) in lines)
+    kept_chars = sum(len(line_text) for _, (_, _, line_text) in lines)
+    return BuiltContext(
+        text=text,
+        estimated_tokens=estimate_tokens(text),
+        chunks=len(chunks),
+        blocks=len(lines),
+        source_chars=source_chars,
+        dropped_chars=max(source_chars - kept_chars, 0),
+    )
@@ -0,0 +1,44 @@
+"""
+Gunicorn settings: `gunicorn -c gunicorn.conf.py`
+
+With GUNICORN_PRELOAD=true (default) the app and its heavy modules are imported once
+in the master and shared copy-on-write by the forked workers.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+# Threads per worker (gthread); Gemini clients are per API key, so concurrent requests don't share keys
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+wsgi_app = "api:create_app(preload=True)" if preload_app else "api:create_app()"
+
+
+def when_ready(server):
+    if preload_app:
+        # Keep imported objects out of future GC passes so workers don't touch (and copy) their pages
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # Threads and clients are per process; start them in the worker, never in the master
+    import api
+    api.start_background_tasks()
+
+
+def post_worker_init(worker):
+    try:
+        with open('/proc/self/status') as f:
+            rss = next(line.split()[1] for line in f if line.startswith('VmRSS:'))
+        print(f"Worker {worker.pid} ready (RSS {int(rss) // 1024} MiB, preload={preload_app})", flush=True)
+    except (OSError, StopIteration):
+        pass
+
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges from the shared multiprocess metrics directory
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,274 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.documents import Document
+
+from youtube_utils import iter_transcript_chunks
+from segment_store import delete_segments, save_segments
+from translation_utils import safe_translate_text, TRANSLATION_POOL_SIZE
+from cache_utils import video_vector_cache
+from lexical_index import delete_index, save_index
+from metrics import observe_stage, record_error
+import tracing
+from vector_store_utils import get_vector_store, cache_video_vectors, delete_video_points, VectorStoreWriter, INGEST_EMBED_BATCH_SIZE
+
+# Pipeline settings
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', '4'))
+
+_END = object()
+
+
+class _StageFailed(Exception):
+    pass
+
+
+class _StageTimer:
+    """
+    Accumulates busy time for one stage (time spent working, not waiting on queues).
+    Items may overlap (concurrent translations); busy is the union of their intervals,
+    so it never exceeds wall time. Intervals must be added in order of their start.
+    """
+
+    def __init__(self):
+        self.busy = 0.0
+        self.items = 0
+        self._covered_until = 0.0
+
+    def add(self, started: float, items: int = 1, ended: float = None) -> None:
+        if ended is None:
+            ended = time.perf_counter()
+        self.busy += max(0.0, ended - max(started, self._covered_until))
+        self._covered_until = max(self._covered_until, ended)
+        self.items += items
+
+    @property
+    def ms(self) -> int:
+        return int(self.busy * 1000)
+
+
+def _put(q, item, stop: threading.Event) -> None:
+    # Bounded put that gives up once another stage has failed
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+    raise _StageFailed()
+
+
+def _get(q, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    raise _StageFailed()
+
+
+def _chunk_stage(transcript_data, video_id, detected_lang, out_q, stop, chunk_timer, translate_timer):
+    """
+    Produce Documents as chunks are built. Hindi chunks are translated on the
+    translation pool with bounded parallelism while later chunks are still being built.
+    """
+    translate = detected_lang == 'hi'
+    translation_disable_flag = {'disabled': False}
+    in_flight = deque()
+    executor = ThreadPoolExecutor(max_workers=TRANSLATION_POOL_SIZE) if translate else None
+
+    def timed_translate(text):
+        # Completion time, so a chunk awaited behind a slower one isn't billed for the wait
+        page_content = safe_translate_text(text, translation_disable_flag)
+        return page_content, time.perf_counter()
+
+    translate_chunk = tracing.propagate(timed_translate)
+
+    def emit_oldest():
+        metadata, future, submitted = in_flight.popleft()
+        page_content, finished = future.result()
+        translate_timer.add(submitted, ended=finished)
+        _put(out_q, Document(page_content=page_content, metadata=metadata), stop)
+
+    try:
+        chunks = iter_transcript_chunks(transcript_data, video_id, detected_lang)
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk_text, metadata = next(chunks)
+            except StopIteration:
+                break
+            chunk_timer.add(started)
+            if translate:
+                future = executor.submit(translate_chunk, chunk_text)
+                in_flight.append((metadata, future, time.perf_counter()))
+                if len(in_flight) >= TRANSLATION_POOL_SIZE:
+                    emit_oldest()
+            else:
+                _put(out_q, Document(page_content=chunk_text, metadata=metadata), stop)
+        while in_flight:
+            emit_oldest()
+        _put(out_q, _END, stop)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _discard_partial_ingest(video_id, collection_name) -> None:
+    """
+    Remove whatever a failed ingest already stored, so the skip-ingest point count
+    never serves a partial index and the next request ingests the video again.
+    """
+    try:
+        delete_video_points(collection_name, video_id)
+    except Exception as e:
+        record_error('ingest_cleanup')
+        print(f"Removing partial ingest of '{video_id}' failed: {str(e)}", flush=True)
+    video_vector_cache.invalidate(collection_name, video_id)
+    delete_index(video_id)
+    delete_segments(video_id)
+
+
+def run_ingest_pipeline(transcript_data, video_id, detected_lang, api_key, collection_name):
+    """
+    Chunk (and translate), embed and upsert a transcript as concurrent stages connected
+    by bounded queues (embedding batches themselves run concurrently in VectorStoreWriter), so time-to-ingested approaches the slowest stage rather than the sum.
+    Returns {'success', 'chunks_processed', 'timings'} or {'success': False, 'error'}.
+    """
+    with tracing.span('ingest_pipeline', entries=len(transcript_data), language=detected_lang):
+        return _run_ingest_pipeline(transcript_data, video_id, detected_lang, api_key, collection_name)
+
+
+def _run_ingest_pipeline(transcript_data, video_id, detected_lang, api_key, collection_name):
+    print(f"\n=== Ingest Pipeline ===")
+    print(f"Video ID: {video_id}, entries: {len(transcript_data)}, collection: {collection_name}")
+    pipeline_start = time.perf_counter()
+
+    try:
+        vector_store = get_vector_store(api_key, collection_name, recreate=False)
+    except Exception as e:
+        print(f"Vector store error: {str(e)}", flush=True)
+        return {
+            "success": False,
+            "error": str(e),
+            "chunks_processed": 0,
+            "timings": {"ingest_pipeline_ms": int((time.perf_counter() - pipeline_start) * 1000)}
+        }
+
+    # Caption segments are stored once per video, outside the vector payloads
+    segments_start = time.perf_counter()
+    try:
+        with tracing.span('segment_store'):
+            save_segments(video_id, transcript_data)
+    except Exception as e:
+        print(f"Storing segments for '{video_id}' failed: {str(e)}", flush=True)
+    segments_ms = int((time.perf_counter() - segments_start) * 1000)
+
+    # Never serve the previous ingest of this video from the in-process vector cache
+    video_vector_cache.invalidate(collection_name, video_id)
+    delete_index(video_id)
+
+    docs_q = queue.Queue(maxsize=INGEST_QUEUE_SIZE * INGEST_EMBED_BATCH_SIZE)
+    stop = threading.Event()
+    errors = []
+    chunk_timer, translate_timer = _StageTimer(), _StageTimer()
+
+    def chunk_target():
+        try:
+            _chunk_stage(transcript_data, video_id, detected_lang, docs_q, stop, chunk_timer, translate_timer)
+        except _StageFailed:
+            pass
+        except Exception as e:
+            print(f"Ingest chunking stage failed: {str(e)}", flush=True)
+            errors.append(e)
+            stop.set()
+
+    chunk_thread = threading.Thread(target=tracing.propagate(chunk_target), daemon=True)
+    chunk_thread.start()
+
+    # Batch documents on the request thread; the writer embeds and upserts them concurrently
+    writer = VectorStoreWriter(vector_store, collect=video_vector_cache.enabled)
+    write_stats = {}
+    # Chunks for the lexical index, written once every batch is stored
+    indexed_docs = []
+    try:
+        batch = []
+        while True:
+            doc = _get(docs_q, stop)
+            if doc is _END:
+                break
+            batch.append(doc)
+            indexed_docs.append(doc)
+            if len(batch) >= INGEST_EMBED_BATCH_SIZE:
+                writer.submit(batch)
+                batch = []
+        if batch:
+            writer.submit(batch)
+    except _StageFailed:
+        pass
+    except Exception as e:
+        # submit() re-raises the first failed batch (close() reports it); stop chunking too
+        if e is not writer.error:
+            print(f"Ingest batching failed: {str(e)}", flush=True)
+            errors.append(e)
+        stop.set()
+    except BaseException:
+        # Interrupted: release the chunk stage before unwinding
+        stop.set()
+        raise
+    finally:
+        try:
+            write_stats = writer.close()
+        except Exception as e:
+            print(f"Ingest write stage failed: {str(e)}", flush=True)
+            errors.append(e)
+            stop.set()
+
+    chunk_thread.join()
+
+    pipeline_ms = int((time.perf_counter() - pipeline_start) * 1000)
+    timings = {
+        "ingest_segments_ms": segments_ms,
+        "ingest_chunking_ms": chunk_timer.ms,
+        "ingest_translation_ms": translate_timer.ms,
+        "ingest_embedding_ms": int(writer.embedding_seconds * 1000),
+        "ingest_upsert_ms": int(writer.upsert_seconds * 1000),
+        "ingest_pipeline_ms": pipeline_ms,
+        "embeddings_per_sec": write_stats.get("embeddings_per_sec", 0.0)
+    }
+    print(f"⏱️ Ingest pipeline took {pipeline_ms} ms for {writer.documents} chunks "
+          f"(chunking {chunk_timer.ms} ms, translation {translate_timer.ms} ms, "
+          f"embedding {timings['ingest_embedding_ms']} ms, upsert {timings['ingest_upsert_ms']} ms)", flush=True)
+    # The trace already has live spans for these; busy times overlap, so histograms only
+    observe_stage('segment_store', segments_ms / 1000, trace=False)
+    observe_stage('chunking', chunk_timer.busy, trace=False)
+    if translate_timer.items:
+        observe_stage('translation', translate_timer.busy, trace=False)
+    observe_stage('embedding', writer.embedding_seconds, trace=False)
+    observe_stage('upsert', writer.upsert_seconds, trace=False)
+    observe_stage('ingest_pipeline', pipeline_ms / 1000, trace=False)
+
+    if errors:
+        record_error('ingest_pipeline')
+        # Batches upserted before the failure (and the barrier batch flushed by close) are still stored
+        _discard_partial_ingest(video_id, collection_name)
+        return {
+            "success": False,
+            "error": str(errors[0]),
+            "chunks_processed": writer.documents,
+            "timings": timings
+        }
+    if writer.written:
+        cache_video_vectors(collection_name, video_id, writer.written)
+    try:
+        with tracing.span('lexical_index'):
+            save_index(video_id, indexed_docs)
+    except Exception as e:
+        print(f"Building lexical index for '{video_id}' failed: {str(e)}", flush=True)
+    return {
+        "success": True,
+        "chunks_processed": writer.documents,
+        "timings": timings
+    }
@@ -0,0 +1,277 @@
+import os
+import asyncio
+import copy
+import re
+import threading
+import time
+import weakref
+
+from metrics import record_error, record_ingest_wait_timeout, stage_timer
+
+# Ingest coordination settings
+INGEST_COORDINATOR = os.getenv('INGEST_COORDINATOR', 'local').lower()  # 'local' or 'file'
+INGEST_LOCK_DIR = os.getenv('INGEST_LOCK_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'ingest-locks'))
+INGEST_WAIT_TIMEOUT_SECONDS = int(os.getenv('INGEST_WAIT_TIMEOUT_SECONDS', '120'))
+# Retry-After sent to a caller that timed out waiting for another caller's ingest
+INGEST_RETRY_AFTER_SECONDS = int(os.getenv('INGEST_RETRY_AFTER_SECONDS', '10'))
+
+
+class IngestInProgress(Exception):
+    """
+    Raised to a caller that gave up waiting for another caller's ingest of the same video;
+    the request should be retried (503 with Retry-After) rather than ingesting twice.
+    """
+
+    def __init__(self, key: str, retry_after: int):
+        super().__init__(f"Ingest of '{key}' is still in progress; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class LocalIngestCoordinator:
+    """
+    Process-local single-flight: the first caller for a key runs the ingest,
+    concurrent callers for the same key block until it finishes and share its result.
+    """
+
+    def __init__(self, wait_timeout: int = INGEST_WAIT_TIMEOUT_SECONDS):
+        self.wait_timeout = wait_timeout
+        self._flights = {}
+        # Event loop -> {key: task running run() for that key}, for arun()
+        self._async_flights = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def run(self, key: str, fn, already_done=None):
+        """
+        Run `fn()` once per key among concurrent callers and return its result.
+        `already_done` is accepted for interface parity with the cross-worker variant.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+
+        if not leader:
+            print(f"Ingest for '{key}' already in progress; waiting for its result", flush=True)
+            wait_start = time.perf_counter()
+            if not flight.done.wait(self.wait_timeout):
+                return self._wait_timed_out(key, already_done, 'local')
+            wait_ms = int((time.perf_counter() - wait_start) * 1000)
+            print(f"⏱️ Waited {wait_ms} ms for in-flight ingest of '{key}'", flush=True)
+            if flight.error is not None:
+                raise flight.error
+            return self._shared_result(flight.result)
+
+        try:
+            flight.result = self._lead(key, fn, already_done)
+            # Callers mutate their result (timings), so never hand out the shared object
+            return copy.deepcopy(flight.result)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            flight.done.set()
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    async def arun(self, key: str, fn, already_done=None):
+        """
+        Async variant of run(): callers on the same event loop await the leader's task
+        instead of each blocking a thread; only the leader's run() holds one.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flights = self._async_flights.setdefault(loop, {})
+        task = flights.get(key)
+        if task is None:
+            # A task, not the leader's own await, so a disconnected leader doesn't cancel its waiters
+            task = asyncio.ensure_future(asyncio.to_thread(self.run, key, fn, already_done))
+            flights[key] = task
+            task.add_done_callback(lambda done: self._async_flight_done(flights, key, done))
+            # Callers mutate their result (timings), so never hand out the shared object
+            return copy.deepcopy(await asyncio.shield(task))
+
+        print(f"Ingest for '{key}' already in progress; waiting for its result", flush=True)
+        wait_start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task), self.wait_timeout)
+        except asyncio.TimeoutError:
+            return await asyncio.to_thread(self._wait_timed_out, key, already_done, 'local')
+        wait_ms = int((time.perf_counter() - wait_start) * 1000)
+        print(f"⏱️ Waited {wait_ms} ms for in-flight ingest of '{key}'", flush=True)
+        return self._shared_result(result)
+
+    @staticmethod
+    def _async_flight_done(flights, key: str, task) -> None:
+        if flights.get(key) is task:
+            del flights[key]
+        if not task.cancelled():
+            # Retrieved here so a failure nobody awaited anymore isn't logged as unhandled
+            task.exception()
+
+    @staticmethod
+    def _shared_result(result):
+        result = copy.deepcopy(result)
+        if isinstance(result, dict):
+            result['ingest_shared'] = True
+        return result
+
+    def _lead(self, key: str, fn, already_done):
+        return fn()
+
+    def _wait_timed_out(self, key: str, already_done, coordinator: str):
+        # Never start a second writer for the key: serve a finished ingest or ask for a retry
+        record_ingest_wait_timeout(coordinator)
+        if already_done is not None and already_done():
+            print(f"Timed out waiting for ingest of '{key}', but it has completed; skipping", flush=True)
+            return {'success': True, 'ingested_by_peer': True}
+        print(f"⚠️ Timed out after {self.wait_timeout}s waiting for ingest of '{key}'; asking the client to retry", flush=True)
+        raise IngestInProgress(key, INGEST_RETRY_AFTER_SECONDS)
+
+
+class FileLockIngestCoordinator(LocalIngestCoordinator):
+    """
+    Single-flight across gunicorn workers on the same host. Threads inside a worker
+    are coalesced locally; the local leader then takes an exclusive lock file per key.
+    Once a worker gets the lock it re-checks `already_done()` so a peer's finished
+    ingest is not repeated; in that case `{'ingested_by_peer': True}` is returned.
+    """
+
+    def __init__(self, lock_dir: str = INGEST_LOCK_DIR, wait_timeout: int = INGEST_WAIT_TIMEOUT_SECONDS):
+        super().__init__(wait_timeout)
+        self.lock_dir = lock_dir
+        os.makedirs(self.lock_dir, exist_ok=True)
+
+    def _lock_path(self, key: str) -> str:
+        safe_key = re.sub(r'[^A-Za-z0-9_.-]', '_', key)
+        return os.path.join(self.lock_dir, f"{safe_key}.lock")
+
+    def _lead(self, key: str, fn, already_done):
+        import fcntl
+
+        with open(self._lock_path(key), 'a') as lock_file:
+            wait_start = time.perf_counter()
+            acquired = False
+            while True:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    acquired = True
+                    break
+                except BlockingIOError:
+                    if time.perf_counter() - wait_start > self.wait_timeout:
+                        break
+                    time.sleep(0.2)
+
+            wait_ms = int((time.perf_counter() - wait_start) * 1000)
+            if not acquired:
+                return self._wait_timed_out(key, already_done, 'file')
+            try:
+                if wait_ms > 0:
+                    print(f"⏱️ Waited {wait_ms} ms for ingest lock on '{key}'", flush=True)
+                if already_done is not None and already_done():
+                    print(f"Ingest of '{key}' was completed by another worker; skipping", flush=True)
+                    return {'success': True, 'ingested_by_peer': True}
+                return fn()
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+_ingest_coordinator = None
+_ingest_coordinator_lock = threading.Lock()
+
+def get_ingest_coordinator():
+    """
+    Return the process-wide ingest coordinator selected by INGEST_COORDINATOR.
+    """
+    global _ingest_coordinator
+    if _ingest_coordinator is None:
+        with _ingest_coordinator_lock:
+            if _ingest_coordinator is None:
+                if INGEST_COORDINATOR == 'file':
+                    print(f"Using file-lock ingest coordinator ({INGEST_LOCK_DIR})", flush=True)
+                    _ingest_coordinator = FileLockIngestCoordinator()
+                else:
+                    _ingest_coordinator = LocalIngestCoordinator()
+    return _ingest_coordinator
+
+
+# YouTube Transcript API client, created on first transcript request
+ytt_api = None
+_ytt_api_lock = threading.Lock()
+
+def _get_ytt_api():
+    global ytt_api
+    if ytt_api is None:
+        with _ytt_api_lock:
+            if ytt_api is None:
+                from youtube_utils import create_youtube_transcript_api
+                ytt_api = create_youtube_transcript_api()
+    return ytt_api
+
+def ingest_transcript(video_id, languages, api_key, collection_name):
+    """
+    Fetch the transcript, store it in the vector database and generate quick-questions.
+    Returns a JSON-serializable result dict (shared with any concurrent waiters).
+    """
+    from ai_utils import generate_quick_questions, QUICK_QUESTIONS_MODEL
+    from cache_utils import invalidate_quick_questions, store_quick_questions
+    from ingest_pipeline import run_ingest_pipeline
+    from vector_store_utils import get_relevant_transcript_chunks
+    from youtube_utils import get_transcript_safely
+
+    # Get transcript from YouTube (normal path)
+    result = get_transcript_safely(video_id, languages, _get_ytt_api(), build_docs=False)
+    
+    if not result.get('success'):
+        return result
+    
+    # Chunk, embed and store concurrently in the vector database
+    ingest = run_ingest_pipeline(result['data'], video_id, result['detected_lang'], api_key, collection_name)
+    result.setdefault('timings', {}).update(ingest['timings'])
+    if ingest.get('success'):
+        result['chunks_processed'] = ingest['chunks_processed']
+        # Freshly ingested content makes any earlier questions stale
+        invalidate_quick_questions(video_id)
+    else:
+        result['warning'] = "Failed to store in vector database"
+    
+    # Generate quick questions if transcript was successfully processed
+    if result.get('success') and result.get('data'):
+        try:
+            # Get relevant chunks from vector database for question generation
+            broad_query = "main topics discussed content overview summary"
+            with stage_timer('similarity_search', 'Quick similarity search for questions') as timer:
+                relevant_chunks = get_relevant_transcript_chunks(broad_query, api_key, collection_name, k=2, video_id=video_id)
+            quick_similarity_ms = timer.ms
+            
+            # Generate questions using AI
+            with stage_timer('quick_questions', 'Quick questions generation', model=QUICK_QUESTIONS_MODEL) as timer:
+                quick_questions = generate_quick_questions(relevant_chunks, api_key)
+            qq_ms = timer.ms
+            store_quick_questions(video_id, QUICK_QUESTIONS_MODEL, quick_questions)
+            result['quick-questions'] = quick_questions
+            # Attach timings
+            timings = result.setdefault('timings', {})
+            timings['quick_similarity_search_ms'] = quick_similarity_ms
+            timings['quick_question_generation_ms'] = qq_ms
+            
+        except Exception as e:
+            print(f"Error generating quick questions: {str(e)}")
+            record_error('quick_questions')
+            # Continue without questions if generation fails
+            result['quick-questions'] = []
+    
+    # Remove data from result before returning
+    if 'data' in result:
+        del result['data']
+    
+    return result
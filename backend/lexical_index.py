@@ -0,0 +1,197 @@
+import gzip
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from langchain_core.documents import Document
+
+# Per-video BM25 index over the chunk texts, stored next to the caption segments
+LEXICAL_INDEX_DIR = os.getenv('LEXICAL_INDEX_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'lexical'))
+LEXICAL_INDEX_MEMORY_ENTRIES = int(os.getenv('LEXICAL_INDEX_MEMORY_ENTRIES', '64'))
+BM25_K1 = float(os.getenv('BM25_K1', '1.2'))
+BM25_B = float(os.getenv('BM25_B', '0.75'))
+# A lexical-only answer needs every query term in the best chunk and at least one term this specific
+# (idf 2.0 ~ the term occurs in under 1 in 7 chunks)
+LEXICAL_CONFIDENT_MIN_IDF = float(os.getenv('LEXICAL_CONFIDENT_MIN_IDF', '2.0'))
+RRF_K = int(os.getenv('RRF_K', '60'))
+
+INDEX_VERSION = 1
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_PHRASE_RE = re.compile(r'"([^"]+)"')
+STOPWORDS = frozenset((
+    "a an and are as at be but by can did do does for from had has have how i in is it its of on or "
+    "so that the their then there these they this to was were what when where which who why will "
+    "with you your about say said tell me video explain talk talks speaker mentioned mention"
+).split())
+
+# Recently used indexes: video_id -> LexicalIndex
+_loaded = OrderedDict()
+_loaded_lock = threading.Lock()
+
+
+def tokenize(text: str):
+    return _TOKEN_RE.findall(text.lower())
+
+def query_terms(query: str):
+    """
+    Distinct non-stopword terms of a query, in order.
+    """
+    terms = []
+    for token in tokenize(query):
+        if token not in STOPWORDS and token not in terms:
+            terms.append(token)
+    return terms
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over one video's chunks. Documents are (page_content, metadata) pairs.
+    """
+
+    def __init__(self, video_id: str, docs, postings: dict, lengths):
+        self.video_id = video_id
+        self.docs = docs
+        self.postings = postings
+        self.lengths = lengths
+        self.avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+    @classmethod
+    def build(cls, video_id: str, docs):
+        postings = {}
+        lengths = []
+        for doc_index, (page_content, _) in enumerate(docs):
+            tokens = tokenize(page_content)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append([doc_index, tf])
+        return cls(video_id, docs, postings, lengths)
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        n = len(self.docs)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int):
+        """
+        Top-k chunks by BM25 as [(score, doc index)], and whether the best hit is confident
+        enough to answer without vector search.
+        """
+        terms = query_terms(query)
+        if not terms or not self.docs:
+            return [], False
+        scores = {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc_index, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_index] / (self.avg_length or 1))
+                scores[doc_index] = scores.get(doc_index, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        hits = sorted(((score, doc_index) for doc_index, score in scores.items()), key=lambda hit: (-hit[0], hit[1]))[:k]
+        return hits, bool(hits) and self._confident(query, terms, hits[0][1])
+
+    def _confident(self, query: str, terms, doc_index: int) -> bool:
+        # Exact-term hit: every query term (and every quoted phrase) is in the best chunk, one of them rare
+        text = self.docs[doc_index][0].lower()
+        doc_terms = set(tokenize(text))
+        if any(term not in doc_terms for term in terms):
+            return False
+        if any(phrase.lower().strip() not in text for phrase in _PHRASE_RE.findall(query)):
+            return False
+        return max(self.idf(term) for term in terms) >= LEXICAL_CONFIDENT_MIN_IDF
+
+    def document(self, doc_index: int) -> Document:
+        page_content, metadata = self.docs[doc_index]
+        return Document(page_content=page_content, metadata=dict(metadata))
+
+    def to_json(self) -> dict:
+        return {'version': INDEX_VERSION, 'video_id': self.video_id, 'docs': self.docs, 'postings': self.postings, 'lengths': self.lengths}
+
+
+def _index_path(video_id: str) -> str:
+    safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', video_id)
+    return os.path.join(LEXICAL_INDEX_DIR, f"{safe_id}.json.gz")
+
+
+def _remember(video_id: str, index: LexicalIndex) -> None:
+    with _loaded_lock:
+        _loaded[video_id] = index
+        _loaded.move_to_end(video_id)
+        while len(_loaded) > LEXICAL_INDEX_MEMORY_ENTRIES:
+            _loaded.popitem(last=False)
+
+
+def save_index(video_id: str, docs) -> LexicalIndex:
+    """
+    Build and store the index for a video's chunks (Documents or (page_content, metadata) pairs).
+    """
+    start = time.perf_counter()
+    pairs = [(doc.page_content, doc.metadata) if isinstance(doc, Document) else (doc[0], doc[1]) for doc in docs]
+    index = LexicalIndex.build(video_id, pairs)
+    os.makedirs(LEXICAL_INDEX_DIR, exist_ok=True)
+    path = _index_path(video_id)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(index.to_json(), f, ensure_ascii=False, separators=(',', ':'))
+    # Atomic swap so concurrent readers never see a partial file
+    os.replace(tmp_path, path)
+    _remember(video_id, index)
+    elapsed_ms = int((time.perf_counter() - start) * 1000)
+    print(f"⏱️ Built lexical index for '{video_id}' ({len(pairs)} chunks, {len(index.postings)} terms) in {elapsed_ms} ms", flush=True)
+    return index
+
+
+def load_index(video_id: str):
+    """
+    The video's index from memory or disk, or None if it has none.
+    """
+    with _loaded_lock:
+        index = _loaded.get(video_id)
+        if index is not None:
+            _loaded.move_to_end(video_id)
+            return index
+    path = _index_path(video_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"Loading lexical index for '{video_id}' failed: {str(e)}", flush=True)
+        return None
+    if data.get('version') != INDEX_VERSION:
+        return None
+    index = LexicalIndex(video_id, [tuple(doc) for doc in data['docs']], data['postings'], data['lengths'])
+    _remember(video_id, index)
+    return index
+
+
+def delete_index(video_id: str) -> None:
+    with _loaded_lock:
+        _loaded.pop(video_id, None)
+    try:
+        os.remove(_index_path(video_id))
+    except FileNotFoundError:
+        pass
+
+
+def reciprocal_rank_fusion(result_lists, k: int, rrf_k: int = RRF_K):
+    """
+    Merge ranked Document lists: score = sum of 1 / (rrf_k + rank) over the lists a chunk
+    appears in. Chunks are matched by text; the first list's copy is kept.
+    """
+    scores = {}
+    documents = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, doc)
+    ranked = sorted(scores, key=lambda key: scores[key], reverse=True)
+    return [documents[key] for key in ranked[:k]]
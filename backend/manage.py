@@ -0,0 +1,251 @@
+"""
+Admin commands for the backend.
+
+Usage:
+    python manage.py migrate-to-shared [--delete-source] [--batch-size 256] [VIDEO_ID ...]
+    python manage.py startup-report [--preload] [--top 15] [--json] [--max-import-ms N] [--max-rss-mb N]
+    python manage.py prewarm-transcripts [--file IDS.txt] [--languages en,hi] [--refresh] [--delay-ms 0] [VIDEO_ID ...]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+def migrate_to_shared(args):
+    """
+    Copy per-video collections (points, vectors and payloads) into the shared layout.
+    Point IDs are preserved, so re-running the migration is idempotent.
+    """
+    import vector_store_utils as vsu
+
+    client = vsu.get_qdrant_client()
+    if client is None:
+        print("❌ Qdrant client not initialized - check QDRANT_URL", flush=True)
+        return 1
+
+    shared_names = set(vsu.shared_collection_names())
+    if args.video_ids:
+        sources = args.video_ids
+    else:
+        sources = [c.name for c in client.get_collections().collections if c.name not in shared_names]
+    print(f"Migrating {len(sources)} collection(s) into {sorted(shared_names)}", flush=True)
+
+    failures = 0
+    for video_id in sources:
+        target = vsu.collection_for_video(video_id, layout='shared')
+        if not vsu.ensure_collection_exists(target):
+            print(f"❌ Could not create shared collection '{target}'", flush=True)
+            return 1
+        vsu.ensure_video_id_index(target)
+
+        copied = 0
+        offset = None
+        try:
+            while True:
+                points, offset = client.scroll(
+                    collection_name=video_id,
+                    limit=args.batch_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=True,
+                )
+                if points:
+                    batch = []
+                    for point in points:
+                        payload = dict(point.payload or {})
+                        metadata = dict(payload.get('metadata') or {})
+                        metadata.setdefault('video_id', video_id)
+                        payload['metadata'] = metadata
+                        batch.append(vsu.PointStruct(id=point.id, vector=point.vector, payload=payload))
+                    client.upsert(collection_name=target, points=batch, wait=True)
+                    copied += len(batch)
+                if offset is None:
+                    break
+        except Exception as e:
+            print(f"❌ Migrating '{video_id}' failed after {copied} points: {str(e)}", flush=True)
+            failures += 1
+            continue
+
+        migrated = client.count(collection_name=target, count_filter=vsu.video_filter(target, video_id), exact=True).count
+        print(f"✅ '{video_id}' -> '{target}': copied {copied} points ({migrated} now in shared collection)", flush=True)
+        if args.delete_source:
+            if migrated >= copied:
+                client.delete_collection(video_id)
+                print(f"Deleted source collection '{video_id}'", flush=True)
+            else:
+                print(f"⚠️ Keeping '{video_id}': shared collection has fewer points than copied", flush=True)
+
+    print("Set QDRANT_STORAGE_LAYOUT=shared to serve from the shared collection(s).", flush=True)
+    return 1 if failures else 0
+
+
+STARTUP_MARKER = "__STARTUP_REPORT__"
+
+# Runs in a fresh interpreter under -X importtime
+_STARTUP_SCRIPT = """
+import json, resource, time
+start = time.perf_counter()
+import api
+api.create_app(preload={preload})
+elapsed_ms = int((time.perf_counter() - start) * 1000)
+rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print("{marker}" + json.dumps({{"app_ready_ms": elapsed_ms, "max_rss_mb": round(rss_mb, 1)}}), flush=True)
+"""
+
+
+def _parse_importtime(stderr: str):
+    """
+    Parse `-X importtime` output into (total us, {top-level package: us}), attributing
+    each module's self time to its top-level package.
+    """
+    total_us = 0
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            self_us, _, name = line[len("import time:"):].split("|", 2)
+            self_us = int(self_us)
+        except ValueError:
+            continue
+        total_us += self_us
+        root = name.strip().split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+    return total_us, packages
+
+
+def startup_report(args):
+    """
+    Boot the app in a fresh interpreter with -X importtime and report import time,
+    the slowest top-level packages and peak RSS. Exits 1 when a budget is exceeded.
+    """
+    script = _STARTUP_SCRIPT.format(preload=bool(args.preload), marker=STARTUP_MARKER)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    marker_lines = [line for line in proc.stdout.splitlines() if line.startswith(STARTUP_MARKER)]
+    if proc.returncode != 0 or not marker_lines:
+        print(proc.stderr[-2000:], flush=True)
+        print(f"❌ App start-up failed (exit code {proc.returncode})", flush=True)
+        return 1
+
+    result = json.loads(marker_lines[-1][len(STARTUP_MARKER):])
+    total_us, packages = _parse_importtime(proc.stderr)
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    report = {
+        "preload": bool(args.preload),
+        "import_ms": total_us // 1000,
+        "app_ready_ms": result["app_ready_ms"],
+        "max_rss_mb": result["max_rss_mb"],
+        "slowest_packages_ms": {name: us // 1000 for name, us in slowest},
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Start-up ({'preload' if args.preload else 'lazy'}): imports {report['import_ms']} ms, "
+              f"app ready {report['app_ready_ms']} ms, peak RSS {report['max_rss_mb']} MiB", flush=True)
+        for name, ms in report["slowest_packages_ms"].items():
+            print(f"  {ms:>6} ms  {name}", flush=True)
+
+    over_budget = False
+    if args.max_import_ms is not None and report["import_ms"] > args.max_import_ms:
+        print(f"❌ Import time {report['import_ms']} ms exceeds budget of {args.max_import_ms} ms", flush=True)
+        over_budget = True
+    if args.max_rss_mb is not None and report["max_rss_mb"] > args.max_rss_mb:
+        print(f"❌ Peak RSS {report['max_rss_mb']} MiB exceeds budget of {args.max_rss_mb} MiB", flush=True)
+        over_budget = True
+    return 1 if over_budget else 0
+
+
+def prewarm_transcripts(args):
+    """
+    Fetch caption tracks into the on-disk transcript cache so later ingests skip YouTube.
+    Videos with a matching cached track are skipped unless --refresh is given.
+    """
+    import transcript_cache
+    from youtube_utils import create_youtube_transcript_api, fetch_transcript_entries, load_cached_track
+
+    video_ids = list(args.video_ids)
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            video_ids.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+    if not video_ids:
+        print("❌ No video IDs given (pass them as arguments or with --file)", flush=True)
+        return 1
+    if not transcript_cache.enabled():
+        print("❌ Transcript cache is disabled (TRANSCRIPT_CACHE_MAX_MB=0)", flush=True)
+        return 1
+
+    ytt_api = create_youtube_transcript_api()
+    fetched = skipped = failures = 0
+    for position, video_id in enumerate(video_ids, start=1):
+        if not args.refresh and load_cached_track(video_id, args.languages) is not None:
+            skipped += 1
+            continue
+        if fetched and args.delay_ms:
+            # Go easy on the proxy between fetches
+            time.sleep(args.delay_ms / 1000)
+        try:
+            result = fetch_transcript_entries(video_id, args.languages, ytt_api, use_cache=False)
+        except Exception as e:
+            print(f"❌ [{position}/{len(video_ids)}] '{video_id}': {str(e)}", flush=True)
+            failures += 1
+            continue
+        if result.get('success'):
+            fetched += 1
+            print(f"✅ [{position}/{len(video_ids)}] '{video_id}': {len(result['data'])} entries "
+                  f"({result['track']['language_code']}, {'generated' if result['track']['is_generated'] else 'manual'})", flush=True)
+        else:
+            print(f"❌ [{position}/{len(video_ids)}] '{video_id}': no transcript data found", flush=True)
+            failures += 1
+
+    tracks, size = transcript_cache.usage()
+    print(f"Prewarmed {fetched} video(s), {skipped} already cached, {failures} failed; "
+          f"cache holds {tracks} tracks ({size / 1024 / 1024:.1f} MiB of {transcript_cache.TRANSCRIPT_CACHE_MAX_MB:g} MiB)", flush=True)
+    return 1 if failures else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backend admin commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate = subparsers.add_parser("migrate-to-shared", help="move per-video collections into the shared collection layout")
+    migrate.add_argument("video_ids", nargs="*", help="collections to migrate (default: all non-shared collections)")
+    migrate.add_argument("--batch-size", type=int, default=256)
+    migrate.add_argument("--delete-source", action="store_true", help="delete each per-video collection after a verified copy")
+    migrate.set_defaults(func=migrate_to_shared)
+
+    startup = subparsers.add_parser("startup-report", help="measure app import time and memory with -X importtime")
+    startup.add_argument("--preload", action="store_true", help="import heavy modules up front, as gunicorn --preload does")
+    startup.add_argument("--top", type=int, default=15, help="number of slowest packages to list")
+    startup.add_argument("--json", action="store_true", help="print the report as JSON")
+    startup.add_argument("--max-import-ms", type=int, default=None, help="fail if total import time exceeds this")
+    startup.add_argument("--max-rss-mb", type=float, default=None, help="fail if peak RSS exceeds this")
+    startup.set_defaults(func=startup_report)
+
+    prewarm = subparsers.add_parser("prewarm-transcripts", help="fetch caption tracks into the on-disk transcript cache")
+    prewarm.add_argument("video_ids", nargs="*", help="videos to fetch")
+    prewarm.add_argument("--file", default=None, help="file with one video ID per line (# comments allowed)")
+    prewarm.add_argument("--languages", default=None, help="comma-separated preferred languages, as in /api/transcript")
+    prewarm.add_argument("--refresh", action="store_true", help="re-fetch videos that are already cached")
+    prewarm.add_argument("--delay-ms", type=int, default=0, help="pause between YouTube fetches")
+    prewarm.set_defaults(func=prewarm_transcripts)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import os
+import time
+from contextvars import ContextVar
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+
+import tracing
+
+# With several gunicorn workers, point PROMETHEUS_MULTIPROC_DIR at an empty directory
+# (read by prometheus_client itself) so /metrics aggregates every worker
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+METRICS_NAMESPACE = 'ytrag'
+
+# Stages range from sub-millisecond cache hits to multi-minute ingests
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+STAGE_SECONDS = Histogram(
+    'stage_duration_seconds', 'Latency of request and ingest stages',
+    ['stage', 'endpoint', 'model'], namespace=METRICS_NAMESPACE, buckets=STAGE_BUCKETS,
+)
+PROMPT_TOKENS = Histogram(
+    'prompt_tokens', 'Estimated prompt tokens of answer generations',
+    ['endpoint', 'model'], namespace=METRICS_NAMESPACE,
+    buckets=(250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000),
+)
+REQUEST_SECONDS = Histogram(
+    'request_duration_seconds', 'End-to-end request latency',
+    ['endpoint', 'status'], namespace=METRICS_NAMESPACE, buckets=STAGE_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    'cache_lookups_total', 'Cache lookups by cache and result (hit/miss)',
+    ['cache', 'result', 'endpoint', 'model'], namespace=METRICS_NAMESPACE,
+)
+FALLBACKS = Counter(
+    'model_fallbacks_total', 'Generations retried on the fallback model (model = primary model)',
+    ['endpoint', 'model'], namespace=METRICS_NAMESPACE,
+)
+GENERATIONS = Counter(
+    'generations_total', 'Answer generations (model = primary model)',
+    ['endpoint', 'model'], namespace=METRICS_NAMESPACE,
+)
+HEDGES = Counter(
+    'generation_hedges_total', 'Generations that started the fallback model in parallel because the primary was slow (model = primary model)',
+    ['endpoint', 'model'], namespace=METRICS_NAMESPACE,
+)
+HEDGE_WINS = Counter(
+    'generation_hedge_wins_total', 'Hedged generations by the model that answered first',
+    ['endpoint', 'model'], namespace=METRICS_NAMESPACE,
+)
+INGEST_WAIT_TIMEOUTS = Counter(
+    'ingest_wait_timeouts_total', 'Callers that timed out waiting for an in-flight ingest of the same video',
+    ['coordinator'], namespace=METRICS_NAMESPACE,
+)
+SKIP_INGEST = Counter(
+    'skip_ingest_total', 'Transcript requests served without ingesting',
+    ['endpoint', 'model'], namespace=METRICS_NAMESPACE,
+)
+RETRIEVALS = Counter(
+    'retrievals_total', 'Chunk retrievals by path (vector, hybrid, lexical = answered without the embedder)',
+    ['path', 'endpoint'], namespace=METRICS_NAMESPACE,
+)
+ERRORS = Counter(
+    'errors_total', 'Errors by stage',
+    ['stage', 'endpoint', 'model'], namespace=METRICS_NAMESPACE,
+)
+
+# Labels of the request being served (unset in background threads)
+_endpoint_label = ContextVar('metrics_endpoint', default='none')
+_model_label = ContextVar('metrics_model', default='')
+
+
+def set_request_labels(endpoint: str = None, model: str = None) -> None:
+    """
+    Set the endpoint/model labels for metrics recorded by the current request.
+    """
+    if endpoint is not None:
+        _endpoint_label.set(endpoint)
+    if model is not None:
+        _model_label.set(model)
+
+def current_endpoint() -> str:
+    return _endpoint_label.get()
+
+
+class StageTimer:
+    """
+    Times a block as a trace span, records it in the stage histogram and prints the usual
+    ⏱️ line. `ms` is available after the block; set `detail` inside it to extend the log line.
+    An exception escaping the block also counts as an error for the stage.
+    """
+
+    def __init__(self, stage: str, label: str = None, model: str = None):
+        self.stage = stage
+        self.label = label
+        self.model = model
+        self.detail = ''
+        self.seconds = 0.0
+        self._start = None
+        self._span = None
+
+    @property
+    def ms(self) -> int:
+        return int(self.seconds * 1000)
+
+    def __enter__(self):
+        self._span = tracing.span(self.stage, model=self.model)
+        self._span.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._start
+        _observe_histogram(self.stage, self.seconds, self.model)
+        if exc_type is not None:
+            record_error(self.stage, model=self.model)
+        self._span.__exit__(exc_type, exc, tb)
+        if self.label:
+            print(f"⏱️ {self.label} took {self.ms} ms{' ' + self.detail if self.detail else ''}", flush=True)
+        return False
+
+
+def stage_timer(stage: str, label: str = None, model: str = None) -> StageTimer:
+    return StageTimer(stage, label, model)
+
+def _observe_histogram(stage: str, seconds: float, model: str = None) -> None:
+    STAGE_SECONDS.labels(stage, current_endpoint(), _model_label.get() if model is None else model).observe(seconds)
+
+def observe_stage(stage: str, seconds: float, model: str = None, trace: bool = True) -> None:
+    """
+    Record an already measured stage duration (and a span ending now, unless trace=False,
+    e.g. for busy times summed over concurrent work).
+    """
+    _observe_histogram(stage, seconds, model)
+    if trace:
+        tracing.record_span(stage, seconds, model=model)
+
+def observe_prompt_tokens(tokens: int) -> None:
+    PROMPT_TOKENS.labels(current_endpoint(), _model_label.get()).observe(tokens)
+
+def observe_request(endpoint: str, status: int, seconds: float) -> None:
+    REQUEST_SECONDS.labels(endpoint, str(status)).observe(seconds)
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss', current_endpoint(), _model_label.get()).inc()
+
+def record_fallback(model: str) -> None:
+    FALLBACKS.labels(current_endpoint(), model).inc()
+
+def record_generation(model: str) -> None:
+    GENERATIONS.labels(current_endpoint(), model).inc()
+
+def record_hedge(model: str) -> None:
+    HEDGES.labels(current_endpoint(), model).inc()
+
+def record_hedge_win(model: str) -> None:
+    HEDGE_WINS.labels(current_endpoint(), model).inc()
+
+def record_ingest_wait_timeout(coordinator: str) -> None:
+    INGEST_WAIT_TIMEOUTS.labels(coordinator).inc()
+
+def record_skip_ingest() -> None:
+    SKIP_INGEST.labels(current_endpoint(), _model_label.get()).inc()
+
+def record_retrieval(path: str) -> None:
+    RETRIEVALS.labels(path, current_endpoint()).inc()
+
+def record_error(stage: str, model: str = None) -> None:
+    ERRORS.labels(stage, current_endpoint(), _model_label.get() if model is None else model).inc()
+    tracing.mark_error(stage)
+
+
+def render_metrics():
+    """
+    Prometheus exposition for /metrics: (body, content type).
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
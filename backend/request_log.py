@@ -0,0 +1,56 @@
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+# JSONL log of request shapes (endpoint, video, query size, model, outcome) for benchmarks/load_replay.py
+REQUEST_LOG_PATH = os.getenv('REQUEST_LOG_PATH')
+# Query text is left out unless explicitly enabled; replays synthesize a query of the same length
+REQUEST_LOG_QUERIES = os.getenv('REQUEST_LOG_QUERIES', '').lower() == 'true'
+REPLAYABLE_ENDPOINTS = ('/api/transcript', '/api/query', '/api/query/stream')
+
+_shape = ContextVar('request_shape', default=None)
+_log_lock = threading.Lock()
+_log_file = None
+_log_file_pid = None
+
+
+def begin_request(endpoint: str) -> None:
+    """
+    Start collecting the shape of the current request (no-op unless REQUEST_LOG_PATH is set).
+    """
+    if REQUEST_LOG_PATH and endpoint in REPLAYABLE_ENDPOINTS:
+        _shape.set({'ts': round(time.time(), 3), 'endpoint': endpoint})
+    else:
+        _shape.set(None)
+
+def note(**fields) -> None:
+    shape = _shape.get()
+    if shape is not None:
+        shape.update({key: value for key, value in fields.items() if value is not None})
+
+def note_query(video_id: str, query: str, model: str) -> None:
+    note(video_id=video_id, model=model, query_chars=len(query or ''), query=query if REQUEST_LOG_QUERIES else None)
+
+def end_request(status: int, seconds: float) -> None:
+    """
+    Append the request's shape to REQUEST_LOG_PATH.
+    """
+    global _log_file, _log_file_pid
+    shape = _shape.get()
+    if shape is None:
+        return
+    _shape.set(None)
+    shape.update(status=status, latency_ms=int(seconds * 1000))
+    line = json.dumps(shape, ensure_ascii=False) + '\n'
+    try:
+        with _log_lock:
+            # One append-mode handle per process; single-line writes don't interleave across workers
+            if _log_file is None or _log_file_pid != os.getpid():
+                os.makedirs(os.path.dirname(os.path.abspath(REQUEST_LOG_PATH)), exist_ok=True)
+                _log_file = open(REQUEST_LOG_PATH, 'a', encoding='utf-8', buffering=1)
+                _log_file_pid = os.getpid()
+            _log_file.write(line)
+    except OSError as e:
+        print(f"Request log write failed: {str(e)}", flush=True)
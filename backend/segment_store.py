@@ -0,0 +1,117 @@
+import os
+import gzip
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Segment side-store settings
+SEGMENT_STORE_DIR = os.getenv('SEGMENT_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'segments'))
+SEGMENT_STORE_MEMORY_ENTRIES = int(os.getenv('SEGMENT_STORE_MEMORY_ENTRIES', '64'))
+
+# Recently loaded videos: video_id -> columns dict
+_loaded = OrderedDict()
+_loaded_lock = threading.Lock()
+
+
+def _segment_path(video_id: str) -> str:
+    safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', video_id)
+    return os.path.join(SEGMENT_STORE_DIR, f"{safe_id}.json.gz")
+
+
+def _remember(video_id: str, columns: dict) -> None:
+    with _loaded_lock:
+        _loaded[video_id] = columns
+        _loaded.move_to_end(video_id)
+        while len(_loaded) > SEGMENT_STORE_MEMORY_ENTRIES:
+            _loaded.popitem(last=False)
+
+
+def save_segments(video_id: str, transcript_data) -> None:
+    """
+    Store a video's caption segments once, column by column (gzip JSON).
+    Chunk payloads only reference them through segment_start/segment_end offsets.
+    original_text is stored only when it differs from text.
+    """
+    start = time.perf_counter()
+    texts = [entry['text'] for entry in transcript_data]
+    original_texts = [entry['original_text'] for entry in transcript_data]
+    columns = {
+        'text': texts,
+        'original_text': None if original_texts == texts else original_texts,
+        'start_time': [entry['start_time'] for entry in transcript_data],
+        'duration': [entry['duration'] for entry in transcript_data],
+    }
+    os.makedirs(SEGMENT_STORE_DIR, exist_ok=True)
+    path = _segment_path(video_id)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump({'video_id': video_id, 'columns': columns}, f, ensure_ascii=False, separators=(',', ':'))
+    # Atomic swap so concurrent readers never see a partial file
+    os.replace(tmp_path, path)
+    _remember(video_id, columns)
+    elapsed_ms = int((time.perf_counter() - start) * 1000)
+    print(f"⏱️ Stored {len(texts)} segments for '{video_id}' in {elapsed_ms} ms", flush=True)
+
+
+def _load_columns(video_id: str):
+    with _loaded_lock:
+        columns = _loaded.get(video_id)
+        if columns is not None:
+            _loaded.move_to_end(video_id)
+            return columns
+    path = _segment_path(video_id)
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        columns = json.load(f)['columns']
+    _remember(video_id, columns)
+    return columns
+
+
+def load_segments(video_id: str, segment_start: int = 0, segment_end: int = None):
+    """
+    Return caption segments [segment_start, segment_end) as dicts with
+    text, original_text, start_time and duration. Empty list if the video has no stored segments.
+    """
+    try:
+        columns = _load_columns(video_id)
+    except Exception as e:
+        print(f"Loading segments for '{video_id}' failed: {str(e)}", flush=True)
+        return []
+    if columns is None:
+        return []
+    texts = columns['text']
+    original_texts = columns['original_text'] or texts
+    end = len(texts) if segment_end is None else min(segment_end, len(texts))
+    return [
+        {
+            'text': texts[i],
+            'original_text': original_texts[i],
+            'start_time': columns['start_time'][i],
+            'duration': columns['duration'][i],
+        }
+        for i in range(max(segment_start, 0), end)
+    ]
+
+
+def segments_for_chunk(metadata: dict):
+    """
+    Caption segments behind a chunk. Supports both the compact payload
+    (segment_start/segment_end offsets) and older payloads that embed 'segments'.
+    """
+    if 'segments' in metadata:
+        return metadata['segments']
+    if 'segment_start' not in metadata or not metadata.get('video_id'):
+        return []
+    return load_segments(metadata['video_id'], metadata['segment_start'], metadata['segment_end'])
+
+
+def delete_segments(video_id: str) -> None:
+    with _loaded_lock:
+        _loaded.pop(video_id, None)
+    try:
+        os.remove(_segment_path(video_id))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,20 @@
+"""
+Shared test setup: backend modules import from the backend directory, and every on-disk
+store (caches, segments, lexical indexes, ingest locks) points at a throwaway directory.
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Module-level settings are read at import, so these must be set before any backend import
+_work_dir = tempfile.mkdtemp(prefix='backend-tests-')
+os.environ.setdefault('QUICK_QUESTIONS_CACHE_PATH', os.path.join(_work_dir, 'quick_questions.sqlite3'))
+os.environ.setdefault('SEGMENT_STORE_DIR', os.path.join(_work_dir, 'segments'))
+os.environ.setdefault('LEXICAL_INDEX_DIR', os.path.join(_work_dir, 'lexical'))
+os.environ.setdefault('TRANSCRIPT_CACHE_DIR', os.path.join(_work_dir, 'transcripts'))
+os.environ.setdefault('INGEST_LOCK_DIR', os.path.join(_work_dir, 'ingest-locks'))
+os.environ.setdefault('DISABLE_TRANSLATION', 'true')
+os.environ.setdefault('QDRANT_URL', 'http://127.0.0.1:9')
@@ -0,0 +1,135 @@
+import asyncio
+import time
+
+import pytest
+
+import ai_utils
+
+
+def test_async_model_is_per_event_loop():
+    async def model():
+        return ai_utils._gemini_model('key-loop', 'gemini-test', asynchronous=True)
+
+    first_loop_models = asyncio.run(_twice(model))
+    other_loop_model = asyncio.run(model())
+
+    assert first_loop_models[0] is first_loop_models[1]
+    assert other_loop_model is not first_loop_models[0]
+    assert other_loop_model._async_client is not first_loop_models[0]._async_client
+    # Sync callers share the per-key client across loops
+    assert other_loop_model._client is ai_utils._gemini_model('key-loop', 'gemini-test')._client
+
+
+async def _twice(factory):
+    return [await factory(), await factory()]
+
+
+PRIMARY = 'gemini-1.5-flash'
+FALLBACK = 'gemini-1.5-pro'
+
+
+def test_first_delta_wins_and_other_models_are_dropped(monkeypatch):
+    monkeypatch.setattr(ai_utils, 'GEMINI_HEDGE_AFTER_MS', 100)
+    race = ai_utils._HedgeRace(PRIMARY)
+    race.start_hedge()
+
+    assert race.accept('delta', FALLBACK, 'pro text') == 'pro text'
+    assert race.drop_losers() == [PRIMARY]
+    # The loser's late output is discarded
+    assert race.accept('delta', PRIMARY, 'flash text') is None
+    assert race.model == FALLBACK
+    assert race.accept('end', FALLBACK, None) is None
+    assert not race.running
+    assert not race.needs_fallback(produced=True)
+
+
+def test_needs_fallback_when_primary_breaks_or_produces_nothing(monkeypatch):
+    monkeypatch.setattr(ai_utils, 'GEMINI_HEDGE_AFTER_MS', 100)
+    race = ai_utils._HedgeRace(PRIMARY)
+    race.accept('error', PRIMARY, RuntimeError('quota'))
+    assert race.needs_fallback(produced=False)
+
+    race = ai_utils._HedgeRace(PRIMARY)
+    race.accept('delta', PRIMARY, 'partial')
+    race.accept('error', PRIMARY, RuntimeError('stream reset'))
+    assert race.needs_fallback(produced=True)
+
+    # The fallback already raced and lost too: no second attempt on it
+    race = ai_utils._HedgeRace(PRIMARY)
+    race.start_hedge()
+    race.accept('error', PRIMARY, RuntimeError('quota'))
+    race.accept('error', FALLBACK, RuntimeError('quota'))
+    assert not race.needs_fallback(produced=False)
+
+
+def _fake_models(monkeypatch, delays):
+    monkeypatch.setattr(ai_utils, 'GEMINI_HEDGE_AFTER_MS', 100)
+    monkeypatch.setattr(ai_utils, '_gemini_model', lambda api_key, model_name, asynchronous=False: model_name)
+
+    def stream(model_name, prompt):
+        time.sleep(delays[model_name])
+        yield f'{model_name}-a'
+        yield f'{model_name}-b'
+
+    async def astream(model_name, prompt):
+        await asyncio.sleep(delays[model_name])
+        yield f'{model_name}-a'
+        yield f'{model_name}-b'
+
+    monkeypatch.setattr(ai_utils, '_stream_model_text', stream)
+    monkeypatch.setattr(ai_utils, '_astream_model_text', astream)
+
+
+async def _acollect(race):
+    return [text async for text in ai_utils._afirst_responder('key', 'prompt', race)]
+
+
+@pytest.mark.parametrize('delays, winner, hedged', [
+    # Primary answers within the hedge budget: no hedge
+    ({PRIMARY: 0.0, FALLBACK: 0.0}, PRIMARY, False),
+    # Primary is late: the fallback starts and answers first
+    ({PRIMARY: 0.6, FALLBACK: 0.0}, FALLBACK, True),
+    # Hedged, but the primary still produces the first token
+    ({PRIMARY: 0.2, FALLBACK: 0.6}, PRIMARY, True),
+])
+def test_hedged_generation_yields_only_the_winner(monkeypatch, delays, winner, hedged):
+    _fake_models(monkeypatch, delays)
+
+    race = ai_utils._HedgeRace(PRIMARY)
+    assert list(ai_utils._first_responder('key', 'prompt', race)) == [f'{winner}-a', f'{winner}-b']
+    assert (race.model, race.hedged) == (winner, hedged)
+
+    race = ai_utils._HedgeRace(PRIMARY)
+    assert asyncio.run(_acollect(race)) == [f'{winner}-a', f'{winner}-b']
+    assert (race.model, race.hedged) == (winner, hedged)
+
+
+def test_broken_hedged_fallback_ends_in_an_error(monkeypatch):
+    _fake_models(monkeypatch, {PRIMARY: 0.6, FALLBACK: 0.0})
+
+    def stream(model_name, prompt):
+        time.sleep(0.6 if model_name == PRIMARY else 0.0)
+        yield f'{model_name}-a'
+        raise RuntimeError('stream reset')
+
+    async def astream(model_name, prompt):
+        await asyncio.sleep(0.6 if model_name == PRIMARY else 0.0)
+        yield f'{model_name}-a'
+        raise RuntimeError('stream reset')
+
+    monkeypatch.setattr(ai_utils, '_stream_model_text', stream)
+    monkeypatch.setattr(ai_utils, '_astream_model_text', astream)
+
+    events = list(ai_utils.stream_ai_response('query', [], 'key'))
+    assert events[-1] == ('error', {'success': False, 'error': ai_utils.GENERATION_INTERRUPTED_MESSAGE})
+    assert 'done' not in [event for event, _ in events]
+    with pytest.raises(ai_utils.GenerationInterrupted):
+        ai_utils.get_ai_response('query', [], 'key')
+
+    async def acollect():
+        return [item async for item in ai_utils.astream_ai_response('query', [], 'key')]
+
+    events = asyncio.run(acollect())
+    assert events[-1][0] == 'error'
+    with pytest.raises(ai_utils.GenerationInterrupted):
+        asyncio.run(ai_utils.aget_ai_response('query', [], 'key'))
@@ -0,0 +1,57 @@
+import subprocess
+import sys
+
+from starlette.testclient import TestClient
+
+import async_api
+from ingest_utils import LocalIngestCoordinator
+
+
+def test_import_does_not_build_the_flask_app():
+    code = "import sys, async_api; assert 'api' not in sys.modules and 'flask' not in sys.modules"
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=async_api.__file__.rsplit('/', 1)[0])
+
+
+def test_skip_ingest_path_does_not_warm_up_embedder(monkeypatch):
+    warmed = []
+
+    async def count(*args):
+        return 5
+
+    async def warm_up(api_key):
+        warmed.append(api_key)
+
+    monkeypatch.setattr(async_api, 'aget_collection_point_count', count)
+    monkeypatch.setattr(async_api, 'get_cached_quick_questions', lambda *args: ['Q?'])
+    monkeypatch.setattr(async_api, '_warm_up_embedder', warm_up)
+
+    response = TestClient(async_api.create_app()).get('/api/transcript?video_id=vid', headers={'X-API-Key': 'key'})
+
+    assert response.json()['quick-questions'] == ['Q?']
+    assert not warmed
+
+
+def test_ingest_path_warms_up_embedder_and_returns_json_on_error(monkeypatch):
+    warmed = []
+
+    async def count(*args):
+        return 0
+
+    async def warm_up(api_key):
+        warmed.append(api_key)
+
+    def failing_ingest(*args):
+        raise RuntimeError('qdrant unavailable')
+
+    monkeypatch.setattr(async_api, 'aget_collection_point_count', count)
+    monkeypatch.setattr(async_api, 'get_cached_quick_questions', lambda *args: None)
+    monkeypatch.setattr(async_api, 'get_collection_point_count', lambda *args: 0)
+    monkeypatch.setattr(async_api, '_warm_up_embedder', warm_up)
+    monkeypatch.setattr(async_api, 'ingest_transcript', failing_ingest)
+    monkeypatch.setattr(async_api, 'get_ingest_coordinator', LocalIngestCoordinator)
+
+    response = TestClient(async_api.create_app()).get('/api/transcript?video_id=vid', headers={'X-API-Key': 'key'})
+
+    assert response.status_code == 500
+    assert response.json() == {'success': False, 'error': 'qdrant unavailable'}
+    assert warmed == ['key']
@@ -0,0 +1,127 @@
+import time
+
+import vector_store_utils
+from cache_utils import QuickQuestionsCache, VideoVectorCache
+
+
+def _clock(monkeypatch, start=1000.0):
+    now = {'t': start}
+    monkeypatch.setattr(time, 'time', lambda: now['t'])
+    return now
+
+
+def test_quick_questions_round_trip_and_invalidate(tmp_path):
+    cache = QuickQuestionsCache(str(tmp_path / 'qq.sqlite3'), ttl_seconds=60, max_entries=10)
+    assert cache.get('vid', 'model') is None
+    cache.set('vid', 'model', ['Q1?', 'Q2?'])
+    cache.set('vid', 'other-model', ['Q3?'])
+    assert cache.get('vid', 'model') == ['Q1?', 'Q2?']
+
+    cache.invalidate('vid')
+    assert cache.get('vid', 'model') is None
+    assert cache.get('vid', 'other-model') is None
+
+
+def test_quick_questions_expire_after_ttl(monkeypatch, tmp_path):
+    now = _clock(monkeypatch)
+    cache = QuickQuestionsCache(str(tmp_path / 'qq.sqlite3'), ttl_seconds=60, max_entries=10)
+    cache.set('vid', 'model', ['Q?'])
+    now['t'] += 59
+    assert cache.get('vid', 'model') == ['Q?']
+    # Reads refresh recency, not the creation time the TTL is measured from
+    now['t'] += 2
+    assert cache.get('vid', 'model') is None
+
+
+def test_quick_questions_evict_least_recently_used(monkeypatch, tmp_path):
+    now = _clock(monkeypatch)
+    cache = QuickQuestionsCache(str(tmp_path / 'qq.sqlite3'), ttl_seconds=3600, max_entries=2)
+    for video_id in ('a', 'b'):
+        cache.set(video_id, 'model', [video_id])
+        now['t'] += 1
+    assert cache.get('a', 'model') == ['a']
+    now['t'] += 1
+    cache.set('c', 'model', ['c'])
+
+    assert cache.get('b', 'model') is None
+    assert cache.get('a', 'model') == ['a']
+    assert cache.get('c', 'model') == ['c']
+
+
+def test_uncacheable_video_is_remembered_until_ttl_or_invalidate(monkeypatch):
+    now = _clock(monkeypatch)
+    cache = VideoVectorCache(max_bytes=1024 * 1024, max_points_per_video=2, ttl_seconds=60)
+    payloads = [(i, f'chunk {i}', {}) for i in range(3)]
+
+    assert cache.put('c', 'vid', [[1.0, 0.0]] * 3, payloads) is None
+    assert cache.is_uncacheable('c', 'vid')
+
+    cache.invalidate('c', 'vid')
+    assert not cache.is_uncacheable('c', 'vid')
+
+    cache.mark_uncacheable('c', 'vid')
+    now['t'] += 61
+    assert not cache.is_uncacheable('c', 'vid')
+
+
+def test_put_clears_uncacheable_marker():
+    cache = VideoVectorCache(max_bytes=1024 * 1024, max_points_per_video=2, ttl_seconds=60)
+    cache.mark_uncacheable('c', 'vid')
+    assert cache.put('c', 'vid', [[1.0, 0.0]], [(1, 'chunk', {})]) is not None
+    assert not cache.is_uncacheable('c', 'vid')
+
+
+def test_oversized_video_is_scrolled_once(monkeypatch):
+    cache = VideoVectorCache(max_bytes=1024 * 1024, max_points_per_video=2, ttl_seconds=60)
+    scrolls = []
+
+    class Client:
+        def scroll(self, **kwargs):
+            scrolls.append(kwargs)
+            return [object()] * kwargs['limit'], None
+
+    class Embeddings:
+        def embed_query(self, text):
+            return [1.0, 0.0]
+
+    monkeypatch.setattr(vector_store_utils, 'video_vector_cache', cache)
+    monkeypatch.setattr(vector_store_utils, 'get_qdrant_client', lambda: Client())
+    vector_store = type('VectorStore', (), {'embeddings': Embeddings()})()
+
+    for _ in range(3):
+        assert vector_store_utils._search_vector_cache(vector_store, 'query', 'vid', k=2) is None
+    assert len(scrolls) == 1
+
+
+def test_search_error_drops_only_the_failing_video(monkeypatch):
+    cache = VideoVectorCache(max_bytes=1024 * 1024, max_points_per_video=2, ttl_seconds=60)
+    shared = vector_store_utils.QDRANT_SHARED_COLLECTION
+    for video_id in ('vid-a', 'vid-b'):
+        cache.put(shared, video_id, [[1.0, 0.0]], [(1, 'chunk', {})])
+    pool = vector_store_utils.OrderedDict()
+    for api_key in ('key-a', 'key-b'):
+        pool[(vector_store_utils._api_key_hash(api_key), shared)] = {'store': object(), 'last_used': 0.0}
+    monkeypatch.setattr(vector_store_utils, 'video_vector_cache', cache)
+    monkeypatch.setattr(vector_store_utils, '_vector_store_pool', pool)
+    monkeypatch.setattr(vector_store_utils, '_known_collections', {shared})
+
+    vector_store_utils._invalidate_after_search_error('key-a', shared, 'vid-a', TimeoutError('timed out'))
+    assert cache.get(shared, 'vid-a') is None
+    assert cache.get(shared, 'vid-b') is not None
+    assert list(pool) == [(vector_store_utils._api_key_hash('key-b'), shared)]
+    assert shared in vector_store_utils._known_collections
+
+    vector_store_utils._invalidate_after_search_error('key-b', shared, 'vid-b', RuntimeError('Collection not found'))
+    assert cache.get(shared, 'vid-b') is None
+    assert not pool
+    assert shared not in vector_store_utils._known_collections
+
+
+def test_empty_video_is_not_marked_uncacheable(monkeypatch):
+    cache = VideoVectorCache(max_bytes=1024 * 1024, max_points_per_video=2, ttl_seconds=60)
+    monkeypatch.setattr(vector_store_utils, 'video_vector_cache', cache)
+
+    assert cache.put('c', 'vid', [], []) is None
+    assert vector_store_utils._cache_scrolled_points('c', 'vid', [], limit=3, load_start=0.0) is None
+    # Ingested moments later: the next search fills the cache instead of waiting out the TTL
+    assert not cache.is_uncacheable('c', 'vid')
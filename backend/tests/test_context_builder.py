@@ -0,0 +1,60 @@
+import re
+
+from langchain_core.documents import Document
+
+from context_builder import build_context
+from segment_store import save_segments
+from youtube_utils import iter_transcript_chunks
+
+
+def _chunks(video_id, entries=300):
+    transcript_data = []
+    for i in range(entries):
+        text = f'segment{i:04d} ' + 'words ' * 8
+        transcript_data.append({'text': text.strip(), 'original_text': text.strip(), 'start_time': i * 3.0, 'duration': 3.0})
+    save_segments(video_id, transcript_data)
+    return [Document(page_content=text, metadata=metadata) for text, metadata in iter_transcript_chunks(transcript_data, video_id, 'en')]
+
+
+def _segment_ids(text):
+    return re.findall(r'segment\d{4}', text)
+
+
+def test_overlapping_chunks_emit_each_segment_once_in_time_order():
+    chunks = _chunks('ctx-overlap')
+    # Adjacent chunks share CHUNK_OVERLAP_SEGMENTS segments; retrieved out of time order
+    context = build_context([chunks[1], chunks[0]], token_budget=100000)
+
+    ids = _segment_ids(context.text)
+    assert len(ids) == len(set(ids))
+    assert ids == sorted(ids)
+    assert set(ids) == set(_segment_ids(chunks[0].page_content)) | set(_segment_ids(chunks[1].page_content))
+    assert context.dropped_chars > 0
+    assert all(re.match(r'\[\d\d:\d\d-\d\d:\d\d\] ', line) for line in context.text.split('\n'))
+
+
+def test_budget_admits_best_ranked_chunks_first():
+    chunks = _chunks('ctx-budget')
+    # Smaller than one chunk: only a prefix of the best-ranked chunk fits
+    budget = 400
+    context = build_context([chunks[3], chunks[0]], token_budget=budget)
+
+    ids = _segment_ids(context.text)
+    best = _segment_ids(chunks[3].page_content)
+    assert ids and ids == best[:len(ids)] and len(ids) < len(best)
+    assert context.estimated_tokens <= budget
+
+    # Once the best chunk is in, the rest of the budget goes to the next one
+    context = build_context([chunks[3], chunks[0]], token_budget=800)
+    ids = set(_segment_ids(context.text))
+    assert set(best) <= ids
+    assert ids & set(_segment_ids(chunks[0].page_content))
+
+
+def test_chunk_without_stored_segments_is_truncated_to_budget():
+    chunk = Document(page_content='word ' * 2000, metadata={'start_time': 60, 'duration': 30})
+    context = build_context([chunk], token_budget=100)
+
+    assert context.text.startswith('[01:00-01:30] word')
+    assert context.estimated_tokens <= 100
+    assert context.blocks == 1
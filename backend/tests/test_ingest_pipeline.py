@@ -0,0 +1,111 @@
+import os
+import threading
+
+import pytest
+from qdrant_client import QdrantClient
+
+import ingest_pipeline
+import lexical_index
+import segment_store
+import vector_store_utils
+from vector_store_utils import get_collection_point_count
+
+
+class _Embeddings:
+    """
+    Deterministic fake embedder; embed_documents raises on call number `fail_on`.
+    """
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if call == self.fail_on:
+            raise RuntimeError('embedding backend down')
+        return [[0.1, 0.2, 0.3, 0.4] for _ in texts]
+
+    def embed_query(self, text):
+        return [0.1, 0.2, 0.3, 0.4]
+
+
+def _transcript(entries=400):
+    texts = [f'caption line number {i} about the topic of this video' for i in range(entries)]
+    return [{'text': text, 'original_text': text, 'start_time': i * 2.0, 'duration': 2.0}
+            for i, text in enumerate(texts)]
+
+
+@pytest.fixture
+def qdrant(monkeypatch):
+    monkeypatch.setattr(vector_store_utils, '_qdrant_client', QdrantClient(':memory:'))
+    monkeypatch.setattr(vector_store_utils, 'ensure_collection_exists', _ensure_small_collection)
+    monkeypatch.setattr(vector_store_utils, '_known_collections', set())
+    monkeypatch.setattr(vector_store_utils, '_vector_store_pool', vector_store_utils.OrderedDict())
+    # Small batches so a failure lands after several batches were already upserted
+    monkeypatch.setattr(ingest_pipeline, 'INGEST_EMBED_BATCH_SIZE', 2)
+    monkeypatch.setattr(vector_store_utils, 'INGEST_EMBED_MAX_RETRIES', 0)
+
+
+def _ensure_small_collection(collection_name, embedding_size=768, recreate=False):
+    from qdrant_client.models import Distance, VectorParams
+    client = vector_store_utils.get_qdrant_client()
+    if not client.collection_exists(collection_name):
+        client.create_collection(collection_name, vectors_config=VectorParams(size=4, distance=Distance.COSINE))
+    return True
+
+
+def _ingest(monkeypatch, embeddings, video_id, collection_name, entries=400):
+    monkeypatch.setattr(vector_store_utils, 'get_embeddings', lambda api_key: embeddings)
+    monkeypatch.setattr(vector_store_utils, '_vector_store_pool', vector_store_utils.OrderedDict())
+    return ingest_pipeline.run_ingest_pipeline(_transcript(entries), video_id, 'en', 'key', collection_name)
+
+
+@pytest.mark.parametrize('collection_name', ['vid-a', vector_store_utils.QDRANT_SHARED_COLLECTION])
+def test_failed_write_leaves_no_partial_index(monkeypatch, qdrant, collection_name):
+    video_id = 'vid-a'
+    result = _ingest(monkeypatch, _Embeddings(fail_on=4), video_id, collection_name)
+
+    assert not result['success']
+    assert result['chunks_processed'] > 0
+    # The skip-ingest check sees nothing, so the next request ingests again
+    assert get_collection_point_count(collection_name, video_id) == 0
+    assert lexical_index.load_index(video_id) is None
+    assert not os.path.exists(segment_store._segment_path(video_id))
+
+    result = _ingest(monkeypatch, _Embeddings(), video_id, collection_name)
+    assert result['success']
+    assert get_collection_point_count(collection_name, video_id) == result['chunks_processed']
+
+
+def test_stage_timer_counts_overlapping_items_once(monkeypatch):
+    clock = iter([3.0, 4.0, 10.0])
+    monkeypatch.setattr(ingest_pipeline.time, 'perf_counter', lambda: next(clock))
+    timer = ingest_pipeline._StageTimer()
+    # Three concurrent translations submitted at 0, 1 and 2, awaited in submission order
+    for started in (0.0, 1.0, 2.0):
+        timer.add(started)
+    assert timer.items == 3
+    assert timer.busy == 10.0
+
+
+def test_stage_timer_ends_items_at_completion():
+    timer = ingest_pipeline._StageTimer()
+    # The first translation finishes last; the others finished while it was awaited
+    for started, ended in ((0.0, 10.0), (1.0, 2.0), (12.0, 13.0)):
+        timer.add(started, ended=ended)
+    assert timer.items == 3
+    assert timer.busy == 11.0
+
+
+def test_failed_batch_stops_the_ingest_early(monkeypatch, qdrant):
+    embeddings = _Embeddings(fail_on=1)
+    result = _ingest(monkeypatch, embeddings, 'vid-a', 'vid-a', entries=4000)
+
+    assert not result['success']
+    # Only the batches already queued when the first one failed reach the embedder
+    assert embeddings.calls <= vector_store_utils.INGEST_EMBED_CONCURRENCY + 1
+    assert get_collection_point_count('vid-a', 'vid-a') == 0
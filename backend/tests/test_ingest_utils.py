@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import ingest_utils
+from ingest_utils import FileLockIngestCoordinator, IngestInProgress, LocalIngestCoordinator
+from metrics import INGEST_WAIT_TIMEOUTS
+
+
+def _run_concurrently(coordinator, key, fn, callers):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(coordinator.run(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results, errors
+
+
+def test_concurrent_callers_share_one_run():
+    calls = []
+    release = threading.Event()
+
+    def ingest():
+        calls.append(1)
+        release.wait(2)
+        return {'success': True, 'timings': {}}
+
+    coordinator = LocalIngestCoordinator(wait_timeout=5)
+    threading.Timer(0.2, release.set).start()
+    results, errors = _run_concurrently(coordinator, 'vid', ingest, callers=5)
+
+    assert not errors
+    assert len(calls) == 1
+    assert len(results) == 5
+    assert sum(1 for result in results if result.get('ingest_shared')) == 4
+    # Every caller gets its own copy
+    results[0]['timings']['x'] = 1
+    assert all('x' not in result['timings'] for result in results[1:])
+
+
+def test_async_callers_share_one_run_and_one_thread(monkeypatch):
+    calls = []
+    threads = []
+    to_thread = asyncio.to_thread
+
+    async def counting_to_thread(fn, *args):
+        threads.append(fn)
+        return await to_thread(fn, *args)
+
+    def ingest():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'success': True, 'timings': {}}
+
+    monkeypatch.setattr(ingest_utils.asyncio, 'to_thread', counting_to_thread)
+    coordinator = LocalIngestCoordinator(wait_timeout=5)
+
+    async def callers():
+        return await asyncio.gather(*[coordinator.arun('vid', ingest) for _ in range(5)])
+
+    results = asyncio.run(callers())
+    assert len(calls) == 1
+    assert len(threads) == 1
+    assert sum(1 for result in results if result.get('ingest_shared')) == 4
+    results[0]['timings']['x'] = 1
+    assert all('x' not in result['timings'] for result in results[1:])
+
+
+def test_async_wait_timeout_asks_for_retry():
+    def ingest():
+        time.sleep(0.5)
+        return {'success': True}
+
+    coordinator = LocalIngestCoordinator(wait_timeout=0.1)
+
+    async def callers():
+        return await asyncio.gather(coordinator.arun('vid', ingest),
+                                    coordinator.arun('vid', ingest, already_done=lambda: False),
+                                    return_exceptions=True)
+
+    leader, waiter = asyncio.run(callers())
+    assert leader == {'success': True}
+    assert isinstance(waiter, IngestInProgress)
+
+
+def test_leader_error_reaches_waiters():
+    release = threading.Event()
+
+    def ingest():
+        release.wait(2)
+        raise RuntimeError('ingest failed')
+
+    coordinator = LocalIngestCoordinator(wait_timeout=5)
+    threading.Timer(0.2, release.set).start()
+    results, errors = _run_concurrently(coordinator, 'vid', ingest, callers=3)
+
+    assert not results
+    assert len(errors) == 3
+    assert all(str(error) == 'ingest failed' for error in errors)
+
+
+def test_finished_flight_is_not_reused():
+    coordinator = LocalIngestCoordinator()
+    calls = []
+    for _ in range(2):
+        coordinator.run('vid', lambda: calls.append(1) or {'success': True})
+    assert len(calls) == 2
+
+
+def test_wait_timeout_never_runs_a_second_ingest():
+    release = threading.Event()
+    calls = []
+
+    def ingest():
+        calls.append(1)
+        release.wait(2)
+        return {'success': True}
+
+    coordinator = LocalIngestCoordinator(wait_timeout=0.1)
+    before = INGEST_WAIT_TIMEOUTS.labels('local')._value.get()
+    leader = threading.Thread(target=coordinator.run, args=('vid', ingest))
+    leader.start()
+    time.sleep(0.05)
+    with pytest.raises(IngestInProgress) as excinfo:
+        coordinator.run('vid', ingest, already_done=lambda: False)
+    # A peer's ingest that finished meanwhile is served instead
+    assert coordinator.run('vid', ingest, already_done=lambda: True) == {'success': True, 'ingested_by_peer': True}
+    release.set()
+    leader.join(5)
+
+    assert len(calls) == 1
+    assert excinfo.value.retry_after > 0
+    assert INGEST_WAIT_TIMEOUTS.labels('local')._value.get() == before + 2
+
+
+def test_file_lock_timeout_never_runs_a_second_ingest(tmp_path):
+    import fcntl
+
+    coordinator = FileLockIngestCoordinator(lock_dir=str(tmp_path), wait_timeout=0.3)
+    with open(coordinator._lock_path('vid'), 'a') as peer_lock:
+        # Another worker holds the lock for the whole wait
+        fcntl.flock(peer_lock.fileno(), fcntl.LOCK_EX)
+        with pytest.raises(IngestInProgress):
+            coordinator.run('vid', lambda: pytest.fail('should not ingest'), already_done=lambda: False)
+
+
+def test_file_lock_skips_ingest_finished_by_peer(tmp_path):
+    coordinator = FileLockIngestCoordinator(lock_dir=str(tmp_path))
+    result = coordinator.run('vid', lambda: pytest.fail('should not ingest'), already_done=lambda: True)
+    assert result == {'success': True, 'ingested_by_peer': True}
+
+
+def test_transcript_endpoint_returns_json_on_ingest_error(monkeypatch):
+    import api
+    import vector_store_utils
+
+    def failing_ingest(*args, **kwargs):
+        raise RuntimeError('qdrant unavailable')
+
+    monkeypatch.setattr(vector_store_utils, 'get_collection_point_count', lambda *args, **kwargs: 0)
+    monkeypatch.setattr(api, 'ingest_transcript', failing_ingest)
+    monkeypatch.setattr(ingest_utils, '_ingest_coordinator', LocalIngestCoordinator())
+
+    response = api.create_app().test_client().get('/api/transcript?video_id=vid', headers={'X-API-Key': 'key'})
+
+    assert response.status_code == 500
+    assert response.get_json() == {'success': False, 'error': 'qdrant unavailable'}
+
+
+def test_transcript_endpoint_asks_for_retry_while_ingest_is_in_flight(monkeypatch):
+    import api
+    import vector_store_utils
+
+    def in_progress(*args, **kwargs):
+        raise IngestInProgress('vid', 7)
+
+    monkeypatch.setattr(vector_store_utils, 'get_collection_point_count', lambda *args, **kwargs: 0)
+    monkeypatch.setattr(api, 'get_ingest_coordinator', lambda: type('Coordinator', (), {'run': staticmethod(in_progress)})())
+
+    response = api.create_app().test_client().get('/api/transcript?video_id=vid', headers={'X-API-Key': 'key'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '7'
+    assert response.get_json()['success'] is False
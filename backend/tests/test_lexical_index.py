@@ -0,0 +1,62 @@
+from langchain_core.documents import Document
+
+import lexical_index
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+
+
+def _docs(*texts):
+    return [Document(page_content=text, metadata={'n': n}) for n, text in enumerate(texts)]
+
+
+def test_rrf_rewards_chunks_found_by_both_retrievers():
+    vector = _docs('a', 'b', 'c')
+    lexical = _docs('c', 'd')
+    fused = reciprocal_rank_fusion([vector, lexical], k=4, rrf_k=60)
+    # c: 1/63 + 1/61 beats a: 1/61; then b: 1/62 ties d: 1/62 and keeps first-seen order
+    assert [doc.page_content for doc in fused] == ['c', 'a', 'b', 'd']
+    # The first list's copy of a shared chunk is kept
+    assert fused[0] is vector[2]
+
+
+def test_rrf_truncates_to_k():
+    fused = reciprocal_rank_fusion([_docs('a', 'b', 'c'), _docs('b')], k=2)
+    assert [doc.page_content for doc in fused] == ['b', 'a']
+
+
+def _index():
+    filler = [f'general discussion of topic number {n} and related ideas' for n in range(12)]
+    texts = filler + [
+        'the speaker configures kubernetes autoscaling with custom metrics',
+        'kubernetes basics and general discussion',
+    ]
+    return LexicalIndex.build('vid', [(text, {'n': n}) for n, text in enumerate(texts)])
+
+
+def test_confident_when_every_term_present_and_one_is_rare():
+    index = _index()
+    hits, confident = index.search('What does the speaker say about kubernetes autoscaling?', k=3)
+    assert index.docs[hits[0][1]][0].startswith('the speaker configures')
+    assert confident
+
+
+def test_not_confident_when_a_term_is_missing_from_best_chunk():
+    hits, confident = _index().search('kubernetes autoscaling pricing', k=3)
+    assert hits
+    assert not confident
+
+
+def test_not_confident_when_terms_are_common(monkeypatch):
+    monkeypatch.setattr(lexical_index, 'LEXICAL_CONFIDENT_MIN_IDF', 10.0)
+    hits, confident = _index().search('kubernetes autoscaling', k=3)
+    assert hits
+    assert not confident
+
+
+def test_quoted_phrase_must_appear_verbatim():
+    index = _index()
+    assert index.search('"custom metrics" autoscaling', k=3)[1]
+    assert not index.search('"metrics custom" autoscaling', k=3)[1]
+
+
+def test_stopword_only_query_has_no_hits():
+    assert _index().search('what did the speaker say about this', k=3) == ([], False)
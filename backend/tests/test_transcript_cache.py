@@ -0,0 +1,70 @@
+import os
+
+import transcript_cache
+from transcript_cache import CachedSnippet, CachedTrack
+
+
+def _snippets(seed, entries=200):
+    # Distinct text per track so gzip can't shrink them to nothing
+    return [CachedSnippet(f'{seed} caption {i} {os.urandom(8).hex()}', i * 2.0, 2.0) for i in range(entries)]
+
+
+def test_store_walks_tree_only_when_estimate_crosses_bound(monkeypatch, tmp_path):
+    monkeypatch.setattr(transcript_cache, 'TRANSCRIPT_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(transcript_cache, 'TRANSCRIPT_CACHE_MAX_MB', 1)
+    scans = []
+    cache_files = transcript_cache._cache_files
+    monkeypatch.setattr(transcript_cache, '_cache_files', lambda: scans.append(1) or cache_files())
+
+    track = CachedTrack('en', False)
+    transcript_cache.store_track('vid-0', track, _snippets(0))
+    # First store counts the tree once to seed the shared estimate
+    assert len(scans) == 1
+    for n in range(1, 5):
+        transcript_cache.store_track(f'vid-{n}', track, _snippets(n))
+    assert len(scans) == 1
+    assert transcript_cache._read_size() == transcript_cache.usage()[1]
+
+
+def test_eviction_removes_least_recently_used(monkeypatch, tmp_path):
+    monkeypatch.setattr(transcript_cache, 'TRANSCRIPT_CACHE_DIR', str(tmp_path))
+    track = CachedTrack('en', True)
+    transcript_cache.store_track('old', track, _snippets('old'))
+    track_bytes = transcript_cache.usage()[1]
+    # Room for two tracks
+    monkeypatch.setattr(transcript_cache, 'TRANSCRIPT_CACHE_MAX_MB', 2.5 * track_bytes / (1024 * 1024))
+    os.utime(transcript_cache._track_path('old', 'en', True), (1, 1))
+    transcript_cache.store_track('mid', track, _snippets('mid'))
+    transcript_cache.store_track('new', track, _snippets('new'))
+
+    assert transcript_cache.cached_tracks('old') == []
+    assert transcript_cache.load_track('mid', track) is not None
+    assert transcript_cache.load_track('new', track) is not None
+    assert not os.path.exists(os.path.join(str(tmp_path), 'old'))
+    assert transcript_cache._read_size() == transcript_cache.usage()[1]
+
+
+def test_eviction_tolerates_tracks_removed_by_a_peer(monkeypatch, tmp_path):
+    monkeypatch.setattr(transcript_cache, 'TRANSCRIPT_CACHE_DIR', str(tmp_path))
+    track = CachedTrack('en', False)
+    for video_id in ('a', 'b'):
+        transcript_cache.store_track(video_id, track, _snippets(video_id))
+    listed = transcript_cache._cache_files()
+    # A peer removes 'a' between this worker's scan and its unlink
+    os.remove(transcript_cache._track_path('a', 'en', False))
+    monkeypatch.setattr(transcript_cache, '_cache_files', lambda: listed)
+    evicted, remaining = transcript_cache._evict(0)
+    assert evicted == 1
+    assert remaining == 0
+
+
+def test_evicting_last_track_removes_default_marker_and_directory(monkeypatch, tmp_path):
+    monkeypatch.setattr(transcript_cache, 'TRANSCRIPT_CACHE_DIR', str(tmp_path))
+    track = CachedTrack('en', False)
+    transcript_cache.store_track('vid', track, _snippets('vid'))
+    transcript_cache.store_default_track('vid', track)
+    assert transcript_cache.default_track('vid') == track
+
+    assert transcript_cache._evict(0) == (1, 0)
+    assert transcript_cache.default_track('vid') is None
+    assert not os.path.exists(os.path.join(str(tmp_path), 'vid'))
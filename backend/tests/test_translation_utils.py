@@ -0,0 +1,84 @@
+import pytest
+
+import translation_utils
+from translation_utils import TranslationPool, TranslationTimeout
+
+
+class _FakeConn:
+    def __init__(self):
+        self.pending = None
+
+    def send(self, text):
+        if text == 'die':
+            raise BrokenPipeError()
+        self.pending = text
+
+    def poll(self, timeout):
+        return self.pending != 'hang'
+
+    def recv(self):
+        return self.pending.upper()
+
+
+class _FakeWorker:
+    spawned = []
+
+    def __init__(self):
+        self.conn = _FakeConn()
+        self.tasks = 0
+        self.stopped = None
+        _FakeWorker.spawned.append(self)
+
+    def stop(self, graceful=True):
+        self.stopped = 'graceful' if graceful else 'killed'
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    _FakeWorker.spawned = []
+    monkeypatch.setattr(translation_utils, '_TranslationWorker', _FakeWorker)
+    return TranslationPool(size=1, timeout=1, max_tasks=3)
+
+
+def test_hung_worker_is_killed_and_replaced(pool):
+    hung = _FakeWorker.spawned[0]
+    with pytest.raises(TranslationTimeout):
+        pool.translate('hang')
+
+    assert hung.stopped == 'killed'
+    assert len(_FakeWorker.spawned) == 2
+    # The replacement serves the next task
+    assert pool.translate('namaste') == 'NAMASTE'
+    assert pool._workers == {_FakeWorker.spawned[1]}
+
+
+def test_dead_worker_returns_none_and_is_replaced(pool):
+    dead = _FakeWorker.spawned[0]
+    assert pool.translate('die') is None
+    assert dead.stopped == 'killed'
+    assert pool.translate('ok') == 'OK'
+
+
+def test_worker_is_recycled_after_max_tasks(pool):
+    first = _FakeWorker.spawned[0]
+    for _ in range(3):
+        pool.translate('text')
+    assert first.stopped == 'graceful'
+    assert len(_FakeWorker.spawned) == 2
+    assert pool._idle.qsize() == 1
+
+
+def test_repeated_timeouts_disable_translation_for_the_request(monkeypatch, pool):
+    monkeypatch.setattr(translation_utils, 'DISABLE_TRANSLATION_ENV', False)
+    monkeypatch.setattr(translation_utils, 'TRANSLATION_MAX_TIMEOUTS', 2)
+    monkeypatch.setattr(translation_utils, 'get_translation_pool', lambda: pool)
+    flag = {'disabled': False}
+
+    assert translation_utils.safe_translate_text('hang', flag) == 'hang'
+    assert not flag['disabled']
+    assert translation_utils.safe_translate_text('hang', flag) == 'hang'
+    assert flag['disabled']
+    # Skipped without touching the pool
+    spawned = len(_FakeWorker.spawned)
+    assert translation_utils.safe_translate_text('namaste', flag) == 'namaste'
+    assert len(_FakeWorker.spawned) == spawned
@@ -0,0 +1,128 @@
+import random
+
+import pytest
+
+import transcript_cache
+import youtube_utils
+from youtube_utils import iter_transcript_chunks
+
+
+def _legacy_chunks(transcript_data, video_id, detected_lang):
+    """
+    The quadratic sliding-window chunker iter_transcript_chunks replaced (without
+    translation), kept as the reference: (chunk_text, metadata with embedded segments).
+    """
+    chunks = []
+    current_chunk = []
+    current_metadata = {'start_time': 0, 'duration': 0, 'segments': [], 'video_id': video_id, 'detected_language': detected_lang}
+    for entry in transcript_data:
+        current_chunk.append(entry['text'])
+        if not current_metadata['segments']:
+            current_metadata['start_time'] = entry['start_time']
+        current_metadata['duration'] += entry['duration']
+        current_metadata['segments'].append({
+            'text': entry['text'],
+            'original_text': entry['original_text'],
+            'start_time': entry['start_time'],
+            'duration': entry['duration']
+        })
+        combined_text = ' '.join(current_chunk)
+        if len(combined_text) >= 2500:
+            chunks.append((combined_text, current_metadata.copy()))
+            overlap_segments = current_metadata['segments'][-2:]
+            current_chunk = [seg['text'] for seg in overlap_segments]
+            current_metadata = {
+                'start_time': overlap_segments[0]['start_time'],
+                'duration': sum(seg['duration'] for seg in overlap_segments),
+                'segments': overlap_segments,
+                'video_id': video_id,
+                'detected_language': detected_lang
+            }
+    if current_chunk:
+        chunks.append((' '.join(current_chunk), current_metadata.copy()))
+    return chunks
+
+
+def _transcript(lengths):
+    rng = random.Random(len(lengths))
+    entries = []
+    start = 0.0
+    for length in lengths:
+        text = ''.join(rng.choice('abcdefgh ') for _ in range(length)).strip() or 'x'
+        duration = round(rng.uniform(0.5, 6.0), 2)
+        entries.append({'text': text, 'original_text': text, 'start_time': start, 'duration': duration})
+        start += duration
+    return entries
+
+
+@pytest.mark.parametrize('lengths', [
+    [40] * 1000,
+    [1] * 5,
+    [3000],
+    [2499, 1, 2500, 10, 10],
+    # Ends exactly on a chunk boundary, leaving only the overlap for the final chunk
+    [1249, 1250],
+    random.Random(7).choices(range(1, 400), k=2000),
+])
+def test_chunks_match_legacy_chunker(lengths):
+    transcript_data = _transcript(lengths)
+    legacy = _legacy_chunks(transcript_data, 'vid', 'en')
+    chunks = list(iter_transcript_chunks(transcript_data, 'vid', 'en'))
+
+    assert [text for text, _ in chunks] == [text for text, _ in legacy]
+    for (_, metadata), (_, legacy_metadata) in zip(chunks, legacy):
+        assert metadata['start_time'] == legacy_metadata['start_time']
+        assert metadata['duration'] == pytest.approx(legacy_metadata['duration'])
+        assert transcript_data[metadata['segment_start']:metadata['segment_end']] == legacy_metadata['segments']
+        assert metadata['video_id'] == 'vid'
+        assert metadata['detected_language'] == 'en'
+
+
+def test_build_docs_uses_chunker_and_stores_segments(monkeypatch):
+    transcript_data = _transcript([40] * 200)
+    saved = {}
+    monkeypatch.setattr(youtube_utils, 'save_segments', lambda video_id, data: saved.setdefault('segments', (video_id, len(data))))
+    monkeypatch.setattr(youtube_utils, 'save_index', lambda video_id, docs: saved.setdefault('index', (video_id, len(docs))))
+
+    docs = youtube_utils._build_transcript_docs(transcript_data, 'vid', 'en')
+
+    assert [(doc.page_content, doc.metadata) for doc in docs] == list(iter_transcript_chunks(transcript_data, 'vid', 'en'))
+    assert saved == {'segments': ('vid', 200), 'index': ('vid', len(docs))}
+
+
+class _Track:
+    def __init__(self, language_code, is_generated=False):
+        self.language_code = language_code
+        self.is_generated = is_generated
+        self.fetches = 0
+
+    def fetch(self):
+        self.fetches += 1
+        return [transcript_cache.CachedSnippet(f'{self.language_code} line {i}', i * 2.0, 2.0) for i in range(5)]
+
+
+class _YouTube:
+    def __init__(self, *tracks):
+        self.tracks = tracks
+        self.lists = 0
+
+    def list(self, video_id):
+        self.lists += 1
+        return list(self.tracks)
+
+
+def test_language_request_does_not_change_the_default_track(monkeypatch, tmp_path):
+    monkeypatch.setattr(transcript_cache, 'TRANSCRIPT_CACHE_DIR', str(tmp_path))
+    youtube = _YouTube(_Track('en'), _Track('hi'))
+
+    # A request for Hindi caches the hi track only
+    assert youtube_utils.fetch_transcript_entries('vid', 'hi', youtube)['track']['language_code'] == 'hi'
+    assert youtube_utils.load_cached_track('vid') is None
+
+    # A default request still gets YouTube's pick, which is then served from the cache
+    assert youtube_utils.fetch_transcript_entries('vid', None, youtube)['track']['language_code'] == 'en'
+    lists = youtube.lists
+    result = youtube_utils.fetch_transcript_entries('vid', None, youtube)
+    assert result['track']['language_code'] == 'en'
+    assert youtube.lists == lists
+    assert youtube_utils.load_cached_track('vid', 'hi')[0].language_code == 'hi'
@@ -0,0 +1,338 @@
+import heapq
+import hmac
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+# Per-request span trees; the last TRACE_BUFFER_SIZE and the slowest TRACE_SLOWEST_SIZE are kept in memory
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'true').lower() == 'true'
+TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', '100'))
+TRACE_SLOWEST_SIZE = int(os.getenv('TRACE_SLOWEST_SIZE', '20'))
+# Spans per trace beyond this are counted but not kept (large ingests open one per batch/chunk)
+TRACE_MAX_SPANS = int(os.getenv('TRACE_MAX_SPANS', '500'))
+# /api/debug/traces is disabled unless a token is configured
+TRACE_DEBUG_TOKEN = os.getenv('TRACE_DEBUG_TOKEN')
+TRACE_SERVICE_NAME = os.getenv('TRACE_SERVICE_NAME', 'youtube-rag-backend')
+# Scrapes and probes would crowd real requests out of the trace ring buffer
+UNTRACED_ENDPOINTS = ('/metrics', '/api/ready', '/api/debug/traces')
+
+_current_span = ContextVar('tracing_span', default=None)
+
+
+class Span:
+    """
+    One timed operation. Children may be added from worker threads (see propagate()).
+    """
+
+    __slots__ = ('trace', 'span_id', 'parent', 'name', 'start_ns', 'end_ns', 'attributes', 'events', 'error', 'children')
+
+    def __init__(self, trace, name: str, parent=None, start_ns: int = None, attributes: dict = None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent = parent
+        self.name = name
+        self.start_ns = time.time_ns() if start_ns is None else start_ns
+        self.end_ns = None
+        self.attributes = {key: value for key, value in (attributes or {}).items() if value is not None}
+        self.events = []
+        self.error = None
+        self.children = []
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes) -> None:
+        self.events.append((time.time_ns(), name, attributes))
+
+    def finish(self, end_ns: int = None) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns() if end_ns is None else end_ns
+
+    def to_dict(self, origin_ns: int) -> dict:
+        node = {
+            "name": self.name,
+            "offset_ms": round((self.start_ns - origin_ns) / 1e6, 2),
+            "duration_ms": round(self.duration_ms, 2),
+        }
+        if self.attributes:
+            node["attributes"] = self.attributes
+        if self.error:
+            node["error"] = self.error
+        if self.events:
+            node["events"] = [
+                {"name": name, "offset_ms": round((ts - origin_ns) / 1e6, 2), **attrs}
+                for ts, name, attrs in self.events
+            ]
+        if self.children:
+            node["children"] = [child.to_dict(origin_ns) for child in sorted(self.children, key=lambda s: s.start_ns)]
+        return node
+
+
+class Trace:
+    """
+    The span tree of one request.
+    """
+
+    def __init__(self, name: str, attributes: dict = None):
+        self.trace_id = os.urandom(16).hex()
+        self.span_count = 0
+        self.dropped_spans = 0
+        self._lock = threading.Lock()
+        self._token = None
+        self.root = self.new_span(name, None, attributes=attributes)
+
+    def new_span(self, name: str, parent, start_ns: int = None, attributes: dict = None):
+        with self._lock:
+            if self.span_count >= TRACE_MAX_SPANS:
+                self.dropped_spans += 1
+                return None
+            self.span_count += 1
+        span = Span(self, name, parent, start_ns, attributes)
+        if parent is not None:
+            parent.children.append(span)
+        return span
+
+    @property
+    def duration_ms(self) -> float:
+        return self.root.duration_ms
+
+    def iter_spans(self):
+        stack = [self.root]
+        while stack:
+            span = stack.pop()
+            yield span
+            stack.extend(span.children)
+
+    def to_dict(self) -> dict:
+        root = self.root
+        return {
+            "trace_id": self.trace_id,
+            "name": root.name,
+            "started_at": root.start_ns / 1e9,
+            "duration_ms": round(root.duration_ms, 2),
+            "spans": self.span_count,
+            "dropped_spans": self.dropped_spans,
+            "tree": root.to_dict(root.start_ns),
+        }
+
+
+class TraceBuffer:
+    """
+    Bounded in-memory store of finished traces: the most recent N and the slowest N.
+    """
+
+    def __init__(self, max_recent: int = TRACE_BUFFER_SIZE, max_slowest: int = TRACE_SLOWEST_SIZE):
+        self.max_slowest = max_slowest
+        self._recent = deque(maxlen=max_recent)
+        self._slowest = []  # min-heap of (duration_ms, seq, trace)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace) -> None:
+        duration = trace.duration_ms
+        with self._lock:
+            self._recent.append(trace)
+            if self.max_slowest <= 0:
+                return
+            item = (duration, next(self._seq), trace)
+            if len(self._slowest) < self.max_slowest:
+                heapq.heappush(self._slowest, item)
+            elif duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def recent(self, limit: int = None) -> list:
+        with self._lock:
+            traces = list(reversed(self._recent))
+        return traces[:limit] if limit else traces
+
+    def slowest(self, limit: int = None) -> list:
+        with self._lock:
+            traces = [trace for _, _, trace in sorted(self._slowest, key=lambda item: item[0], reverse=True)]
+        return traces[:limit] if limit else traces
+
+    def find(self, trace_id: str):
+        with self._lock:
+            candidates = list(self._recent) + [trace for _, _, trace in self._slowest]
+        return next((trace for trace in candidates if trace.trace_id == trace_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._recent.clear()
+            self._slowest = []
+
+
+trace_buffer = TraceBuffer()
+
+
+def start_trace(name: str, **attributes):
+    """
+    Start the trace of the current request and make its root the current span.
+    Returns the Trace (None when tracing is disabled) for finish_trace().
+    """
+    if not TRACING_ENABLED:
+        return None
+    trace = Trace(name, attributes)
+    trace._token = _current_span.set(trace.root)
+    return trace
+
+def finish_trace(trace, **attributes) -> None:
+    """
+    Close the request's root span and keep the trace in the ring buffer.
+    """
+    if trace is None or trace.root.end_ns is not None:
+        return
+    try:
+        _current_span.reset(trace._token)
+    except ValueError:
+        # Finished from another context (e.g. after a streamed response)
+        pass
+    trace.root.attributes.update({key: value for key, value in attributes.items() if value is not None})
+    trace.root.finish()
+    trace_buffer.add(trace)
+
+def current_span():
+    return _current_span.get()
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block as a child of the current span. A no-op outside a traced request.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.trace.new_span(name, parent, attributes=attributes)
+    if child is None:
+        yield None
+        return
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {str(e)[:200]}"
+        raise
+    finally:
+        _current_span.reset(token)
+        child.finish()
+
+def record_span(name: str, seconds: float, **attributes) -> None:
+    """
+    Add an already measured span that ended just now.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return
+    end_ns = time.time_ns()
+    child = parent.trace.new_span(name, parent, start_ns=end_ns - int(seconds * 1e9), attributes=attributes)
+    if child is not None:
+        child.finish(end_ns)
+
+def set_attribute(key: str, value) -> None:
+    current = _current_span.get()
+    if current is not None:
+        current.set_attribute(key, value)
+
+def mark_error(stage: str) -> None:
+    """
+    Note an error (or timeout) on the current span without failing it.
+    """
+    current = _current_span.get()
+    if current is not None:
+        current.add_event('error', stage=stage)
+
+def propagate(fn):
+    """
+    Wrap fn so it runs in a copy of the caller's context: spans opened by worker
+    threads (translation pool, embedding writer) join the request's tree.
+    """
+    if _current_span.get() is None:
+        return fn
+    context = copy_context()
+
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+def debug_token_valid(token: str) -> bool:
+    if not TRACE_DEBUG_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), TRACE_DEBUG_TOKEN.encode())
+
+def traces_payload(view: str = 'slowest', limit: int = None, trace_id: str = None, fmt: str = 'tree'):
+    """
+    Body of /api/debug/traces: span trees (default) or OTLP/JSON (fmt='otel').
+    Returns (payload, status code).
+    """
+    if trace_id:
+        trace = trace_buffer.find(trace_id)
+        if trace is None:
+            return {"success": False, "error": f"Trace '{trace_id}' not found"}, 404
+        traces = [trace]
+    elif view == 'recent':
+        traces = trace_buffer.recent(limit)
+    elif view == 'slowest':
+        traces = trace_buffer.slowest(limit)
+    else:
+        return {"success": False, "error": "view must be 'recent' or 'slowest'"}, 400
+
+    if fmt == 'otel':
+        return to_otlp_json(traces), 200
+    return {"success": True, "view": view, "traces": [trace.to_dict() for trace in traces]}, 200
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes: dict) -> list:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+def to_otlp_json(traces) -> dict:
+    """
+    Export traces in the OTLP/JSON trace format (as accepted by an OpenTelemetry collector's /v1/traces).
+    """
+    spans = []
+    for trace in traces:
+        for item in trace.iter_spans():
+            otel_span = {
+                "traceId": trace.trace_id,
+                "spanId": item.span_id,
+                "name": item.name,
+                # SPAN_KIND_SERVER for the request, SPAN_KIND_INTERNAL below it
+                "kind": 2 if item.parent is None else 1,
+                "startTimeUnixNano": str(item.start_ns),
+                "endTimeUnixNano": str(item.end_ns if item.end_ns is not None else time.time_ns()),
+                "attributes": _otlp_attributes(item.attributes),
+                # STATUS_CODE_ERROR / STATUS_CODE_UNSET
+                "status": {"code": 2, "message": item.error} if item.error else {"code": 0},
+            }
+            if item.parent is not None:
+                otel_span["parentSpanId"] = item.parent.span_id
+            if item.events:
+                otel_span["events"] = [
+                    {"timeUnixNano": str(ts), "name": name, "attributes": _otlp_attributes(attrs)}
+                    for ts, name, attrs in item.events
+                ]
+            spans.append(otel_span)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": TRACE_SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}],
+        }]
+    }
@@ -0,0 +1,266 @@
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: eviction is only serialized within the process
+    fcntl = None
+
+# Raw caption tracks as fetched from YouTube, so re-ingesting a video (lost or migrated
+# collection) doesn't go back through the proxy. One gzip JSON file per track:
+# TRANSCRIPT_CACHE_DIR/<video_id>/<language>.<manual|generated>.json.gz
+# plus <video_id>/default.json naming the track YouTube gave a request without languages
+TRANSCRIPT_CACHE_DIR = os.getenv('TRANSCRIPT_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'transcripts'))
+# Size bound for the whole cache; least recently used tracks are evicted beyond it (0 disables the cache)
+TRANSCRIPT_CACHE_MAX_MB = float(os.getenv('TRANSCRIPT_CACHE_MAX_MB', '512'))
+
+CACHE_VERSION = 1
+
+# Shaped like the youtube_transcript_api track and snippet objects fetch_transcript_entries uses
+CachedTrack = namedtuple('CachedTrack', ['language_code', 'is_generated'])
+CachedSnippet = namedtuple('CachedSnippet', ['text', 'start', 'duration'])
+
+_TRACK_FILE_RE = re.compile(r'(.+)\.(manual|generated)\.json\.gz')
+_DEFAULT_FILE = 'default.json'
+# Running size of the cache shared by every worker, so a store only walks the tree once
+# the bound is crossed; both files live in TRANSCRIPT_CACHE_DIR and are updated under the lock file
+_SIZE_FILE = '.size'
+_LOCK_FILE = '.lock'
+_evict_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return TRANSCRIPT_CACHE_MAX_MB > 0
+
+
+def _safe_name(value: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_-]', '_', value)
+
+
+def _video_dir(video_id: str) -> str:
+    return os.path.join(TRANSCRIPT_CACHE_DIR, _safe_name(video_id))
+
+
+def _track_path(video_id: str, language_code: str, is_generated: bool) -> str:
+    kind = 'generated' if is_generated else 'manual'
+    return os.path.join(_video_dir(video_id), f"{_safe_name(language_code)}.{kind}.json.gz")
+
+
+def cached_tracks(video_id: str):
+    """
+    CachedTrack for every track stored for the video.
+    """
+    if not enabled():
+        return []
+    try:
+        names = os.listdir(_video_dir(video_id))
+    except FileNotFoundError:
+        return []
+    tracks = []
+    for name in names:
+        match = _TRACK_FILE_RE.fullmatch(name)
+        if match:
+            tracks.append(CachedTrack(match.group(1), match.group(2) == 'generated'))
+    return tracks
+
+
+def load_track(video_id: str, track):
+    """
+    Cached entries of one track as CachedSnippets, or None if it isn't cached.
+    """
+    path = _track_path(video_id, track.language_code, track.is_generated)
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Loading cached transcript '{video_id}' ({track.language_code}) failed: {str(e)}", flush=True)
+        return None
+    if data.get('version') != CACHE_VERSION:
+        return None
+    try:
+        # The modification time doubles as the last-use time for eviction
+        os.utime(path)
+    except OSError:
+        pass
+    return [CachedSnippet(*entry) for entry in data['entries']]
+
+
+def store_track(video_id: str, track, snippets) -> None:
+    """
+    Store a fetched track (objects with text/start/duration), then evict down to the size bound.
+    """
+    if not enabled() or not snippets:
+        return
+    start = time.perf_counter()
+    path = _track_path(video_id, track.language_code, track.is_generated)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    data = {
+        'version': CACHE_VERSION,
+        'video_id': video_id,
+        'language_code': track.language_code,
+        'is_generated': track.is_generated,
+        'entries': [[snippet.text, snippet.start, snippet.duration] for snippet in snippets],
+    }
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        try:
+            replaced_size = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced_size = 0
+        added_size = os.path.getsize(tmp_path) - replaced_size
+        # Atomic swap so concurrent readers never see a partial file
+        os.replace(tmp_path, path)
+        evicted = _account(added_size, int(TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024))
+    except OSError as e:
+        # A cache failure never fails the ingest
+        print(f"Caching transcript '{video_id}' failed: {str(e)}", flush=True)
+        return
+    elapsed_ms = int((time.perf_counter() - start) * 1000)
+    print(f"⏱️ Cached {len(snippets)} transcript entries for '{video_id}' ({track.language_code}) in {elapsed_ms} ms"
+          f"{f', evicted {evicted} tracks' if evicted else ''}", flush=True)
+
+
+def store_default_track(video_id: str, track) -> None:
+    """
+    Remember which track a request without languages was given, so later such requests
+    are served that track and not whatever other language happens to be cached.
+    """
+    if not enabled():
+        return
+    path = os.path.join(_video_dir(video_id), _DEFAULT_FILE)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'language_code': track.language_code, 'is_generated': track.is_generated}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Caching default transcript track of '{video_id}' failed: {str(e)}", flush=True)
+
+
+def default_track(video_id: str):
+    """
+    CachedTrack recorded by store_default_track, or None.
+    """
+    if not enabled():
+        return None
+    try:
+        with open(os.path.join(_video_dir(video_id), _DEFAULT_FILE), encoding='utf-8') as f:
+            data = json.load(f)
+        return CachedTrack(data['language_code'], bool(data['is_generated']))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Loading default transcript track of '{video_id}' failed: {str(e)}", flush=True)
+        return None
+
+
+def _cache_files():
+    # (last use, size, path) for every cached track
+    files = []
+    try:
+        video_dirs = list(os.scandir(TRANSCRIPT_CACHE_DIR))
+    except FileNotFoundError:
+        return files
+    for video_dir in video_dirs:
+        if not video_dir.is_dir():
+            continue
+        try:
+            for entry in os.scandir(video_dir.path):
+                if _TRACK_FILE_RE.fullmatch(entry.name):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            continue
+    return files
+
+
+def _account(added_bytes: int, max_bytes: int) -> int:
+    """
+    Add a store to the shared size estimate and evict once it crosses max_bytes;
+    returns how many tracks were evicted.
+    """
+    with _evict_lock:
+        lock_file = open(os.path.join(TRANSCRIPT_CACHE_DIR, _LOCK_FILE), 'a')
+        try:
+            if fcntl is not None:
+                # Serializes the estimate and eviction across gunicorn workers
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            total = _read_size()
+            if total is None:
+                total = sum(size for _, size, _ in _cache_files())
+            else:
+                total += added_bytes
+            evicted = 0
+            if total > max_bytes:
+                # The estimate misses files removed outside this module, so recount before evicting
+                evicted, total = _evict(max_bytes)
+            _write_size(total)
+            return evicted
+        finally:
+            lock_file.close()
+
+
+def _read_size():
+    try:
+        with open(os.path.join(TRANSCRIPT_CACHE_DIR, _SIZE_FILE)) as f:
+            return int(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_size(total: int) -> None:
+    path = os.path.join(TRANSCRIPT_CACHE_DIR, _SIZE_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(str(max(total, 0)))
+    os.replace(tmp_path, path)
+
+
+def _evict(max_bytes: int):
+    """
+    Remove least recently used tracks until the cache fits in max_bytes.
+    Caller holds the lock; returns (tracks evicted, bytes remaining).
+    """
+    files = _cache_files()
+    total = sum(size for _, size, _ in files)
+    evicted = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        total -= size
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Already removed outside the lock (by hand, or by a worker without fcntl)
+            continue
+        evicted += 1
+        video_dir = os.path.dirname(path)
+        try:
+            # Drop the video's directory (and its default-track marker) once its last track is gone
+            if not any(_TRACK_FILE_RE.fullmatch(name) for name in os.listdir(video_dir)):
+                try:
+                    os.remove(os.path.join(video_dir, _DEFAULT_FILE))
+                except FileNotFoundError:
+                    pass
+                os.rmdir(video_dir)
+        except OSError:
+            pass
+    return evicted, total
+
+
+def usage():
+    """
+    (cached tracks, total bytes) on disk.
+    """
+    files = _cache_files()
+    return len(files), sum(size for _, size, _ in files)
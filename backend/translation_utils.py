@@ -0,0 +1,196 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pipe, Process
+
+from metrics import observe_stage, record_error
+import tracing
+
+# Translation settings
+TRANSLATION_TIMEOUT_SECONDS = int(os.getenv('TRANSLATION_TIMEOUT_SECONDS', '5'))
+MAX_TRANSLATION_CHARS = int(os.getenv('MAX_TRANSLATION_CHARS', '3000'))
+DISABLE_TRANSLATION_ENV = os.getenv('DISABLE_TRANSLATION', '').lower() == 'true'
+TRANSLATION_POOL_SIZE = int(os.getenv('TRANSLATION_POOL_SIZE', '4'))
+TRANSLATION_WORKER_MAX_TASKS = int(os.getenv('TRANSLATION_WORKER_MAX_TASKS', '200'))
+# Timeouts tolerated per request before translation is switched off for the rest of it
+TRANSLATION_MAX_TIMEOUTS = int(os.getenv('TRANSLATION_MAX_TIMEOUTS', '2'))
+
+
+class TranslationTimeout(Exception):
+    """Raised when a translator worker does not answer within the task timeout."""
+
+
+def _translation_worker_main(conn) -> None:
+    """
+    Long-lived translator process: one GoogleTranslator, serving texts from the pipe until closed.
+    """
+    from deep_translator import GoogleTranslator
+    translator = GoogleTranslator(source='auto', target='en')
+    while True:
+        try:
+            text = conn.recv()
+        except (EOFError, OSError):
+            return
+        if text is None:
+            return
+        try:
+            conn.send(translator.translate(text))
+        except Exception:  # noqa: BLE001
+            # Signal failure
+            try:
+                conn.send(None)
+            except Exception:
+                return
+
+
+class _TranslationWorker:
+    def __init__(self):
+        self.conn, child_conn = Pipe()
+        self.process = Process(target=_translation_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def stop(self, graceful: bool = True) -> None:
+        try:
+            if graceful and self.process.is_alive():
+                self.conn.send(None)
+                self.process.join(1)
+        except Exception:
+            pass
+        try:
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(1)
+        finally:
+            self.conn.close()
+
+
+class TranslationPool:
+    """
+    Fixed-size pool of translator processes. Each task has a hard timeout: a worker
+    that does not answer in time is killed and replaced, and workers are recycled
+    after `max_tasks` translations.
+    """
+
+    def __init__(self, size: int = TRANSLATION_POOL_SIZE, timeout: int = TRANSLATION_TIMEOUT_SECONDS, max_tasks: int = TRANSLATION_WORKER_MAX_TASKS):
+        self.size = size
+        self.timeout = timeout
+        self.max_tasks = max_tasks
+        self._idle = queue.Queue()
+        self._workers_lock = threading.Lock()
+        self._workers = set()
+        for _ in range(size):
+            self._idle.put(self._spawn())
+        print(f"Started translation pool with {size} workers", flush=True)
+
+    def _spawn(self):
+        worker = _TranslationWorker()
+        with self._workers_lock:
+            self._workers.add(worker)
+        return worker
+
+    def _retire(self, worker, graceful: bool) -> None:
+        with self._workers_lock:
+            self._workers.discard(worker)
+        worker.stop(graceful=graceful)
+
+    def translate(self, text: str):
+        """
+        Translate one text. Returns the translation, None on failure, or raises
+        TranslationTimeout if the worker did not answer within the timeout.
+        """
+        worker = self._idle.get(timeout=self.timeout * self.size + 1)
+        try:
+            worker.conn.send(text)
+            if not worker.conn.poll(self.timeout):
+                # Hung worker: kill it and put a fresh one in its place
+                self._retire(worker, graceful=False)
+                worker = self._spawn()
+                raise TranslationTimeout(f"translation exceeded {self.timeout}s")
+            translated = worker.conn.recv()
+            worker.tasks += 1
+            if worker.tasks >= self.max_tasks:
+                self._retire(worker, graceful=True)
+                worker = self._spawn()
+            return translated
+        except (EOFError, OSError, BrokenPipeError):
+            # Worker died mid-task
+            self._retire(worker, graceful=False)
+            worker = self._spawn()
+            return None
+        finally:
+            self._idle.put(worker)
+
+    def shutdown(self) -> None:
+        with self._workers_lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.stop(graceful=True)
+
+
+_translation_pool = None
+_translation_pool_pid = None
+_translation_pool_lock = threading.Lock()
+
+def get_translation_pool():
+    """
+    Lazily start the process-wide translation pool (restarted after fork).
+    """
+    global _translation_pool, _translation_pool_pid
+    if _translation_pool is None or _translation_pool_pid != os.getpid():
+        with _translation_pool_lock:
+            if _translation_pool is None or _translation_pool_pid != os.getpid():
+                _translation_pool = TranslationPool()
+                _translation_pool_pid = os.getpid()
+    return _translation_pool
+
+def safe_translate_text(text: str, disable_flag: dict) -> str:
+    """
+    Translate text to English with a strict timeout. After TRANSLATION_MAX_TIMEOUTS
+    timeouts, further translations for this request are skipped.
+    """
+    if not text:
+        return text
+    if disable_flag.get('disabled', False) or DISABLE_TRANSLATION_ENV:
+        return text
+
+    truncated = text[:MAX_TRANSLATION_CHARS]
+    try:
+        with tracing.span('translate_chunk', chars=len(truncated)):
+            translated = get_translation_pool().translate(truncated)
+        return translated if translated else text
+    except (TranslationTimeout, queue.Empty):
+        with _translation_pool_lock:
+            disable_flag['timeouts'] = disable_flag.get('timeouts', 0) + 1
+            if disable_flag['timeouts'] >= TRANSLATION_MAX_TIMEOUTS:
+                disable_flag['disabled'] = True
+        record_error('translation_timeout')
+        print(f"Translation timed out after {TRANSLATION_TIMEOUT_SECONDS}s (timeouts={disable_flag['timeouts']}, disabled={disable_flag.get('disabled', False)})")
+        return text
+    except Exception as e:  # noqa: BLE001
+        print(f"Translation error: {e}")
+        record_error('translation')
+        disable_flag['disabled'] = True
+        return text
+
+def translate_texts(texts, disable_flag: dict):
+    """
+    Translate several texts concurrently, bounded by the pool size. Order is preserved;
+    texts that fail or time out are returned untranslated.
+    """
+    if not texts:
+        return []
+    if disable_flag.get('disabled', False) or DISABLE_TRANSLATION_ENV:
+        return list(texts)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(TRANSLATION_POOL_SIZE, len(texts))) as executor:
+        translated = list(executor.map(tracing.propagate(lambda text: safe_translate_text(text, disable_flag)), texts))
+    elapsed_ms = int((time.perf_counter() - start) * 1000)
+    observe_stage('translation', elapsed_ms / 1000)
+    print(f"⏱️ Translated {len(texts)} chunks in {elapsed_ms} ms (pool size {TRANSLATION_POOL_SIZE})", flush=True)
+    return translated
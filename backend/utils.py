@@ -1,3 +1,4 @@
+import json
 import sys
 
 def setup_console_encoding():
@@ -14,4 +15,7 @@ def format_timestamp(seconds):
     
     if hours > 0:
         return f"{hours:02d}:{minutes:02d}:{secs:02d}"
-    return f"{minutes:02d}:{secs:02d}" 
\ No newline at end of file
+    return f"{minutes:02d}:{secs:02d}"
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -1,17 +1,56 @@
+from langchain_core.embeddings import Embeddings
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
-from qdrant_client.http.exceptions import UnexpectedResponse
-from qdrant_client.models import Distance, VectorParams
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.models import Distance, FieldCondition, Filter, FilterSelector, HnswConfigDiff, KeywordIndexParams, KeywordIndexType, MatchValue, PointStruct, VectorParams
 import os
+import asyncio
+import hashlib
+import threading
 import time
+import uuid
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import json
+from langchain_core.documents import Document
+from cache_utils import query_embedding_cache, video_vector_cache
+from lexical_index import load_index, reciprocal_rank_fusion, save_index
+from metrics import observe_stage, record_error, record_retrieval
+import tracing
+
+# Vector store handle pool settings
+VECTOR_STORE_POOL_MAX_SIZE = int(os.getenv('VECTOR_STORE_POOL_MAX_SIZE', '256'))
+VECTOR_STORE_POOL_IDLE_SECONDS = int(os.getenv('VECTOR_STORE_POOL_IDLE_SECONDS', '900'))
+
+# Storage layout: 'per_video' (one collection per video, the original layout) or
+# 'shared' (videos share QDRANT_SHARED_SHARDS collections, filtered by metadata.video_id)
+QDRANT_STORAGE_LAYOUT = os.getenv('QDRANT_STORAGE_LAYOUT', 'per_video').lower()
+QDRANT_SHARED_COLLECTION = os.getenv('QDRANT_SHARED_COLLECTION', 'yt-rag-shared')
+QDRANT_SHARED_SHARDS = int(os.getenv('QDRANT_SHARED_SHARDS', '1'))
+VIDEO_ID_PAYLOAD_KEY = 'metadata.video_id'
+
+# Ingest writer settings
+INGEST_EMBED_BATCH_SIZE = int(os.getenv('INGEST_EMBED_BATCH_SIZE', '32'))
+INGEST_EMBED_CONCURRENCY = int(os.getenv('INGEST_EMBED_CONCURRENCY', '4'))
+INGEST_EMBED_MAX_RETRIES = int(os.getenv('INGEST_EMBED_MAX_RETRIES', '4'))
+INGEST_EMBED_RETRY_BASE_SECONDS = float(os.getenv('INGEST_EMBED_RETRY_BASE_SECONDS', '1.0'))
+
+# Chunk retrieval: 'vector' (embedding search only, the default), 'hybrid' (BM25 and vector results
+# fused with reciprocal-rank fusion) or, opt-in, 'lexical_first' (hybrid, but confident exact-term
+# BM25 hits skip the embedder and vector search entirely)
+RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', 'vector').lower()
+# Candidates taken from each retriever before fusion, as a multiple of k
+HYBRID_CANDIDATE_MULTIPLIER = int(os.getenv('HYBRID_CANDIDATE_MULTIPLIER', '2'))
 
 # Initialize Qdrant client with environment variable support
 # For Railway deployment, use the internal service URL
 QDRANT_URL = os.getenv('QDRANT_URL') or os.getenv('RAILWAY_QDRANT_URL') or 'http://localhost:6333'
-print(f"Connecting to Qdrant at: {QDRANT_URL}", flush=True)
+# Seconds to wait before retrying client construction after every attempt failed
+QDRANT_CLIENT_RETRY_SECONDS = int(os.getenv('QDRANT_CLIENT_RETRY_SECONDS', '30'))
+# Background readiness probe interval (0 = probe once)
+QDRANT_PROBE_INTERVAL_SECONDS = int(os.getenv('QDRANT_PROBE_INTERVAL_SECONDS', '30'))
 
 def test_qdrant_connection():
     """Test if Qdrant service is reachable"""
@@ -77,113 +116,314 @@ def test_qdrant_connection():
         print(f"Full traceback: {traceback.format_exc()}", flush=True)
         return False
 
-# Test connection on import with timing
-_tc_start = time.perf_counter()
-test_qdrant_connection()
-_tc_ms = int((time.perf_counter() - _tc_start) * 1000)
-print(f"⏱️ Qdrant connection test on import took {_tc_ms} ms", flush=True)
-
-# Simple configuration for local development
-try:
-    # Try different client configurations for Railway compatibility
-    if QDRANT_URL.startswith('https://'):
-        print("Using HTTPS configuration for QdrantClient", flush=True)
-        
-        # Try multiple configuration approaches for HTTPS
-        qdrant_client = None
-        
-        # Attempt 1: Standard HTTPS configuration
-        try:
-            print("Attempting standard HTTPS connection...", flush=True)
-            _cstart = time.perf_counter()
-            qdrant_client = QdrantClient(
-                url=QDRANT_URL, 
-                timeout=60,
-                # Try with explicit HTTPS settings
-                prefer_grpc=False  # Force HTTP API instead of gRPC
-            )
-            # Test the connection immediately
-            test_collections = qdrant_client.get_collections()
-            _cms = int((time.perf_counter() - _cstart) * 1000)
-            print(f"✅ Standard HTTPS connection successful in {_cms} ms", flush=True)
-        except Exception as e:
-            print(f"Standard HTTPS failed: {str(e)}", flush=True)
+def connection_debug_info() -> dict:
+    """
+    Qdrant URL, cache stats and HTTP/client connectivity results for the /api/debug endpoint.
+    """
+    debug_info = {
+        "environment_vars": {
+            "QDRANT_URL": os.getenv('QDRANT_URL'),
+            "RAILWAY_QDRANT_URL": os.getenv('RAILWAY_QDRANT_URL'),
+        },
+        "computed_url": QDRANT_URL,
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "video_vector_cache": video_vector_cache.stats(),
+        "connection_test": None,
+        "http_test": None,
+        "error": None
+    }
+
+    # Test basic HTTP connection
+    try:
+        response = requests.get(f"{QDRANT_URL}/", timeout=10)
+        debug_info["http_test"] = {
+            "status_code": response.status_code,
+            "success": response.status_code == 200,
+            "response_preview": str(response.text)[:200] if response.text else None
+        }
+    except Exception as e:
+        debug_info["http_test"] = {
+            "error": str(e),
+            "error_type": type(e).__name__
+        }
+
+    # Test Qdrant connection
+    debug_info["connection_test"] = test_qdrant_connection()
+    return debug_info
+
+def _create_qdrant_client():
+    """
+    Build a QdrantClient for QDRANT_URL. HTTPS URLs try a few configurations
+    (each verified with get_collections); returns None if all of them fail.
+    """
+    print(f"Connecting to Qdrant at: {QDRANT_URL}", flush=True)
+    try:
+        # Try different client configurations for Railway compatibility
+        if QDRANT_URL.startswith('https://'):
+            print("Using HTTPS configuration for QdrantClient", flush=True)
+
+            # Try multiple configuration approaches for HTTPS
             qdrant_client = None
-        
-        # Attempt 2: If standard fails, try with port specification
-        if qdrant_client is None:
-            try:
-                print("Attempting HTTPS with port 443...", flush=True)
-                # Railway HTTPS is on port 443
-                url_with_port = QDRANT_URL.replace('.app', '.app:443')
-                _cstart = time.perf_counter()
-                qdrant_client = QdrantClient(
-                    url=url_with_port,
-                    timeout=60,
-                    prefer_grpc=False
-                )
-                test_collections = qdrant_client.get_collections()
-                _cms = int((time.perf_counter() - _cstart) * 1000)
-                print(f"✅ HTTPS with port 443 successful in {_cms} ms", flush=True)
-            except Exception as e:
-                print(f"HTTPS with port failed: {str(e)}", flush=True)
-                qdrant_client = None
-        
-        # Attempt 3: Try HTTP instead of HTTPS (Railway might redirect)
-        if qdrant_client is None:
+
+            # Attempt 1: Standard HTTPS configuration
             try:
-                print("Attempting HTTP fallback (Railway auto-redirects)...", flush=True)
-                http_url = QDRANT_URL.replace('https://', 'http://')
+                print("Attempting standard HTTPS connection...", flush=True)
                 _cstart = time.perf_counter()
                 qdrant_client = QdrantClient(
-                    url=http_url,
+                    url=QDRANT_URL, 
                     timeout=60,
-                    prefer_grpc=False
+                    # Try with explicit HTTPS settings
+                    prefer_grpc=False  # Force HTTP API instead of gRPC
                 )
+                # Test the connection immediately
                 test_collections = qdrant_client.get_collections()
                 _cms = int((time.perf_counter() - _cstart) * 1000)
-                print(f"✅ HTTP fallback successful in {_cms} ms", flush=True)
+                print(f"✅ Standard HTTPS connection successful in {_cms} ms", flush=True)
             except Exception as e:
-                print(f"HTTP fallback failed: {str(e)}", flush=True)
+                print(f"Standard HTTPS failed: {str(e)}", flush=True)
                 qdrant_client = None
-                
-    else:
-        print("Using HTTP configuration for QdrantClient", flush=True)
-        _cstart = time.perf_counter()
-        qdrant_client = QdrantClient(url=QDRANT_URL, timeout=30)
-        _cms = int((time.perf_counter() - _cstart) * 1000)
-        print(f"QdrantClient initialized in {_cms} ms", flush=True)
-    
-    if qdrant_client is not None:
-        print("✅ Qdrant client initialized successfully", flush=True)
-    else:
-        print("❌ All QdrantClient connection attempts failed, will use HTTP fallback", flush=True)
-        
-except Exception as e:
-    print(f"❌ Failed to initialize Qdrant client: {str(e)}", flush=True)
-    qdrant_client = None
+
+            # Attempt 2: If standard fails, try with port specification
+            if qdrant_client is None:
+                try:
+                    print("Attempting HTTPS with port 443...", flush=True)
+                    # Railway HTTPS is on port 443
+                    url_with_port = QDRANT_URL.replace('.app', '.app:443')
+                    _cstart = time.perf_counter()
+                    qdrant_client = QdrantClient(
+                        url=url_with_port,
+                        timeout=60,
+                        prefer_grpc=False
+                    )
+                    test_collections = qdrant_client.get_collections()
+                    _cms = int((time.perf_counter() - _cstart) * 1000)
+                    print(f"✅ HTTPS with port 443 successful in {_cms} ms", flush=True)
+                except Exception as e:
+                    print(f"HTTPS with port failed: {str(e)}", flush=True)
+                    qdrant_client = None
+
+            # Attempt 3: Try HTTP instead of HTTPS (Railway might redirect)
+            if qdrant_client is None:
+                try:
+                    print("Attempting HTTP fallback (Railway auto-redirects)...", flush=True)
+                    http_url = QDRANT_URL.replace('https://', 'http://')
+                    _cstart = time.perf_counter()
+                    qdrant_client = QdrantClient(
+                        url=http_url,
+                        timeout=60,
+                        prefer_grpc=False
+                    )
+                    test_collections = qdrant_client.get_collections()
+                    _cms = int((time.perf_counter() - _cstart) * 1000)
+                    print(f"✅ HTTP fallback successful in {_cms} ms", flush=True)
+                except Exception as e:
+                    print(f"HTTP fallback failed: {str(e)}", flush=True)
+                    qdrant_client = None
+
+        else:
+            print("Using HTTP configuration for QdrantClient", flush=True)
+            _cstart = time.perf_counter()
+            qdrant_client = QdrantClient(url=QDRANT_URL, timeout=30)
+            _cms = int((time.perf_counter() - _cstart) * 1000)
+            print(f"QdrantClient initialized in {_cms} ms", flush=True)
+
+        if qdrant_client is not None:
+            print("✅ Qdrant client initialized successfully", flush=True)
+        else:
+            print("❌ All QdrantClient connection attempts failed, will use HTTP fallback", flush=True)
+
+    except Exception as e:
+        print(f"❌ Failed to initialize Qdrant client: {str(e)}", flush=True)
+        qdrant_client = None
+    return qdrant_client
+
+
+_qdrant_client = None
+_qdrant_client_failed_at = None
+_qdrant_client_lock = threading.Lock()
+
+def get_qdrant_client():
+    """
+    Lazily create the process-wide Qdrant client on first use.
+    Returns None while Qdrant is unreachable (callers fall back to HTTP); construction
+    is retried at most every QDRANT_CLIENT_RETRY_SECONDS.
+    """
+    global _qdrant_client, _qdrant_client_failed_at
+    if _qdrant_client is not None:
+        return _qdrant_client
+    with _qdrant_client_lock:
+        if _qdrant_client is None:
+            if _qdrant_client_failed_at is not None and time.time() - _qdrant_client_failed_at < QDRANT_CLIENT_RETRY_SECONDS:
+                return None
+            _cstart = time.perf_counter()
+            _qdrant_client = _create_qdrant_client()
+            _qdrant_client_failed_at = None if _qdrant_client is not None else time.time()
+            _cms = int((time.perf_counter() - _cstart) * 1000)
+            print(f"⏱️ Qdrant client setup took {_cms} ms", flush=True)
+    return _qdrant_client
+
+
+# Latest background probe result, served by /api/ready
+_qdrant_status = {"ready": False, "checked_at": None, "latency_ms": None, "error": "not probed yet"}
+_qdrant_probe_pid = None
+_qdrant_probe_lock = threading.Lock()
+
+def probe_qdrant() -> dict:
+    """
+    One readiness check: build the client if needed and list collections.
+    """
+    global _qdrant_status
+    probe_start = time.perf_counter()
+    status = {"ready": False, "checked_at": time.time(), "latency_ms": None, "error": None}
+    try:
+        client = get_qdrant_client()
+        if client is None:
+            status["error"] = "Qdrant client not initialized"
+        else:
+            client.get_collections()
+            status["ready"] = True
+    except Exception as e:
+        status["error"] = str(e)
+    status["latency_ms"] = int((time.perf_counter() - probe_start) * 1000)
+    if status["ready"] != _qdrant_status["ready"]:
+        print(f"Qdrant readiness changed: ready={status['ready']} ({status['latency_ms']} ms){' - ' + status['error'] if status['error'] else ''}", flush=True)
+    _qdrant_status = status
+    return status
+
+def _qdrant_probe_loop() -> None:
+    while True:
+        probe_qdrant()
+        if QDRANT_PROBE_INTERVAL_SECONDS <= 0:
+            return
+        time.sleep(QDRANT_PROBE_INTERVAL_SECONDS)
+
+def start_qdrant_probe() -> None:
+    """
+    Start the background connectivity probe for this process (idempotent, restarted after fork).
+    """
+    global _qdrant_probe_pid
+    if _qdrant_probe_pid == os.getpid():
+        return
+    with _qdrant_probe_lock:
+        if _qdrant_probe_pid != os.getpid():
+            threading.Thread(target=_qdrant_probe_loop, name="qdrant-probe", daemon=True).start()
+            _qdrant_probe_pid = os.getpid()
+
+def qdrant_status() -> dict:
+    """
+    Latest readiness probe result: ready, checked_at, latency_ms, error.
+    """
+    return dict(_qdrant_status, url=QDRANT_URL)
+
+EMBEDDING_MODEL = "models/embedding-001"
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Wraps an embeddings client so repeated query texts skip the remote embedding call.
+    Document embeddings (ingest) are passed straight through.
+    """
+
+    def __init__(self, embeddings, model_name: str):
+        self.embeddings = embeddings
+        self.model_name = model_name
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        vector = query_embedding_cache.get(self.model_name, text)
+        if vector is not None:
+            return vector
+        emb_start = time.perf_counter()
+        vector = self.embeddings.embed_query(text)
+        emb_ms = int((time.perf_counter() - emb_start) * 1000)
+        observe_stage('query_embedding', emb_ms / 1000)
+        print(f"⏱️ Query embedding took {emb_ms} ms (cache miss)", flush=True)
+        query_embedding_cache.set(self.model_name, text, vector)
+        return vector
+
+    async def aembed_query(self, text):
+        vector = query_embedding_cache.get(self.model_name, text)
+        if vector is not None:
+            return vector
+        emb_start = time.perf_counter()
+        vector = await self.embeddings.aembed_query(text)
+        emb_ms = int((time.perf_counter() - emb_start) * 1000)
+        observe_stage('query_embedding', emb_ms / 1000)
+        print(f"⏱️ Query embedding took {emb_ms} ms (cache miss, async)", flush=True)
+        query_embedding_cache.set(self.model_name, text, vector)
+        return vector
 
 def get_embeddings(api_key):
     """
     Initialize Gemini embeddings with the provided API key
     """
-    return GoogleGenerativeAIEmbeddings(
-        model="models/embedding-001",
-        google_api_key=api_key,
+    return CachedQueryEmbeddings(
+        GoogleGenerativeAIEmbeddings(
+            model=EMBEDDING_MODEL,
+            google_api_key=api_key,
+        ),
+        EMBEDDING_MODEL,
     )
 
-def get_collection_point_count(collection_name: str) -> int:
+def shared_collection_names():
+    """
+    All collections used by the shared layout.
+    """
+    if QDRANT_SHARED_SHARDS <= 1:
+        return [QDRANT_SHARED_COLLECTION]
+    return [f"{QDRANT_SHARED_COLLECTION}-{shard}" for shard in range(QDRANT_SHARED_SHARDS)]
+
+def is_shared_collection(collection_name: str) -> bool:
+    return collection_name in shared_collection_names()
+
+def collection_for_video(video_id: str, layout: str = None) -> str:
+    """
+    Collection that holds a video's chunks under the configured storage layout.
+    """
+    if (layout or QDRANT_STORAGE_LAYOUT) != 'shared':
+        return video_id
+    names = shared_collection_names()
+    # crc32 is stable across processes (unlike hash())
+    return names[zlib.crc32(video_id.encode('utf-8')) % len(names)]
+
+def video_filter(collection_name: str, video_id: str = None):
+    """
+    Qdrant filter restricting a shared collection to one video (None for per-video collections).
+    """
+    if not video_id or not is_shared_collection(collection_name):
+        return None
+    return Filter(must=[FieldCondition(key=VIDEO_ID_PAYLOAD_KEY, match=MatchValue(value=video_id))])
+
+def ensure_video_id_index(collection_name: str) -> None:
+    """
+    Keyword payload index on metadata.video_id, marked as the tenant key.
+    """
+    get_qdrant_client().create_payload_index(
+        collection_name=collection_name,
+        field_name=VIDEO_ID_PAYLOAD_KEY,
+        field_schema=KeywordIndexParams(type=KeywordIndexType.KEYWORD, is_tenant=True),
+    )
+    print(f"Ensured '{VIDEO_ID_PAYLOAD_KEY}' payload index on '{collection_name}'", flush=True)
+
+def get_collection_point_count(collection_name: str, video_id: str = None) -> int:
     """
     Fast count of points in a collection without initializing embeddings or vector store.
+    In the shared layout only the given video's points are counted.
     Tries qdrant client first; falls back to HTTP if needed.
     """
+    count_filter = video_filter(collection_name, video_id)
+    http_body = {"exact": False}
+    if count_filter is not None:
+        http_body["filter"] = {"must": [{"key": VIDEO_ID_PAYLOAD_KEY, "match": {"value": video_id}}]}
     try:
+        qdrant_client = get_qdrant_client()
         if qdrant_client is None:
             # HTTP fallback
             try:
                 response = requests.post(
                     f"{QDRANT_URL}/collections/{collection_name}/points/count",
-                    json={"exact": False},
+                    json=http_body,
                     timeout=10,
                 )
                 if response.status_code == 200:
@@ -196,7 +436,7 @@ def get_collection_point_count(collection_name: str) -> int:
         # Prefer client method
         count_response = qdrant_client.count(
             collection_name=collection_name,
-            count_filter=None,
+            count_filter=count_filter,
             exact=False,
         )
         
@@ -207,7 +447,7 @@ def get_collection_point_count(collection_name: str) -> int:
         try:
             response = requests.post(
                 f"{QDRANT_URL}/collections/{collection_name}/points/count",
-                json={"exact": False},
+                json=http_body,
                 timeout=10,
             )
             if response.status_code == 200:
@@ -217,6 +457,21 @@ def get_collection_point_count(collection_name: str) -> int:
             print(f"Count via HTTP fallback failed: {str(e2)}", flush=True)
         return 0
 
+def delete_video_points(collection_name: str, video_id: str) -> None:
+    """
+    Remove every point of a video: its filtered points in the shared layout,
+    the whole collection in the per-video layout.
+    """
+    points_filter = video_filter(collection_name, video_id)
+    qdrant_client = get_qdrant_client()
+    if points_filter is not None:
+        qdrant_client.delete(collection_name=collection_name, points_selector=FilterSelector(filter=points_filter), wait=True)
+        video_vector_cache.invalidate(collection_name, video_id)
+    else:
+        qdrant_client.delete_collection(collection_name)
+        invalidate_vector_store(collection_name)
+    print(f"Deleted points of '{video_id}' from '{collection_name}'", flush=True)
+
 def create_collection_via_http(collection_name: str, embedding_size: int = 768):
     """
     Create collection using direct HTTP requests as fallback when qdrant-client fails
@@ -238,6 +493,9 @@ def create_collection_via_http(collection_name: str, embedding_size: int = 768):
                     "distance": "Cosine"
                 }
             }
+            if is_shared_collection(collection_name):
+                # Per-tenant HNSW graphs instead of one global graph
+                collection_config["hnsw_config"] = {"payload_m": 16, "m": 0}
             
             create_response = requests.put(
                 f"{QDRANT_URL}/collections/{collection_name}",
@@ -248,6 +506,12 @@ def create_collection_via_http(collection_name: str, embedding_size: int = 768):
             
             if create_response.status_code in [200, 201]:
                 print(f"✅ Successfully created collection '{collection_name}' via HTTP", flush=True)
+                if is_shared_collection(collection_name):
+                    requests.put(
+                        f"{QDRANT_URL}/collections/{collection_name}/index",
+                        json={"field_name": VIDEO_ID_PAYLOAD_KEY, "field_schema": {"type": "keyword", "is_tenant": True}},
+                        timeout=10
+                    )
                 return True
             else:
                 print(f"❌ Failed to create collection via HTTP: {create_response.status_code} - {create_response.text}", flush=True)
@@ -265,6 +529,7 @@ def ensure_collection_exists(collection_name: str, embedding_size: int = 768, re
     Ensures that the Qdrant collection exists, creates it if it doesn't.
     If recreate is True, it will delete and recreate the collection.
     """
+    qdrant_client = get_qdrant_client()
     if qdrant_client is None:
         print("❌ Qdrant client not initialized, trying HTTP fallback...", flush=True)
         return create_collection_via_http(collection_name, embedding_size)
@@ -275,15 +540,14 @@ def ensure_collection_exists(collection_name: str, embedding_size: int = 768, re
         # Check if collection exists
         collection_exists = False
         try:
-            print(f"Getting collection info for '{collection_name}'...", flush=True)
-            collection_info = qdrant_client.get_collection(collection_name)
-            collection_exists = True
-            print(f"Collection '{collection_name}' exists", flush=True)
-        except UnexpectedResponse as e:
-            print(f"Collection '{collection_name}' does not exist: {e}", flush=True)
-            collection_exists = False
+            collection_exists = qdrant_client.collection_exists(collection_name)
+            if collection_exists:
+                print(f"Collection '{collection_name}' exists", flush=True)
+            else:
+                print(f"Collection '{collection_name}' does not exist", flush=True)
         except Exception as e:
             print(f"Error checking collection existence: {str(e)}", flush=True)
+            record_error('ensure_collection')
             print(f"Trying HTTP fallback for collection check...", flush=True)
             return create_collection_via_http(collection_name, embedding_size)
 
@@ -306,13 +570,18 @@ def ensure_collection_exists(collection_name: str, embedding_size: int = 768, re
         if not collection_exists:
             print(f"Creating collection '{collection_name}' with size {embedding_size}...", flush=True)
             try:
+                shared = is_shared_collection(collection_name)
                 qdrant_client.create_collection(
                     collection_name=collection_name,
                     vectors_config=VectorParams(
                         size=embedding_size,
                         distance=Distance.COSINE
-                    )
+                    ),
+                    # Per-tenant HNSW graphs instead of one global graph
+                    hnsw_config=HnswConfigDiff(payload_m=16, m=0) if shared else None
                 )
+                if shared:
+                    ensure_video_id_index(collection_name)
                 print(f"Successfully created collection: {collection_name}", flush=True)
             except Exception as e:
                 print(f"Error creating collection via client, trying HTTP: {str(e)}", flush=True)
@@ -328,41 +597,241 @@ def ensure_collection_exists(collection_name: str, embedding_size: int = 768, re
         print(f"Trying HTTP fallback...", flush=True)
         return create_collection_via_http(collection_name, embedding_size)
 
+# Collections verified to exist by this process (skips get_collection round-trips)
+_known_collections = set()
+# (api key hash, collection name) -> {'store': QdrantVectorStore, 'last_used': float}
+_vector_store_pool = OrderedDict()
+_vector_store_pool_lock = threading.Lock()
+
+def _api_key_hash(api_key: str) -> str:
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+def _evict_idle_vector_stores(now: float) -> None:
+    # Caller holds _vector_store_pool_lock; entries are kept in least-recently-used order
+    while _vector_store_pool:
+        key, entry = next(iter(_vector_store_pool.items()))
+        if now - entry['last_used'] <= VECTOR_STORE_POOL_IDLE_SECONDS and len(_vector_store_pool) <= VECTOR_STORE_POOL_MAX_SIZE:
+            break
+        del _vector_store_pool[key]
+
+def invalidate_vector_store(collection_name: str) -> None:
+    """
+    Drop pooled handles and the known-exists flag for a collection, e.g. after an error
+    or when the collection is recreated.
+    """
+    with _vector_store_pool_lock:
+        _known_collections.discard(collection_name)
+        for key in [key for key in _vector_store_pool if key[1] == collection_name]:
+            del _vector_store_pool[key]
+    video_vector_cache.invalidate(collection_name)
+    print(f"Invalidated pooled vector store handles for '{collection_name}'", flush=True)
+
+def _collection_missing(error) -> bool:
+    return getattr(error, 'status_code', None) == 404 or 'not found' in str(error).lower()
+
+def _invalidate_after_search_error(api_key, collection_name: str, video_id: str, error) -> None:
+    """
+    Drop only what a failed search used: its pooled handle and the video's cached vectors.
+    A missing collection still invalidates the whole collection (every tenant of a shared one).
+    """
+    if _collection_missing(error):
+        invalidate_vector_store(collection_name)
+        return
+    with _vector_store_pool_lock:
+        _vector_store_pool.pop((_api_key_hash(api_key), collection_name), None)
+    video_vector_cache.invalidate(collection_name, video_id or collection_name)
+
 def get_vector_store(api_key, collection_name="yt-rag", recreate: bool = False):
     """
     Get or create vector store for the collection.
     If recreate is True, it will delete and create a fresh collection.
     If recreate is False (default), it will use existing collection or create if doesn't exist.
+    Ready handles are pooled per (api key hash, collection) so steady-state calls
+    skip collection checks and store construction.
     """
+    qdrant_client = get_qdrant_client()
     if qdrant_client is None:
         raise Exception("Qdrant client not initialized - check QDRANT_URL environment variable")
+
+    pool_key = (_api_key_hash(api_key), collection_name)
+    if recreate:
+        invalidate_vector_store(collection_name)
+    else:
+        with _vector_store_pool_lock:
+            now = time.time()
+            _evict_idle_vector_stores(now)
+            entry = _vector_store_pool.get(pool_key)
+            if entry is not None:
+                entry['last_used'] = now
+                _vector_store_pool.move_to_end(pool_key)
+                return entry['store']
         
     try:
-        # Try to ensure collection exists
-        start_ensure = time.perf_counter()
-        if not ensure_collection_exists(collection_name, recreate=recreate):
-            raise Exception("Failed to create or verify collection")
-        ensure_ms = int((time.perf_counter() - start_ensure) * 1000)
-        print(f"⏱️ ensure_collection_exists('{collection_name}') took {ensure_ms} ms", flush=True)
+        # Try to ensure collection exists (once per process unless invalidated)
+        if recreate or collection_name not in _known_collections:
+            start_ensure = time.perf_counter()
+            if not ensure_collection_exists(collection_name, recreate=recreate):
+                raise Exception("Failed to create or verify collection")
+            ensure_ms = int((time.perf_counter() - start_ensure) * 1000)
+            print(f"⏱️ ensure_collection_exists('{collection_name}') took {ensure_ms} ms", flush=True)
+            with _vector_store_pool_lock:
+                _known_collections.add(collection_name)
         
         # Initialize vector store with provided API key
         emb_start = time.perf_counter()
         embeddings = get_embeddings(api_key)
         emb_ms = int((time.perf_counter() - emb_start) * 1000)
         print(f"⏱️ Embeddings init took {emb_ms} ms", flush=True)
-        return QdrantVectorStore(
+        vector_store = QdrantVectorStore(
             client=qdrant_client,
             collection_name=collection_name,
             embedding=embeddings,
+            # Collection was just verified/created with our embedding size; skip the
+            # extra get_collection and dummy embedding call
+            validate_collection_config=False,
         )
+        with _vector_store_pool_lock:
+            _vector_store_pool[pool_key] = {'store': vector_store, 'last_used': time.time()}
+            _vector_store_pool.move_to_end(pool_key)
+            _evict_idle_vector_stores(time.time())
+        return vector_store
     except Exception as e:
         print(f"Error in get_vector_store: {str(e)}", flush=True)
         print(f"Error type: {type(e).__name__}", flush=True)
+        invalidate_vector_store(collection_name)
         raise
 
-def get_relevant_transcript_chunks(query: str, api_key: str, collection_name: str, k: int = 4):
+def cache_video_vectors(collection_name: str, video_id: str, points):
+    """
+    Put a video's (point id, Document, vector) triples into the in-process vector cache.
+    Returns the cache entry, or None if the video is too large to cache.
+    """
+    points = list(points)
+    payloads = [(point_id, doc.page_content, doc.metadata) for point_id, doc, _ in points]
+    return video_vector_cache.put(collection_name, video_id or collection_name, [vector for _, _, vector in points], payloads)
+
+def load_video_vectors(collection_name: str, video_id: str = None):
+    """
+    Fill the vector cache for one video from Qdrant (scroll with vectors).
+    Returns the cache entry, or None if the video is empty or too large to cache.
+    """
+    load_start = time.perf_counter()
+    limit = video_vector_cache.max_points_per_video + 1
+    points, _ = get_qdrant_client().scroll(
+        collection_name=collection_name,
+        scroll_filter=video_filter(collection_name, video_id),
+        limit=limit,
+        with_payload=True,
+        with_vectors=True,
+    )
+    return _cache_scrolled_points(collection_name, video_id, points, limit, load_start)
+
+def _document_from_payload(payload) -> Document:
+    payload = payload or {}
+    return Document(
+        page_content=payload.get(QdrantVectorStore.CONTENT_KEY, ''),
+        metadata=payload.get(QdrantVectorStore.METADATA_KEY) or {},
+    )
+
+def _cache_scrolled_points(collection_name: str, video_id: str, points, limit: int, load_start: float):
+    if not points:
+        # Not ingested (yet); the next search tries again
+        return None
+    if len(points) >= limit:
+        video_vector_cache.mark_uncacheable(collection_name, video_id or collection_name)
+        print(f"'{video_id or collection_name}' has too many points for the vector cache; "
+              f"searching Qdrant for the next {video_vector_cache.ttl_seconds}s", flush=True)
+        return None
+    triples = [(point.id, _document_from_payload(point.payload), point.vector) for point in points]
+    entry = cache_video_vectors(collection_name, video_id, triples)
+    load_ms = int((time.perf_counter() - load_start) * 1000)
+    observe_stage('vector_cache_fill', load_ms / 1000)
+    print(f"⏱️ Loaded {len(points)} vectors for '{video_id or collection_name}' into the vector cache in {load_ms} ms", flush=True)
+    return entry
+
+def _search_vector_cache(vector_store, query: str, collection_name: str, k: int, video_id: str = None):
+    """
+    Exact in-process search over the cached vectors of one video; None when the video is not cacheable.
+    """
+    entry = video_vector_cache.get(collection_name, video_id or collection_name)
+    if entry is None:
+        if video_vector_cache.is_uncacheable(collection_name, video_id or collection_name):
+            return None
+        entry = load_video_vectors(collection_name, video_id)
+        if entry is None:
+            return None
+    query_vector = vector_store.embeddings.embed_query(query)
+    return _search_cached_entry(entry, query_vector, collection_name, k)
+
+def _search_cached_entry(entry: dict, query_vector, collection_name: str, k: int):
+    results = []
+    for score, (point_id, page_content, metadata) in video_vector_cache.search(entry, query_vector, k):
+        metadata = dict(metadata)
+        metadata['_id'] = point_id
+        metadata['_collection_name'] = collection_name
+        results.append(Document(page_content=page_content, metadata=metadata))
+    return results
+
+def _lexical_search(query: str, collection_name: str, k: int, video_id: str = None):
+    """
+    BM25 candidates for the video as (documents, confident), or None when lexical retrieval
+    is off or the video has no index. Videos ingested before the index existed get one
+    built from their vector-cache payloads.
+    """
+    if RETRIEVAL_MODE == 'vector':
+        return None
+    key = video_id or collection_name
+    try:
+        start = time.perf_counter()
+        index = load_index(key)
+        if index is None:
+            entry = video_vector_cache.get(collection_name, key) if video_vector_cache.enabled else None
+            if entry is None:
+                return None
+            index = save_index(key, [(page_content, metadata) for _, page_content, metadata in entry['payloads']])
+        hits, confident = index.search(query, k)
+        documents = []
+        for _, doc_index in hits:
+            doc = index.document(doc_index)
+            doc.metadata['_collection_name'] = collection_name
+            documents.append(doc)
+        observe_stage('lexical_search', time.perf_counter() - start)
+        return documents, confident
+    except Exception as e:
+        print(f"Lexical search failed, using vector search only: {str(e)}", flush=True)
+        record_error('lexical_search')
+        return None
+
+def _fuse_results(query: str, lexical, vector_results, k: int):
+    """
+    Final chunk list from the optional lexical candidates and the vector results.
+    """
+    if not lexical or not lexical[0]:
+        record_retrieval('vector')
+        return vector_results[:k]
+    record_retrieval('hybrid')
+    fused = reciprocal_rank_fusion([vector_results, lexical[0]], k)
+    print(f"Hybrid retrieval fused {len(vector_results)} vector and {len(lexical[0])} lexical candidates (query='{query[:40]}...')", flush=True)
+    return fused
+
+def get_relevant_transcript_chunks(query: str, api_key: str, collection_name: str, k: int = 4, video_id: str = None):
+    """
+    Retrieve relevant chunks of the video transcript for the query (see RETRIEVAL_MODE).
+    """
+    candidates = k * HYBRID_CANDIDATE_MULTIPLIER
+    lexical = _lexical_search(query, collection_name, candidates, video_id)
+    if lexical is not None and lexical[1] and RETRIEVAL_MODE == 'lexical_first':
+        record_retrieval('lexical')
+        print(f"⏱️ Confident lexical hit; skipped embedding (query='{query[:40]}...')", flush=True)
+        return lexical[0][:k]
+    vector_results = _vector_search_chunks(query, api_key, collection_name, candidates if lexical else k, video_id)
+    return _fuse_results(query, lexical, vector_results, k)
+
+def _vector_search_chunks(query: str, api_key: str, collection_name: str, k: int, video_id: str = None):
     """
     Retrieve semantically relevant chunks of the video transcript based on the query.
+    In the shared layout the search is filtered to video_id.
+    Small videos are searched in process from the vector cache; Qdrant is used otherwise.
     """
     try:
         # Use existing vector store (transcript should already be processed)
@@ -370,19 +839,331 @@ def get_relevant_transcript_chunks(query: str, api_key: str, collection_name: st
         vector_store = get_vector_store(api_key, collection_name, recreate=False)
         vs_ms = int((time.perf_counter() - vs_start) * 1000)
         print(f"⏱️ get_vector_store('{collection_name}') took {vs_ms} ms", flush=True)
+        if video_vector_cache.enabled:
+            cache_start = time.perf_counter()
+            try:
+                results = _search_vector_cache(vector_store, query, collection_name, k, video_id)
+            except Exception as e:
+                print(f"Vector cache search failed, using Qdrant: {str(e)}", flush=True)
+                results = None
+            if results is not None:
+                cache_ms = int((time.perf_counter() - cache_start) * 1000)
+                observe_stage('vector_search_cache', cache_ms / 1000)
+                print(f"⏱️ cached similarity_search took {cache_ms} ms (k={k}, query='{query[:40]}...')", flush=True)
+                return results
         ss_start = time.perf_counter()
-        results = vector_store.similarity_search(query=query, k=k)
+        results = vector_store.similarity_search(query=query, k=k, filter=video_filter(collection_name, video_id))
         ss_ms = int((time.perf_counter() - ss_start) * 1000)
+        observe_stage('vector_search_qdrant', ss_ms / 1000)
         print(f"⏱️ similarity_search took {ss_ms} ms (k={k}, query='{query[:40]}...')", flush=True)
         return results
     except Exception as e:
         print(f"Error during similarity search: {e}")
+        record_error('similarity_search')
+        _invalidate_after_search_error(api_key, collection_name, video_id, e)
         # Return empty list if no vector store exists yet
         return []
 
-def store_documents_in_vector_db(docs, api_key, collection_name):
+# Async access for the ASGI app (async_api.py)
+
+_async_qdrant_client = None
+# API key hash -> CachedQueryEmbeddings, least recently used first
+_embeddings_pool = OrderedDict()
+_embeddings_pool_lock = threading.Lock()
+
+def get_async_qdrant_client():
+    """
+    Lazily create the process-wide AsyncQdrantClient; call from the serving event loop.
+    """
+    global _async_qdrant_client
+    if _async_qdrant_client is None:
+        _async_qdrant_client = AsyncQdrantClient(url=QDRANT_URL, timeout=30, prefer_grpc=False)
+    return _async_qdrant_client
+
+async def aclose_async_qdrant_client() -> None:
+    global _async_qdrant_client
+    if _async_qdrant_client is not None:
+        await _async_qdrant_client.close()
+        _async_qdrant_client = None
+
+def get_pooled_embeddings(api_key):
+    """
+    Embeddings client per API key, pooled like vector store handles.
+    """
+    key = _api_key_hash(api_key)
+    with _embeddings_pool_lock:
+        embeddings = _embeddings_pool.get(key)
+        if embeddings is not None:
+            _embeddings_pool.move_to_end(key)
+            return embeddings
+    embeddings = get_embeddings(api_key)
+    with _embeddings_pool_lock:
+        _embeddings_pool[key] = embeddings
+        _embeddings_pool.move_to_end(key)
+        while len(_embeddings_pool) > VECTOR_STORE_POOL_MAX_SIZE:
+            _embeddings_pool.popitem(last=False)
+    return embeddings
+
+async def aget_collection_point_count(collection_name: str, video_id: str = None) -> int:
+    """
+    Async variant of get_collection_point_count; falls back to the sync path (in a thread) on errors.
+    """
+    try:
+        count_response = await get_async_qdrant_client().count(
+            collection_name=collection_name,
+            count_filter=video_filter(collection_name, video_id),
+            exact=False,
+        )
+        return int(getattr(count_response, "count", 0))
+    except Exception as e:
+        if getattr(e, "status_code", None) == 404:
+            # Collection not created yet
+            return 0
+        print(f"Async count failed: {str(e)}; trying sync fallback", flush=True)
+        return await asyncio.to_thread(get_collection_point_count, collection_name, video_id)
+
+async def aload_video_vectors(collection_name: str, video_id: str = None):
+    """
+    Async variant of load_video_vectors.
+    """
+    load_start = time.perf_counter()
+    limit = video_vector_cache.max_points_per_video + 1
+    points, _ = await get_async_qdrant_client().scroll(
+        collection_name=collection_name,
+        scroll_filter=video_filter(collection_name, video_id),
+        limit=limit,
+        with_payload=True,
+        with_vectors=True,
+    )
+    return _cache_scrolled_points(collection_name, video_id, points, limit, load_start)
+
+async def aget_relevant_transcript_chunks(query: str, api_key: str, collection_name: str, k: int = 4, video_id: str = None):
+    """
+    Async variant of get_relevant_transcript_chunks.
+    """
+    candidates = k * HYBRID_CANDIDATE_MULTIPLIER
+    # Off the event loop: the index may have to be read from disk
+    lexical = await asyncio.to_thread(_lexical_search, query, collection_name, candidates, video_id)
+    if lexical is not None and lexical[1] and RETRIEVAL_MODE == 'lexical_first':
+        record_retrieval('lexical')
+        print(f"⏱️ Confident lexical hit; skipped embedding (query='{query[:40]}...', async)", flush=True)
+        return lexical[0][:k]
+    vector_results = await _avector_search_chunks(query, api_key, collection_name, candidates if lexical else k, video_id)
+    return _fuse_results(query, lexical, vector_results, k)
+
+async def _avector_search_chunks(query: str, api_key: str, collection_name: str, k: int, video_id: str = None):
+    """
+    Async variant of _vector_search_chunks. On a vector-cache miss the query
+    embedding and the cache fill from Qdrant run concurrently.
+    """
+    try:
+        embeddings = get_pooled_embeddings(api_key)
+        ss_start = time.perf_counter()
+        entry = video_vector_cache.get(collection_name, video_id or collection_name) if video_vector_cache.enabled else None
+        if entry is None and video_vector_cache.enabled and not video_vector_cache.is_uncacheable(collection_name, video_id or collection_name):
+            query_vector, entry = await asyncio.gather(
+                embeddings.aembed_query(query),
+                aload_video_vectors(collection_name, video_id),
+            )
+        else:
+            query_vector = await embeddings.aembed_query(query)
+
+        if entry is not None:
+            results = _search_cached_entry(entry, query_vector, collection_name, k)
+            source = "vector cache"
+        else:
+            response = await get_async_qdrant_client().query_points(
+                collection_name=collection_name,
+                query=query_vector,
+                query_filter=video_filter(collection_name, video_id),
+                limit=k,
+                with_payload=True,
+            )
+            results = []
+            for point in response.points:
+                doc = _document_from_payload(point.payload)
+                doc.metadata['_id'] = point.id
+                doc.metadata['_collection_name'] = collection_name
+                results.append(doc)
+            source = "qdrant"
+        ss_ms = int((time.perf_counter() - ss_start) * 1000)
+        observe_stage('vector_search_cache' if entry is not None else 'vector_search_qdrant', ss_ms / 1000)
+        print(f"⏱️ async similarity_search took {ss_ms} ms via {source} (k={k}, query='{query[:40]}...')", flush=True)
+        return results
+    except Exception as e:
+        print(f"Error during async similarity search: {e}")
+        record_error('similarity_search')
+        _invalidate_after_search_error(api_key, collection_name, video_id, e)
+        return []
+
+def upsert_document_batch(vector_store, docs, vectors, wait: bool = True):
+    """
+    Upsert pre-embedded documents using the same payload layout as QdrantVectorStore.
+    Returns the generated point ids.
+    """
+    points = [
+        PointStruct(
+            id=uuid.uuid4().hex,
+            vector=vector,
+            payload={
+                vector_store.content_payload_key: doc.page_content,
+                vector_store.metadata_payload_key: doc.metadata,
+            },
+        )
+        for doc, vector in zip(docs, vectors)
+    ]
+    vector_store.client.upsert(
+        collection_name=vector_store.collection_name,
+        points=points,
+        wait=wait,
+    )
+    return [point.id for point in points]
+
+def _is_retryable_embedding_error(error) -> bool:
+    """
+    Quota / rate-limit and transient server errors are worth retrying for a batch.
+    """
+    if type(error).__name__ in ('ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'DeadlineExceeded', 'InternalServerError'):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in ('429', 'quota', 'rate limit', 'resource has been exhausted', '503', 'unavailable', 'deadline'))
+
+
+class VectorStoreWriter:
     """
-    Store documents in vector database
+    Embeds and upserts document batches with bounded concurrency.
+    Each batch is embedded with one call (retried with backoff on quota errors) and
+    upserted with wait=False; close() sends the last batch with wait=True as a barrier,
+    so every earlier write is applied once it returns.
+    With collect=True the written (point id, Document, vector) triples are kept in `written`.
+    The first failed batch is kept in `error`: later submit() calls raise it and queued
+    batches are skipped, so a bad key or exhausted quota doesn't embed the rest of the video.
+    """
+
+    def __init__(self, vector_store, concurrency: int = INGEST_EMBED_CONCURRENCY, max_retries: int = INGEST_EMBED_MAX_RETRIES, collect: bool = False):
+        self.vector_store = vector_store
+        self.written = [] if collect else None
+        self.max_retries = max_retries
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        # Backpressure: at most 2x concurrency batches queued or in flight
+        self._slots = threading.BoundedSemaphore(concurrency * 2)
+        self._futures = []
+        self._upsert_lock = threading.Lock()
+        self._held = None
+        self._started = time.perf_counter()
+        self.documents = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.retries = 0
+        self.embedding_seconds = 0.0
+        self.upsert_seconds = 0.0
+        self.error = None
+
+    def submit(self, docs) -> None:
+        """
+        Queue one batch; blocks while too many batches are already in flight.
+        Raises the first batch error once any batch has failed.
+        """
+        if self.error is not None:
+            raise self.error
+        self._slots.acquire()
+        if self.error is not None:
+            self._slots.release()
+            raise self.error
+        future = self._executor.submit(tracing.propagate(self._write_batch), list(docs))
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _embed_with_retry(self, texts):
+        attempt = 0
+        while True:
+            try:
+                return self.vector_store.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable_embedding_error(e):
+                    raise
+                delay = INGEST_EMBED_RETRY_BASE_SECONDS * (2 ** attempt)
+                attempt += 1
+                with self._upsert_lock:
+                    self.retries += 1
+                tracing.set_attribute('retries', attempt)
+                print(f"Embedding batch of {len(texts)} hit a retryable error ({str(e)[:120]}); retry {attempt}/{self.max_retries} in {delay:.1f}s", flush=True)
+                time.sleep(delay)
+
+    def _write_batch(self, docs) -> None:
+        if self.error is not None:
+            # An earlier batch failed; the ingest is abandoned
+            return
+        try:
+            emb_start = time.perf_counter()
+            with tracing.span('embedding_batch', documents=len(docs)):
+                vectors = self._embed_with_retry([doc.page_content for doc in docs])
+            emb_elapsed = time.perf_counter() - emb_start
+            with self._upsert_lock:
+                self.embedding_seconds += emb_elapsed
+                # Hold back the newest batch so close() can send it as the wait=True barrier
+                previous, self._held = self._held, (docs, vectors)
+                if previous is not None:
+                    self._upsert(previous, wait=False)
+        except Exception as e:
+            with self._upsert_lock:
+                if self.error is None:
+                    self.error = e
+            raise
+
+    def _upsert(self, batch, wait: bool) -> None:
+        # Caller holds _upsert_lock, which keeps upserts in submission order
+        docs, vectors = batch
+        up_start = time.perf_counter()
+        with tracing.span('upsert', documents=len(docs), wait=wait):
+            point_ids = upsert_document_batch(self.vector_store, docs, vectors, wait=wait)
+        if self.written is not None:
+            self.written.extend(zip(point_ids, docs, vectors))
+        self.upsert_seconds += time.perf_counter() - up_start
+        self.documents += len(docs)
+        self.batches += 1
+
+    def close(self) -> dict:
+        """
+        Wait for all batches, flush the barrier write and return throughput stats.
+        Raises the first batch error after everything else has been written.
+        """
+        first_error = None
+        for future in self._futures:
+            try:
+                future.result()
+            except Exception as e:
+                self.failed_batches += 1
+                record_error('embedding_batch')
+                print(f"Embedding/upsert batch failed: {str(e)}", flush=True)
+                first_error = first_error or e
+        self._executor.shutdown(wait=True)
+        with self._upsert_lock:
+            # After a failure the held batch is dropped with the rest of the ingest
+            if self._held is not None and first_error is None:
+                self._upsert(self._held, wait=True)
+            self._held = None
+
+        wall_seconds = time.perf_counter() - self._started
+        stats = {
+            "documents": self.documents,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "embedding_retries": self.retries,
+            "embedding_ms": int(self.embedding_seconds * 1000),
+            "upsert_ms": int(self.upsert_seconds * 1000),
+            "write_ms": int(wall_seconds * 1000),
+            "embeddings_per_sec": round(self.documents / wall_seconds, 1) if wall_seconds > 0 else 0.0,
+        }
+        print(f"⏱️ Wrote {self.documents} documents in {self.batches} batches in {stats['write_ms']} ms "
+              f"({stats['embeddings_per_sec']} embeddings/sec, {self.failed_batches} failed, {self.retries} retries)", flush=True)
+        if first_error is not None:
+            raise first_error
+        return stats
+
+def store_documents_in_vector_db(docs, api_key, collection_name, batch_size: int = INGEST_EMBED_BATCH_SIZE):
+    """
+    Store documents in vector database using batched, concurrent embedding writes
     """
     try:
         print(f"\n=== Storing in Vector Database ===")
@@ -394,21 +1175,16 @@ def store_documents_in_vector_db(docs, api_key, collection_name):
         vs_ms = int((time.perf_counter() - vs_start) * 1000)
         print(f"⏱️ get_vector_store for storage took {vs_ms} ms", flush=True)
         
-        # Check if collection already has documents
+        writer = VectorStoreWriter(vector_store)
         try:
-            existing_docs = vector_store.similarity_search("", k=1)
-            if existing_docs:
-                print(f"Collection {collection_name} already has {len(existing_docs)} document(s), appending new documents")
-            else:
-                print(f"Collection {collection_name} is empty, adding documents")
-        except Exception as e:
-            print(f"Could not check existing documents: {str(e)}")
-        
-        add_start = time.perf_counter()
-        vector_store.add_documents(documents=docs)
-        add_ms = int((time.perf_counter() - add_start) * 1000)
-        print(f"Successfully stored {len(docs)} documents in vector database in {add_ms} ms")
+            for i in range(0, len(docs), batch_size):
+                writer.submit(docs[i:i + batch_size])
+        finally:
+            # Re-raises the first batch error once in-flight batches have finished
+            stats = writer.close()
+        print(f"Successfully stored {stats['documents']} documents in vector database in {stats['write_ms']} ms")
         return True
     except Exception as e:
         print(f"Vector store error: {str(e)}", flush=True)
-        return False 
\ No newline at end of file
+        invalidate_vector_store(collection_name)
+        return False
@@ -4,72 +4,17 @@ from youtube_transcript_api._errors import TranscriptsDisabled, NoTranscriptFoun
 from youtube_transcript_api.proxies import GenericProxyConfig, WebshareProxyConfig
 from langchain_core.documents import Document
 import time
-from deep_translator import GoogleTranslator
 from langdetect import detect
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
-from multiprocessing import Process, Queue
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from translation_utils import translate_texts
+from segment_store import save_segments
+from lexical_index import save_index
+from metrics import record_cache, stage_timer
+import tracing
+import transcript_cache
 
-# Initialize translator
-translator = GoogleTranslator(source='auto', target='en')
-
-# Translation settings
-TRANSLATION_TIMEOUT_SECONDS = int(os.getenv('TRANSLATION_TIMEOUT_SECONDS', '5'))
-MAX_TRANSLATION_CHARS = int(os.getenv('MAX_TRANSLATION_CHARS', '3000'))
-DISABLE_TRANSLATION_ENV = os.getenv('DISABLE_TRANSLATION', '').lower() == 'true'
-
-def _translate_worker(text: str, queue: Queue) -> None:
-    try:
-        # Create a fresh translator inside the process
-        from deep_translator import GoogleTranslator as GT
-        queue.put(GT(source='auto', target='en').translate(text))
-    except Exception as exc:  # noqa: BLE001
-        # Signal failure
-        try:
-            queue.put(None)
-        except Exception:
-            pass
-
-def safe_translate_text(text: str, disable_flag: dict) -> str:
-    """
-    Translate text to English with a strict timeout. If a timeout occurs once,
-    disable further translations for this request to avoid worker hangs.
-    """
-    if not text:
-        return text
-    if disable_flag.get('disabled', False) or DISABLE_TRANSLATION_ENV:
-        return text
-
-    truncated = text[:MAX_TRANSLATION_CHARS]
-    # Use a separate process so we can hard-kill on timeout
-    result_queue: Queue = Queue(maxsize=1)
-    proc = Process(target=_translate_worker, args=(truncated, result_queue), daemon=True)
-    try:
-        proc.start()
-        proc.join(TRANSLATION_TIMEOUT_SECONDS)
-        if proc.is_alive():
-            print(f"Translation timed out after {TRANSLATION_TIMEOUT_SECONDS}s; terminating translator process and skipping further translations for this request")
-            try:
-                proc.terminate()
-                proc.join(1)
-            finally:
-                disable_flag['disabled'] = True
-            return text
-        # Process finished; get result
-        try:
-            translated = result_queue.get_nowait()
-        except Exception:
-            translated = None
-        return translated if translated else text
-    except Exception as e:  # noqa: BLE001
-        print(f"Translation error: {e}")
-        disable_flag['disabled'] = True
-        return text
-    finally:
-        try:
-            if proc.is_alive():
-                proc.terminate()
-        except Exception:
-            pass
+# How transcript requests leave this process, set by create_youtube_transcript_api (shown on trace spans)
+proxy_mode = 'direct'
 
 def create_youtube_transcript_api():
     """
@@ -113,6 +58,7 @@ def create_youtube_transcript_api():
             
             proxy_config = WebshareProxyConfig(**webshare_config_params)
             print("Webshare proxy configuration successful.")
+            _set_proxy_mode('webshare')
             return YouTubeTranscriptApi(proxy_config=proxy_config)
             
         except Exception as e:
@@ -147,6 +93,7 @@ def create_youtube_transcript_api():
                 https_url=proxy_https_url,
             )
             print("Generic proxy configuration successful.")
+            _set_proxy_mode('generic')
             return YouTubeTranscriptApi(proxy_config=proxy_config)
         except Exception as e:
             error_msg = str(e).lower()
@@ -161,6 +108,7 @@ def create_youtube_transcript_api():
                         https_url=proxy_http_url,  # Use HTTP proxy for HTTPS as well
                     )
                     print("Fallback proxy configuration successful.")
+                    _set_proxy_mode('generic-http')
                     return YouTubeTranscriptApi(proxy_config=fallback_config)
                 except Exception as fallback_e:
                     print(f"Fallback proxy configuration also failed: {str(fallback_e)}")
@@ -171,147 +119,277 @@ def create_youtube_transcript_api():
         print("No proxy configuration found. Using direct connection.")
         return YouTubeTranscriptApi()
 
-def process_transcript_entries(transcript_data, video_id, detected_lang):
+# Chunking settings
+TARGET_CHUNK_SIZE = 2500
+CHUNK_OVERLAP_SEGMENTS = 2  # Trailing segments repeated at the start of the next chunk
+
+def iter_transcript_chunks(transcript_data, video_id, detected_lang):
     """
-    Process transcript entries to create optimized chunks with sliding window.
+    Single pass over transcript entries yielding (chunk_text, metadata) tuples.
+    A chunk is closed once its joined text reaches TARGET_CHUNK_SIZE; the last
+    CHUNK_OVERLAP_SEGMENTS segments are carried into the next chunk for continuity.
+    Text length is tracked incrementally so each entry is only joined once.
+
+    Metadata is the compact payload stored with each point: time range plus the
+    [segment_start, segment_end) offsets into the video's segments (see segment_store).
     """
-    print(f"\n=== Processing Transcript Data ===")
-    print(f"Total transcript entries: {len(transcript_data)}")
-    print(f"Video ID: {video_id}")
-    print(f"Language: {detected_lang}")
-    proc_start = time.perf_counter()
-    
-    # First, combine all transcript entries into a single document with metadata
-    combined_entries = []
-    TARGET_CHUNK_SIZE = 2500
-    
-    for entry in transcript_data:
-        combined_entries.append({
-            'text': entry['text'],
-            'start_time': entry['start_time'],
-            'duration': entry['duration'],
-            'original_text': entry['original_text']
-        })
-    
-    print(f"Combined entries: {len(combined_entries)}")
-    
-    # Create documents with combined text and preserved metadata
-    docs = []
-    current_chunk = []
-    current_metadata = {
-        'start_time': 0,
-        'duration': 0,
-        'segments': [],
-        'video_id': video_id,
-        'detected_language': detected_lang
-    }
-    
-    # Per-call translation breaker to avoid repeated timeouts across chunks
-    translation_disable_flag = {'disabled': False}
+    seg_start = 0
+    texts = []
+    durations = []
+    text_len = 0  # len(' '.join(texts)) without building the string
+
+    def build_metadata(seg_end):
+        last = transcript_data[seg_end - 1]
+        return {
+            'start_time': transcript_data[seg_start]['start_time'],
+            'end_time': last['start_time'] + last['duration'],
+            'duration': sum(durations),
+            'segment_start': seg_start,
+            'segment_end': seg_end,
+            'video_id': video_id,
+            'detected_language': detected_lang
+        }
+
+    for index, entry in enumerate(transcript_data):
+        text = entry['text']
+        text_len += len(text) + (1 if texts else 0)
+        texts.append(text)
+        durations.append(entry['duration'])
+
+        # Create a chunk when we have enough text
+        if text_len >= TARGET_CHUNK_SIZE:
+            yield ' '.join(texts), build_metadata(index + 1)
 
-    for entry in combined_entries:
-        current_chunk.append(entry['text'])
-        
-        # Update metadata
-        if not current_metadata['segments']:
-            current_metadata['start_time'] = entry['start_time']
-        
-        current_metadata['duration'] += entry['duration']
-        current_metadata['segments'].append({
-            'text': entry['text'],
-            'original_text': entry['original_text'],
-            'start_time': entry['start_time'],
-            'duration': entry['duration']
-        })
-        
-        # Create a document when we have enough text
-        combined_text = ' '.join(current_chunk)
-        if len(combined_text) >= TARGET_CHUNK_SIZE:
-            # Optionally translate entire chunk (significantly fewer calls vs per-line)
-            page_content = combined_text
-            if detected_lang == 'hi':
-                translated_chunk = safe_translate_text(combined_text, translation_disable_flag)
-                if translated_chunk != combined_text:
-                    print("Translated chunk from Hindi to English")
-                page_content = translated_chunk
-            docs.append(Document(
-                page_content=page_content,
-                metadata=current_metadata.copy()
-            ))
-            print(f"Created chunk {len(docs)} with {len(current_metadata['segments'])} segments")
-            
             # Reset for next chunk, keeping overlap
-            overlap_segments = current_metadata['segments'][-2:]  # Keep last 2 segments for overlap
-            current_chunk = [seg['text'] for seg in overlap_segments]
-            current_metadata = {
-                'start_time': overlap_segments[0]['start_time'],
-                'duration': sum(seg['duration'] for seg in overlap_segments),
-                'segments': overlap_segments,
-                'video_id': video_id,
-                'detected_language': detected_lang
-            }
-    
+            texts = texts[-CHUNK_OVERLAP_SEGMENTS:]
+            durations = durations[-CHUNK_OVERLAP_SEGMENTS:]
+            seg_start = index + 1 - len(texts)
+            text_len = sum(len(t) for t in texts) + len(texts) - 1
+
     # Add the last chunk if it has content
-    if current_chunk:
-        page_content = ' '.join(current_chunk)
-        if detected_lang == 'hi':
-            translated_chunk = safe_translate_text(page_content, translation_disable_flag)
-            if translated_chunk != page_content:
-                print("Translated chunk from Hindi to English")
-            page_content = translated_chunk
-        docs.append(Document(
-            page_content=page_content,
-            metadata=current_metadata.copy()
-        ))
-        print(f"Created final chunk {len(docs)} with {len(current_metadata['segments'])} segments")
-    
-    print(f"\nTotal chunks created: {len(docs)}")
-    proc_ms = int((time.perf_counter() - proc_start) * 1000)
-    print(f"=== Processing Complete in {proc_ms} ms ===\n")
-    return docs
+    if texts:
+        yield ' '.join(texts), build_metadata(len(transcript_data))
 
-def get_transcript_safely(video_id, languages, ytt_api):
+# Track selection settings
+# When > 0, start fetching the next candidate track if the current one has not
+# finished within this many ms, and use whichever completes first.
+TRANSCRIPT_FETCH_HEDGE_MS = int(os.getenv('TRANSCRIPT_FETCH_HEDGE_MS', '0'))
+TRANSCRIPT_FETCH_MAX_PARALLEL = int(os.getenv('TRANSCRIPT_FETCH_MAX_PARALLEL', '2'))
+
+def _parse_languages(languages):
+    """
+    Accept a comma-separated string (query param) or a list of language codes.
     """
-    Safely retrieve transcript from YouTube video
+    if not languages:
+        return []
+    if isinstance(languages, str):
+        languages = languages.split(',')
+    return [code.strip().lower() for code in languages if code and code.strip()]
+
+def rank_transcript_tracks(transcript_list, languages=None):
     """
+    Order available caption tracks best-first: requested languages in the given order,
+    and within the same language preference, manual captions before generated ones.
+    """
+    requested = _parse_languages(languages)
+
+    def rank(transcript):
+        code = (transcript.language_code or '').lower()
+        base_code = code.split('-')[0]
+        if code in requested:
+            lang_rank = requested.index(code)
+        elif base_code in requested:
+            lang_rank = requested.index(base_code)
+        else:
+            lang_rank = len(requested)
+        return (lang_rank, transcript.is_generated)
+
+    # sorted() is stable, so YouTube's own ordering breaks ties
+    return sorted(transcript_list, key=rank)
+
+def _set_proxy_mode(mode):
+    global proxy_mode
+    proxy_mode = mode
+
+def _fetch_track(transcript):
+    t_start = time.perf_counter()
+    with tracing.span('fetch_track', language=transcript.language_code, generated=transcript.is_generated, proxy=proxy_mode):
+        data = transcript.fetch()
+    t_ms = int((time.perf_counter() - t_start) * 1000)
+    print(f"Fetched '{transcript.language_code}' ({'generated' if transcript.is_generated else 'manual'}) transcript with {len(data) if data else 0} entries in {t_ms} ms")
+    return transcript, data
+
+def fetch_best_track(candidates, hedge_ms: int = TRANSCRIPT_FETCH_HEDGE_MS):
+    """
+    Fetch exactly one caption track from the ranked candidates. Failed fetches fall
+    through to the next candidate. With hedge_ms > 0, a slow fetch is raced against
+    the next candidate (at most TRANSCRIPT_FETCH_MAX_PARALLEL in flight).
+    Returns (transcript, data) or raises the last fetch error.
+    """
+    if not candidates:
+        return None, []
+    last_error = None
+
+    if hedge_ms <= 0 or len(candidates) == 1:
+        for transcript in candidates:
+            try:
+                transcript, data = _fetch_track(transcript)
+                if data:
+                    return transcript, data
+            except Exception as e:
+                print(f"Fetching '{transcript.language_code}' transcript failed: {str(e)}")
+                last_error = e
+        if last_error is not None:
+            raise last_error
+        return candidates[0], []
+
+    executor = ThreadPoolExecutor(max_workers=TRANSCRIPT_FETCH_MAX_PARALLEL)
     try:
-        print(f"\n=== Fetching Transcript ===")
-        print(f"Video ID: {video_id}")
-        fetch_start = time.perf_counter()
-        transcript_list = ytt_api.list(video_id)
-        list_ms = int((time.perf_counter() - fetch_start) * 1000)
-        print(f"Transcript list fetch took {list_ms} ms")
-        
-        # Initialize list to store transcript data
-        transcript_data = []
-        detected_lang = None
-        # Per-request guard to prevent repeated timeouts
-        translation_disable_flag = {'disabled': False}
-        
-        for transcript in transcript_list:
-            t_start = time.perf_counter()
-            data = transcript.fetch()
-            t_ms = int((time.perf_counter() - t_start) * 1000)
-            print(f"Fetched transcript with {len(data) if data else 0} entries in {t_ms} ms")
-            
-            if data and not detected_lang:
+        remaining = list(candidates)
+        fetch_track = tracing.propagate(_fetch_track)
+        pending = {executor.submit(fetch_track, remaining.pop(0))}
+        while pending:
+            done, pending = wait(pending, timeout=hedge_ms / 1000, return_when=FIRST_COMPLETED)
+            for future in done:
                 try:
-                    detected_lang = detect(data[0].text)
-                    print(f"Detected language: {detected_lang}")
+                    transcript, data = future.result()
+                    if data:
+                        return transcript, data
                 except Exception as e:
-                    print(f"Language detection error: {e}")
-                    detected_lang = 'unknown'
-            
-            for entry in data:
-                original_text = entry.text
-                # Do NOT translate per-entry; translate at chunk level for efficiency
-                transcript_data.append({
-                    'text': original_text,
-                    'original_text': original_text,
-                    'start_time': entry.start,
-                    'duration': entry.duration,
-                    'detected_language': detected_lang
-                })
+                    print(f"Fetching transcript failed: {str(e)}")
+                    last_error = e
+            # Nothing usable yet: hedge with the next candidate (slow or failed fetch)
+            if remaining and len(pending) < TRANSCRIPT_FETCH_MAX_PARALLEL:
+                if not done:
+                    print(f"Transcript fetch slower than {hedge_ms} ms; racing next candidate track")
+                pending.add(executor.submit(fetch_track, remaining.pop(0)))
+        if last_error is not None:
+            raise last_error
+        return candidates[0], []
+    finally:
+        # Don't wait for the losing fetch
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def load_cached_track(video_id, languages=None):
+    """
+    The cached caption track for a request as (track, entries), or None. With languages
+    given, the best cached track in one of them is used. Without languages only the track
+    YouTube's ranking picked for an earlier such request is served (see
+    transcript_cache.store_default_track); if none was recorded, YouTube is asked.
+    """
+    requested = _parse_languages(languages)
+    if not requested:
+        track = transcript_cache.default_track(video_id)
+        data = transcript_cache.load_track(video_id, track) if track is not None else None
+        return (track, data) if data else None
+    for track in rank_transcript_tracks(transcript_cache.cached_tracks(video_id), requested):
+        code = track.language_code.lower()
+        if code not in requested and code.split('-')[0] not in requested:
+            # Ranked: no later track matches either
+            break
+        data = transcript_cache.load_track(video_id, track)
+        if data:
+            return track, data
+    return None
+
+def fetch_transcript_entries(video_id, languages, ytt_api, use_cache: bool = True):
+    """
+    List the caption tracks for a video and fetch the single best-matching one, reading
+    the on-disk transcript cache first (use_cache=False always fetches, then refreshes it).
+    Returns a dict with success, data (entries), detected_lang, track and timings.
+    """
+    print(f"\n=== Fetching Transcript ===")
+    print(f"Video ID: {video_id}")
+    cached = None
+    with stage_timer('transcript_cache', 'Transcript cache lookup') as timer:
+        if use_cache and transcript_cache.enabled():
+            cached = load_cached_track(video_id, languages)
+            record_cache('transcript', cached is not None)
+        timer.detail = '(hit)' if cached is not None else '(miss)' if use_cache else '(bypassed)'
+    cache_ms = timer.ms
+
+    if cached is not None:
+        transcript, data = cached
+        list_ms = track_ms = 0
+        print(f"Using cached '{transcript.language_code}' ({'generated' if transcript.is_generated else 'manual'}) transcript with {len(data)} entries")
+    else:
+        with stage_timer('transcript_list', 'Transcript list fetch') as timer:
+            tracing.set_attribute('proxy', proxy_mode)
+            transcript_list = ytt_api.list(video_id)
+        list_ms = timer.ms
+
+        candidates = rank_transcript_tracks(transcript_list, languages)
+        print(f"Candidate tracks: {[(t.language_code, 'generated' if t.is_generated else 'manual') for t in candidates]}")
+
+        with stage_timer('transcript_fetch') as timer:
+            transcript, data = fetch_best_track(candidates)
+        track_ms = timer.ms
+        if data:
+            transcript_cache.store_track(video_id, transcript, data)
+            if not _parse_languages(languages):
+                transcript_cache.store_default_track(video_id, transcript)
+
+    detected_lang = None
+    if data:
+        try:
+            detected_lang = detect(data[0].text)
+            print(f"Detected language: {detected_lang}")
+        except Exception as e:
+            print(f"Language detection error: {e}")
+            detected_lang = 'unknown'
+
+    # Do NOT translate per-entry; translate at chunk level for efficiency
+    transcript_data = [{
+        'text': entry.text,
+        'original_text': entry.text,
+        'start_time': entry.start,
+        'duration': entry.duration,
+        'detected_language': detected_lang
+    } for entry in data]
+
+    return {
+        'success': bool(transcript_data),
+        'data': transcript_data,
+        'detected_lang': detected_lang,
+        'track': {
+            'language_code': transcript.language_code,
+            'is_generated': transcript.is_generated
+        } if transcript is not None else None,
+        'timings': {
+            'transcript_cache_ms': cache_ms,
+            'transcript_list_ms': list_ms,
+            'transcript_fetch_ms': track_ms
+        }
+    }
+
+def _build_transcript_docs(transcript_data, video_id, detected_lang):
+    """
+    All chunks of a transcript as Documents in one batch (Hindi chunks translated),
+    with the video's segments and lexical index stored as the ingest pipeline does.
+    """
+    # Chunk metadata points into the stored segments
+    save_segments(video_id, transcript_data)
+    with stage_timer('chunking'):
+        chunks = list(iter_transcript_chunks(transcript_data, video_id, detected_lang))
+    texts = [chunk_text for chunk_text, _ in chunks]
+    if detected_lang == 'hi':
+        texts = translate_texts(texts, {'disabled': False})
+    docs = [Document(page_content=text, metadata=metadata) for text, (_, metadata) in zip(texts, chunks)]
+    try:
+        save_index(video_id, docs)
+    except Exception as e:
+        print(f"Building lexical index for '{video_id}' failed: {str(e)}")
+    print(f"Total chunks created: {len(docs)}")
+    return docs
+
+def get_transcript_safely(video_id, languages, ytt_api, build_docs: bool = True):
+    """
+    Safely retrieve transcript from YouTube video.
+    With build_docs=False only the raw entries are returned (chunking is left to the caller).
+    """
+    try:
+        result = fetch_transcript_entries(video_id, languages, ytt_api)
+        transcript_data = result['data']
         
         if not transcript_data:
             print("No transcript data found")
@@ -322,15 +400,9 @@ def get_transcript_safely(video_id, languages, ytt_api):
         
         print(f"Total transcript entries collected: {len(transcript_data)}")
         
-        # Process transcript data using sliding window approach
-        docs = process_transcript_entries(transcript_data, video_id, detected_lang)
-        
-        return {
-            'success': True,
-            'data': transcript_data,
-            'docs': docs,
-            'detected_lang': detected_lang
-        }
+        if build_docs:
+            result['docs'] = _build_transcript_docs(transcript_data, video_id, result['detected_lang'])
+        return result
         
     except (TranscriptsDisabled, NoTranscriptFound, VideoUnavailable) as e:
         print(f"YouTube transcript error: {str(e)}")
@@ -343,4 +415,4 @@ def get_transcript_safely(video_id, languages, ytt_api):
         return {
             'success': False,
             'error': str(e)
-        } 
\ No newline at end of file
+        }
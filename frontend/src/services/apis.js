@@ -180,6 +180,177 @@ export const queryTranscript = async (query, videoId, model = null) => {
   }
 };
 
+/**
+ * Parse a Server-Sent Events stream and invoke onEvent(event, data) per frame
+ */
+const readEventStream = async (response, onEvent) => {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+
+    // Frames are separated by a blank line
+    let separatorIndex;
+    while ((separatorIndex = buffer.indexOf("\n\n")) !== -1) {
+      const frame = buffer.slice(0, separatorIndex);
+      buffer = buffer.slice(separatorIndex + 2);
+
+      let event = "message";
+      const dataLines = [];
+      for (const line of frame.split("\n")) {
+        if (line.startsWith("event:")) {
+          event = line.slice(6).trim();
+        } else if (line.startsWith("data:")) {
+          dataLines.push(line.slice(5).trim());
+        }
+      }
+
+      if (dataLines.length) {
+        onEvent(event, JSON.parse(dataLines.join("\n")));
+      }
+    }
+  }
+};
+
+/**
+ * Streaming variant of queryTranscript.
+ * Handlers: onRetrieval({ timestamps }), onDelta(text, fullText), onFallback({ model, reset })
+ * Resolves with the same shape as queryTranscript once the stream is complete.
+ */
+export const queryTranscriptStream = async (
+  query,
+  videoId,
+  model = null,
+  handlers = {}
+) => {
+  try {
+    // Cancel any existing query request
+    if (currentQueryController) {
+      console.log(
+        "Canceling previous query request for:",
+        currentQueryController.query
+      );
+      currentQueryController.abort();
+    }
+
+    const apiKey = await getApiKey();
+
+    // Get the model from storage or use the provided one or default
+    const selectedModel =
+      model || (await getStorageValue(STORAGE_KEYS.MODEL)) || DEFAULT_MODEL;
+
+    if (!apiKey) {
+      throw new Error("API key not found. Please set your Gemini API key.");
+    }
+
+    // Create new AbortController for this request
+    const controller = new AbortController();
+    controller.query = query; // Store query for logging
+    controller.videoId = videoId; // Store videoId for logging
+    currentQueryController = controller;
+
+    console.log("Starting new streaming query:", query, "for video:", videoId);
+
+    const response = await fetch(
+      // "http://localhost:8080/api/query/stream",
+      "https://yt-chrome-extension-production.up.railway.app/api/query/stream",
+      {
+        method: "POST",
+        signal: controller.signal,
+        headers: {
+          "Content-Type": "application/json",
+          Accept: "text/event-stream",
+          "X-API-Key": apiKey,
+        },
+        body: JSON.stringify({
+          query,
+          video_id: videoId,
+          model: selectedModel,
+        }),
+      }
+    );
+
+    // Validation errors are returned as plain JSON
+    if (!response.ok) {
+      return await response.json();
+    }
+
+    const result = {
+      success: false,
+      response: "",
+      timestamps: [],
+      timings: {},
+    };
+
+    await readEventStream(response, (event, data) => {
+      switch (event) {
+        case "retrieval":
+          result.timestamps = data.timestamps;
+          handlers.onRetrieval?.(data);
+          break;
+        case "delta":
+          result.response += data.text;
+          handlers.onDelta?.(data.text, result.response);
+          break;
+        case "fallback":
+          // Discard partial output from the primary model
+          if (data.reset) {
+            result.response = "";
+          }
+          handlers.onFallback?.(data);
+          break;
+        case "done":
+          result.success = true;
+          result.timings = data.timings;
+          break;
+        case "error":
+          result.error = data.error;
+          break;
+        default:
+          break;
+      }
+    });
+
+    // Check if request was aborted
+    if (controller.signal.aborted) {
+      throw new Error("Request was cancelled");
+    }
+
+    // Clear the controller if this request completed successfully
+    if (currentQueryController === controller) {
+      currentQueryController = null;
+      console.log("Streaming query completed for:", query, "video:", videoId);
+    }
+
+    return result;
+  } catch (error) {
+    // Clear controller if this was the current one
+    if (
+      currentQueryController &&
+      currentQueryController.query === query &&
+      currentQueryController.videoId === videoId
+    ) {
+      currentQueryController = null;
+    }
+
+    // Don't log error if request was intentionally cancelled
+    if (
+      error.name === "AbortError" ||
+      error.message === "Request was cancelled"
+    ) {
+      throw new Error("Request cancelled");
+    }
+
+    console.error("Error streaming query:", error);
+    throw error;
+  }
+};
+
 // Utility functions for request management
 
 /**